@@ -0,0 +1,130 @@
+import time
+import logging
+import importlib.util
+from collections import OrderedDict
+from typing import Optional, Tuple, Dict, Any
+
+from .config import settings
+from .models import AnalysisDocument
+
+logger = logging.getLogger(__name__)
+
+
+def analysis_etag(analysis: AnalysisDocument) -> str:
+    """Entity tag of a stored analysis; it changes whenever the document is updated"""
+    return f'"{analysis.analysisId}-{int(analysis.updatedAt.timestamp() * 1000)}"'
+
+
+class AnalysisCache:
+    """
+    Read-through cache of completed analyses, which no longer change.
+
+    The first tier is a bounded per-process LRU with a TTL; the optional
+    second tier is a Redis instance shared by all workers and nodes (used
+    only when analysis_cache_redis_url is set and the redis package is
+    installed). Entries are dropped from both tiers by update_analysis and
+    delete_analysis; other processes' LRUs catch up within the TTL.
+    """
+
+    def __init__(self, max_entries: int, ttl: int, redis_url: str = "", shared_ttl: int = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared_ttl = shared_ttl
+        self._entries: "OrderedDict[str, Tuple[AnalysisDocument, str, float]]" = OrderedDict()
+        self._redis = None
+        if redis_url:
+            if importlib.util.find_spec("redis"):
+                import redis.asyncio as redis
+                self._redis = redis.from_url(redis_url)
+            else:
+                logger.warning("analysis_cache_redis_url is set but redis is not installed, using the local cache only")
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def _key(self, analysisId: str) -> str:
+        return f"analysis:{analysisId}"
+
+    async def get(self, analysisId: str) -> Optional[Tuple[AnalysisDocument, str]]:
+        """Return (analysis, etag) from the local or shared tier, or None"""
+        if not self.enabled:
+            return None
+        entry = self._entries.get(analysisId)
+        if entry is not None:
+            if entry[2] > time.monotonic():
+                self._entries.move_to_end(analysisId)
+                self.hits += 1
+                return entry[0], entry[1]
+            del self._entries[analysisId]
+
+        if self._redis is not None:
+            try:
+                raw = await self._redis.get(self._key(analysisId))
+            except Exception as e:
+                logger.warning(f"Shared analysis cache read failed: {e}")
+                raw = None
+            if raw is not None:
+                analysis = AnalysisDocument.model_validate_json(raw)
+                self.shared_hits += 1
+                return self._store_local(analysis)
+
+        self.misses += 1
+        return None
+
+    def _store_local(self, analysis: AnalysisDocument) -> Tuple[AnalysisDocument, str]:
+        etag = analysis_etag(analysis)
+        self._entries[analysis.analysisId] = (analysis, etag, time.monotonic() + self.ttl)
+        self._entries.move_to_end(analysis.analysisId)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return analysis, etag
+
+    async def put(self, analysis: AnalysisDocument):
+        """Cache an analysis; only completed ones are immutable enough to keep"""
+        if not self.enabled or analysis.status != "completed":
+            return
+        self._store_local(analysis)
+        if self._redis is not None:
+            try:
+                await self._redis.set(self._key(analysis.analysisId), analysis.model_dump_json(by_alias=True), ex=self.shared_ttl)
+            except Exception as e:
+                logger.warning(f"Shared analysis cache write failed: {e}")
+
+    async def invalidate(self, analysisId: str):
+        if not self.enabled:
+            return
+        self.invalidations += 1
+        self._entries.pop(analysisId, None)
+        if self._redis is not None:
+            try:
+                await self._redis.delete(self._key(analysisId))
+            except Exception as e:
+                logger.warning(f"Shared analysis cache invalidation failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "shared_tier": self._redis is not None,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.hits + self.shared_hits) / lookups, 3) if lookups else None,
+            "invalidations": self.invalidations,
+        }
+
+
+# Global analysis cache instance
+analysis_cache = AnalysisCache(
+    settings.analysis_cache_size,
+    settings.analysis_cache_ttl,
+    settings.analysis_cache_redis_url,
+    settings.analysis_cache_shared_ttl,
+)
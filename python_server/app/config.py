@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List, Any, Union
+from typing import List, Any, Union, Dict, Tuple, Optional
 import os
 import json
 from pydantic import field_validator
@@ -9,11 +9,26 @@ class Settings(BaseSettings):
     host: str = "0.0.0.0"
     port: int = int(os.getenv("PORT", 8000))
     debug: bool = False
+    workers: int = 0  # Worker processes for serve.py (0 = one per CPU core)
+    backlog: int = 2048  # Listen backlog of the shared socket
+    graceful_shutdown_timeout: int = 30  # Seconds workers get to drain in-flight requests on SIGTERM
     
     # MongoDB Configuration
     mongodb_url: str
     mongodb_database: str
     mongodb_collection: str
+    mongodb_min_pool_size: int = 5  # Connections opened at startup and kept open
+    mongodb_max_pool_size: int = 100  # Upper bound on connections per process
+    mongodb_max_idle_time_ms: int = 300000  # Idle time before a pooled connection is closed (0 = never)
+    mongodb_wait_queue_timeout_ms: int = 5000  # Wait for a free pooled connection before failing (0 = forever)
+    mongodb_server_selection_timeout_ms: int = 5000  # Wait for a usable server before failing
+    mongodb_connect_timeout_ms: int = 10000  # Timeout for opening a connection
+    mongodb_socket_timeout_ms: int = 30000  # Timeout for a single operation on a socket (0 = none)
+    mongodb_compressors: str = "zstd,snappy,zlib"  # Wire compressors in preference order; uninstalled ones are skipped
+    mongodb_zlib_compression_level: int = 6  # Only used when zlib is negotiated
+    mongodb_history_read_preference: str = "primary"  # e.g. "secondaryPreferred" to serve history from replicas
+    mongodb_result_write_concern: str = "majority"  # Write concern for stored analysis results
+    mongodb_status_write_concern: str = "1"  # Write concern for progress/status updates
     
     # CORS Configuration
     cors_origins: str = "http://localhost:3000,http://localhost:5173"
@@ -41,13 +56,38 @@ class Settings(BaseSettings):
     
     # Groq AI Configuration
     groq_api_key: str = ""
+    groq_api_keys: str = ""  # Comma-separated key pool; groq_api_key is used when empty
+    groq_key_cooldown: int = 60  # Seconds a key is skipped after a 429 without retry-after
     groq_model: str = "llama3-8b-8192"
+    groq_models: str = ""  # Comma-separated routing pool, fastest first (defaults to groq_model)
+    groq_large_input_tokens: int = 2500  # Estimated prompt tokens from which the largest model is preferred
+    groq_model_max_latency: float = 20.0  # Seconds of average latency after which a model counts as degraded
+    groq_model_cooldown: int = 15  # Base seconds a model is skipped after an error
+    groq_latency_ewma_alpha: float = 0.3  # Weight of the newest sample in the latency average
+    groq_max_tokens: int = 5000  # Completion budget for an analysis
+    groq_max_continuations: int = 2  # Follow-up requests for a completion cut off at max_tokens
+    groq_continuation_max_tokens: int = 2500  # Completion budget for each continuation
+    groq_hedge_enabled: bool = False  # Fire a second request when a completion runs unusually long
+    groq_hedge_percentile: float = 95.0  # Recent-latency percentile after which the hedge is fired
+    groq_hedge_max_rate: float = 0.1  # Maximum fraction of requests that may be hedged
+    groq_hedge_min_samples: int = 20  # Latency samples required before hedging starts
+    groq_hedge_window: int = 200  # Number of recent latencies the percentile is computed over
+    groq_hedge_max_workers: int = 0  # Threads for racing primary and hedge requests (0 = two per analysis thread)
     
     # File Processing
     max_file_size: int = 5242880  # 5MB
     allowed_extensions: str = "pdf,docx,txt"  # Deprecated, use allowed_resume_extensions and allowed_jobdesc_extensions
     allowed_resume_extensions: str = "pdf,docx"  # Only for resume
     allowed_jobdesc_extensions: str = "pdf,docx,txt"  # Only for job description
+    pdf_preflight_enabled: bool = True  # Scan PDF structure (page count, budgets below) before any full parse
+    pdf_max_objects: int = 10000  # Indirect objects a PDF may contain
+    pdf_max_xref_sections: int = 32  # Cross-reference sections (incremental updates) followed through /Prev
+    pdf_max_page_tree_depth: int = 32  # Nesting of the page tree
+    pdf_max_images: int = 500  # Image streams a PDF may contain
+    pdf_max_stream_bytes: int = 16777216  # 16MB: decoded size of a single stream, or declared size of an image
+    pdf_max_decoded_bytes: int = 67108864  # 64MB: decoded size of all compressed streams together
+    pdf_max_compression_ratio: float = 200.0  # Expansion allowed for streams decoding beyond 1MB
+    pdf_preflight_max_seconds: float = 2.0  # Time the stream sweep may take before the rest is left to the full parser (0 = unlimited)
     
     # Input Validation Limits
     max_resume_words: int = 8000  # Maximum words for resume text
@@ -56,11 +96,92 @@ class Settings(BaseSettings):
     max_pdf_pages: int = 7
     max_docx_pages: int = 7
     
+    # Analysis Jobs
+    analysis_queue_size: int = 100  # Jobs waiting for a worker before /analyze returns 503 in async mode
+    analysis_workers: int = 4  # Concurrent queued analyses per process
+    analysis_queue_backend: str = "memory"  # "memory" (per process) or "mongo" (durable, shared by all nodes)
+    analysis_jobs_collection: str = "analysis_jobs"  # MongoDB collection for the mongo backend
+    analysis_job_lease_seconds: int = 120  # Seconds a claimed job stays owned without a lease renewal
+    analysis_job_max_attempts: int = 3  # Deliveries before a job is given up and its analysis marked failed
+    analysis_job_retry_delay: int = 10  # Base seconds before a failed job is retried, doubled per attempt
+    analysis_job_poll_interval: float = 1.0  # Seconds an idle worker waits before looking for jobs again
+    analysis_job_retention: int = 86400  # Seconds finished job documents are kept
+    
+    # Analysis Persistence
+    analysis_write_buffer: bool = False  # Batch analysis inserts in a write-behind buffer
+    analysis_write_batch_size: int = 50  # Documents per insert_many
+    analysis_write_flush_interval: float = 0.5  # Seconds between flushes of a partial batch
+    analysis_write_durability: str = "ack"  # "ack" (request waits for its batch) or "fire_and_forget" (spill to disk on outage)
+    analysis_write_spill_path: str = "analysis_spill.jsonl"  # Local file for analyses MongoDB could not take
+    analysis_write_max_pending: int = 10000  # Buffered analyses beyond which fire-and-forget writes spill directly
+    analysis_split_storage: bool = False  # Keep the full result in a separate detail document per analysis
+    analysis_details_collection: str = "analysis_details"  # MongoDB collection for detail documents
+    analysis_storage_compression: str = "none"  # "none", "zlib" or "zstd": store the detailed report and long texts compressed
+    analysis_compression_level: int = 6  # zlib (1-9) or zstd (1-22) level
+    analysis_compression_min_bytes: int = 1024  # Texts shorter than this are stored plain
+    token_usage_collection: str = "token_usage_daily"  # MongoDB collection of per user/day/model token rollups
+    groq_model_prices: str = ""  # Comma-separated model=prompt:completion USD per million tokens, e.g. "llama3-8b-8192=0.05:0.08"
+    _model_prices_cache: Optional[Tuple[str, Dict[str, Tuple[float, float]]]] = None  # Parsed groq_model_prices
+    
+    # Analysis Cache
+    analysis_cache_size: int = 1000  # Completed analyses kept in memory per process (0 disables the cache)
+    analysis_cache_ttl: int = 300  # Seconds an in-memory entry is trusted before re-reading; also how long other workers may serve an invalidated entry
+    analysis_cache_redis_url: str = ""  # Optional Redis shared by all workers (requires the redis package)
+    analysis_cache_shared_ttl: int = 3600  # Seconds entries live in the shared tier
+    
+    # Analysis History
+    history_page_size: int = 20  # Default analyses per history page
+    history_max_page_size: int = 100  # Largest page a client may request
+    
+    # Health Probing
+    health_probe_interval: int = 30  # Seconds between background MongoDB/Groq probes
+    health_probe_timeout: float = 10.0  # Seconds before a single probe is considered failed
+    health_stale_after: int = 90  # Seconds after which a cached probe result is reported as stale
+    
     # Rate Limiting
     max_requests_per_day: int = 15
+    rate_limit_window_seconds: int = 86400  # Length of the counting window
+    rate_limit_algorithm: str = "sliding"  # "sliding" (weighted previous window) or "fixed"
+    rate_limit_backend: str = ""  # "memory" (per process), "shared_memory" (workers on one host) or "mongo" (all nodes); empty picks per serve.py worker count
+    rate_limit_max_keys: int = 100000  # Bound on clients tracked by the in-process backend
+    rate_limit_shm_name: str = "resume_analyzer_ratelimit"  # Shared memory segment name
+    rate_limit_shm_slots: int = 65536  # Counter slots in the shared memory table
+    rate_limit_collection: str = "rate_limits"  # MongoDB collection for the mongo backend
+    
+    # Metrics
+    metrics_dir: str = ""  # Directory where workers share metric snapshots (set by serve.py for multiple workers)
+    metrics_flush_interval: float = 5.0  # Seconds between snapshot writes to metrics_dir
+    
+    # Event Loop Monitoring
+    loop_monitor_interval: float = 0.25  # Seconds between lag samples (0 disables the monitor)
+    loop_lag_threshold: float = 0.1  # Lag in seconds counted as a stall; the blocking stack is logged
+    loop_stall_log_interval: float = 10.0  # Minimum seconds between logged stall stacks
+    loop_slow_callback_ms: int = 0  # Debug: log every callback or task step slower than this (enables asyncio debug mode)
+    
+    # Memory
+    memory_budget_mb: int = 512  # Estimated working memory of concurrent extractions per process (0 disables the budget)
+    memory_budget_wait_seconds: float = 30.0  # Wait for budget before a request gets 503 (async submissions extract before queueing too)
+    memory_pdf_expansion: float = 40.0  # Estimated bytes of parser memory per uploaded PDF byte
+    memory_docx_expansion: float = 15.0  # Estimated bytes of parser memory per uploaded DOCX byte
+    memory_text_expansion: float = 4.0  # Estimated bytes of memory per plain-text byte
+    memory_trace_sample_rate: float = 0.0  # Debug: share of stages whose peak allocations are traced with tracemalloc (slows every allocation)
+    
+    # Profiling
+    profiler_enabled: bool = False  # Expose POST /api/v1/admin/profile (admin JWT required)
+    profiler_max_seconds: float = 30.0  # Upper bound on one profile's duration
+    profiler_sample_interval_ms: int = 10  # Milliseconds between stack samples
+    profiler_tracemalloc_frames: int = 5  # Frames kept per allocation when allocation tracing is requested
+    
+    # Startup
+    warmup_enabled: bool = True  # Exercise parsers and open Groq/MongoDB connections before reporting ready
+    warmup_timeout: float = 30.0  # Seconds after which the worker reports ready even if warm-up is unfinished
+    startup_target_seconds: float = 10.0  # Time-to-ready above which a warning is logged (0 disables)
     
     # Logging
     log_level: str = "INFO"
+    log_format: str = "text"  # "text" or "json" (one structured object per line)
+    log_payload_interval: float = 60.0  # Seconds between sampled debug payloads (e.g. raw model output) per kind
+    log_payload_chars: int = 500  # Characters of a sampled payload that are logged
     
     # JWT Configuration
     jwt_secret: str = os.getenv("JWT_SECRET", "your_jwt_secret")
@@ -113,24 +234,62 @@ class Settings(BaseSettings):
         # Fallback to default
         return "pdf,docx,txt"
 
-    def _parse_extensions(self, ext_string: str, default: list) -> list:
-        if not ext_string:
+    def _parse_list(self, value: str, default: list) -> list:
+        if not value:
             return default
-        if ext_string.startswith('[') and ext_string.endswith(']'):
+        if value.startswith('[') and value.endswith(']'):
             try:
-                parsed = json.loads(ext_string)
+                parsed = json.loads(value)
                 if isinstance(parsed, list):
-                    return [ext.strip() for ext in parsed if ext.strip()]
+                    return [item.strip() for item in parsed if item.strip()]
             except (json.JSONDecodeError, TypeError):
                 pass
-        return [ext.strip() for ext in ext_string.split(",") if ext.strip()]
+        return [item.strip() for item in value.split(",") if item.strip()]
 
     @property
     def allowed_resume_extensions_list(self) -> list:
-        return self._parse_extensions(self.allowed_resume_extensions, ["pdf", "docx"])
+        return self._parse_list(self.allowed_resume_extensions, ["pdf", "docx"])
 
     @property
     def allowed_jobdesc_extensions_list(self) -> list:
-        return self._parse_extensions(self.allowed_jobdesc_extensions, ["pdf", "docx", "txt"])
+        return self._parse_list(self.allowed_jobdesc_extensions, ["pdf", "docx", "txt"])
+
+    @property
+    def mongodb_compressors_list(self) -> list:
+        return self._parse_list(self.mongodb_compressors, [])
+
+    @property
+    def groq_api_keys_list(self) -> list:
+        default_key = self.groq_api_key or os.getenv("GROQ_API_KEY")
+        return self._parse_list(self.groq_api_keys, [default_key] if default_key else [])
+
+    @property
+    def groq_models_list(self) -> list:
+        default_model = self.groq_model or os.getenv("GROQ_MODEL", "llama3-70b-8192")
+        return self._parse_list(self.groq_models, [default_model])
+
+    @property
+    def groq_model_prices_map(self) -> Dict[str, Tuple[float, float]]:
+        """Prompt and completion USD per million tokens by model; malformed entries are skipped"""
+        # Parsed once per GROQ_MODEL_PRICES value, since token_cost_usd runs for every stored analysis
+        if self._model_prices_cache is not None and self._model_prices_cache[0] == self.groq_model_prices:
+            return self._model_prices_cache[1]
+        prices = {}
+        for entry in self._parse_list(self.groq_model_prices, []):
+            model, _, rates = entry.partition("=")
+            prompt, _, completion = rates.partition(":")
+            try:
+                prices[model.strip()] = (float(prompt), float(completion))
+            except ValueError:
+                continue
+        self._model_prices_cache = (self.groq_model_prices, prices)
+        return prices
+
+    def token_cost_usd(self, model: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+        """Cost of a model's tokens, or None when GROQ_MODEL_PRICES has no price for it"""
+        price = self.groq_model_prices_map.get(model)
+        if price is None:
+            return None
+        return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
 
 settings = Settings()
\ No newline at end of file
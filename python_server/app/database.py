@@ -1,24 +1,89 @@
 import motor.motor_asyncio
-from typing import Optional
+import asyncio
+import base64
+import importlib.util
+import json
+import time
+from datetime import datetime
+from typing import Optional, List, Tuple, Dict, Any, Union
 import logging
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING, ReadPreference, WriteConcern, UpdateOne
 from .config import settings
-from .models import AnalysisDocument
+from .analysis_cache import analysis_cache
+from .models import AnalysisDocument, AnalysisSummary, AnalysisDetail
+from .storage_codec import pack_document, unpack_document
+from .write_buffer import analysis_write_buffer
 
 logger = logging.getLogger(__name__)
 
 class Database:
     client: Optional[motor.motor_asyncio.AsyncIOMotorClient] = None
     database: Optional[motor.motor_asyncio.AsyncIOMotorDatabase] = None
+    collections: Dict[str, Any] = {}
 
 db = Database()
 
+# Python packages the optional wire compressors need
+COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+def available_compressors() -> List[str]:
+    """Configured wire compressors whose Python package is installed, in preference order"""
+    compressors = []
+    for name in settings.mongodb_compressors_list:
+        module = COMPRESSOR_MODULES.get(name)
+        if module and importlib.util.find_spec(module):
+            compressors.append(name)
+        else:
+            logger.warning(f"MongoDB compressor '{name}' is unavailable, skipping it")
+    return compressors
+
+def client_options() -> Dict[str, Any]:
+    options = {
+        "minPoolSize": settings.mongodb_min_pool_size,
+        "maxPoolSize": settings.mongodb_max_pool_size,
+        "maxIdleTimeMS": settings.mongodb_max_idle_time_ms or None,
+        "waitQueueTimeoutMS": settings.mongodb_wait_queue_timeout_ms or None,
+        "serverSelectionTimeoutMS": settings.mongodb_server_selection_timeout_ms,
+        "connectTimeoutMS": settings.mongodb_connect_timeout_ms,
+        "socketTimeoutMS": settings.mongodb_socket_timeout_ms or None,
+    }
+    compressors = available_compressors()
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+        options["zlibCompressionLevel"] = settings.mongodb_zlib_compression_level
+    return options
+
+def _write_concern(value: str) -> WriteConcern:
+    return WriteConcern(w=int(value) if value.isdigit() else value)
+
+async def warm_up_pool():
+    """Open minPoolSize connections now instead of on the first requests after a deploy"""
+    if settings.mongodb_min_pool_size <= 0:
+        return
+    started = time.perf_counter()
+    # Concurrent commands each need their own connection, so the pool grows to this size
+    await asyncio.gather(*(db.client.admin.command('ping') for _ in range(settings.mongodb_min_pool_size)))
+    logger.info(f"✅ Warmed {settings.mongodb_min_pool_size} MongoDB connections in {time.perf_counter() - started:.2f}s")
+
 async def connect_to_mongo():
     try:
         logger.info(f"Connecting to MongoDB database: {settings.mongodb_database}")
-        db.client = motor.motor_asyncio.AsyncIOMotorClient(settings.mongodb_url)
+        db.client = motor.motor_asyncio.AsyncIOMotorClient(settings.mongodb_url, **client_options())
         db.database = db.client[settings.mongodb_database]
+        db.collections = {}
         await db.client.admin.command('ping')
         logger.info(f"✅ Connected to MongoDB: {settings.mongodb_database}")
+        await warm_up_pool()
     except Exception as e:
         logger.error(f"❌ Failed to connect to MongoDB: {e}")
         raise
@@ -28,12 +93,107 @@ async def close_mongo_connection():
         db.client.close()
         logger.info("✅ MongoDB connection closed")
 
-async def get_collection():
-    return db.database[settings.mongodb_collection]
+async def get_collection(purpose: str = "default"):
+    """
+    The analyses collection, configured for one class of operation:
+    "results" (stored analyses, result write concern), "status" (progress
+    updates, status write concern), "history" (history read preference).
+    "details" and "token_usage" are the detail and token rollup collections.
+    """
+    collection = db.collections.get(purpose)
+    if collection is None:
+        collection = db.database[settings.mongodb_collection]
+        if purpose == "results":
+            collection = collection.with_options(write_concern=_write_concern(settings.mongodb_result_write_concern))
+        elif purpose == "status":
+            collection = collection.with_options(write_concern=_write_concern(settings.mongodb_status_write_concern))
+        elif purpose == "details":
+            collection = db.database[settings.analysis_details_collection].with_options(
+                write_concern=_write_concern(settings.mongodb_result_write_concern))
+        elif purpose == "token_usage":
+            collection = db.database[settings.token_usage_collection]
+        elif purpose == "history":
+            collection = collection.with_options(read_preference=READ_PREFERENCES.get(
+                settings.mongodb_history_read_preference, ReadPreference.PRIMARY))
+        db.collections[purpose] = collection
+    return collection
 
-async def save_analysis(analysis_doc: AnalysisDocument) -> str:
+async def ensure_indexes():
+    """Create the indexes the analysis lookups rely on (no-op when they exist)"""
+    collection = await get_collection()
     try:
-        collection = await get_collection()
+        await collection.create_index([("analysisId", ASCENDING)], unique=True, name="analysisId_unique")
+    except Exception as e:
+        # Usually duplicate analysisIds from before the index existed; lookups still work, just unindexed
+        logger.error(f"❌ Failed to create unique analysisId index: {e}")
+    await collection.create_index(
+        [("userId", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)],
+        name="userId_createdAt"
+    )
+    token_usage = await get_collection("token_usage")
+    await token_usage.create_index(
+        [("userId", ASCENDING), ("day", DESCENDING), ("model", ASCENDING)],
+        unique=True,
+        name="userId_day_model"
+    )
+    logger.info("✅ MongoDB indexes ensured")
+
+# Result fields kept on the summary document when detail documents are split off
+SUMMARY_RESULT_FIELDS = (
+    "job_description_validity",
+    "resume_validity",
+    "resume_eligibility",
+    "score_out_of_100",
+    "chance_of_selection_percentage",
+)
+# Fields moved to the detail document
+DETAIL_FIELDS = ("result", "jobDescriptionText")
+
+def split_document(doc: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
+    """
+    Split an analysis document (or $set update) into its summary part and
+    its detail part, keyed by analysisId. The summary keeps the scores of
+    the result so list views never need the detail document.
+    """
+    detail = {field: doc.pop(field) for field in DETAIL_FIELDS if field in doc}
+    if not detail:
+        return doc, None
+    if detail.get("result"):
+        doc["result"] = {field: detail["result"][field] for field in SUMMARY_RESULT_FIELDS if field in detail["result"]}
+    return doc, pack_document(detail)
+
+def merge_detail(doc: Dict[str, Any], detail: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if detail:
+        unpack_document(detail)
+        for field in DETAIL_FIELDS:
+            if field in detail:
+                doc[field] = detail[field]
+    return unpack_document(doc)
+
+def summary_from_document(doc: Dict[str, Any]) -> AnalysisSummary:
+    result = doc.get("result") or {}
+    return AnalysisSummary(
+        analysisId=doc["analysisId"],
+        status=doc.get("status", "completed"),
+        resumeFilename=doc.get("resumeFilename", ""),
+        jobDescriptionFilename=doc.get("jobDescriptionFilename"),
+        score=result.get("score_out_of_100"),
+        eligibility=result.get("resume_eligibility"),
+        chanceOfSelection=result.get("chance_of_selection_percentage"),
+        processingTime=doc.get("processingTime"),
+        createdAt=doc["createdAt"],
+        updatedAt=doc.get("updatedAt"),
+    )
+
+async def save_analysis(analysis_doc: AnalysisDocument, write_behind: bool = True) -> str:
+    """
+    Insert an analysis. With the write buffer running and `write_behind` set,
+    the insert is batched; pass write_behind=False for documents that are
+    read or updated right after being saved. With split storage the detail
+    document is written before the summary that refers to it.
+    """
+    try:
+        collection = await get_collection("results")
         doc_dict = analysis_doc.dict(by_alias=True, exclude_unset=True)
         doc_dict.pop('_id', None)
         # Ensure both 'analysisId' and 'analysisId' are set for MongoDB compatibility
@@ -43,6 +203,25 @@ async def save_analysis(analysis_doc: AnalysisDocument) -> str:
             doc_dict['analysisId'] = doc_dict['analysisId']
         else:
             raise ValueError("AnalysisDocument must have 'analysisId' or 'analysisId' set.")
+        detail = None
+        if settings.analysis_split_storage:
+            doc_dict, detail = split_document(doc_dict)
+            if detail is not None:
+                detail["_id"] = doc_dict["analysisId"]
+        else:
+            pack_document(doc_dict)
+        if write_behind and analysis_write_buffer.running:
+            if detail is not None:
+                await asyncio.gather(
+                    analysis_write_buffer.add(detail, target="details"),
+                    analysis_write_buffer.add(doc_dict),
+                )
+            else:
+                await analysis_write_buffer.add(doc_dict)
+            return doc_dict['analysisId']
+        if detail is not None:
+            details = await get_collection("details")
+            await details.insert_one(detail)
         result = await collection.insert_one(doc_dict)
         logger.info(f"✅ Analysis saved with ID: {result.inserted_id}")
         return str(result.inserted_id)
@@ -50,22 +229,65 @@ async def save_analysis(analysis_doc: AnalysisDocument) -> str:
         logger.error(f"❌ Failed to save analysis: {e}")
         raise
 
-async def get_analysis_by_id(analysisId: str) -> Optional[AnalysisDocument]:
+async def get_analysis_by_id(
+    analysisId: str, part: str = "full"
+) -> Optional[Union[AnalysisDocument, AnalysisSummary, AnalysisDetail]]:
+    """
+    Fetch an analysis: part="full" (the whole AnalysisDocument), "summary"
+    (only the summary fields) or "detail" (the result and job description
+    text). Documents stored before split storage was enabled work with all three.
+    Full reads of completed analyses are served from analysis_cache when possible.
+    """
+    if part == "full":
+        cached = await analysis_cache.get(analysisId)
+        if cached is not None:
+            return cached[0]
     try:
         collection = await get_collection()
-        doc = await collection.find_one({"analysisId": analysisId})
+        if part == "summary":
+            doc = await collection.find_one({"analysisId": analysisId}, HISTORY_PROJECTION)
+            return summary_from_document(doc) if doc else None
+
+        details = await get_collection("details")
+        if part == "detail":
+            detail = await details.find_one({"_id": analysisId}) if settings.analysis_split_storage else None
+            if detail is None:
+                detail = await collection.find_one({"analysisId": analysisId}, {field: 1 for field in DETAIL_FIELDS})
+                if detail is None:
+                    return None
+            detail["analysisId"] = analysisId
+            return AnalysisDetail(**unpack_document(detail))
+
+        if settings.analysis_split_storage:
+            doc, detail = await asyncio.gather(
+                collection.find_one({"analysisId": analysisId}),
+                details.find_one({"_id": analysisId}),
+            )
+        else:
+            doc, detail = await collection.find_one({"analysisId": analysisId}), None
         if doc:
             doc['_id'] = str(doc['_id'])
-            return AnalysisDocument(**doc)
+            analysis = AnalysisDocument(**merge_detail(doc, detail))
+            await analysis_cache.put(analysis)
+            return analysis
         return None
     except Exception as e:
         logger.error(f"❌ Failed to get analysis: {e}")
         raise
 
-async def update_analysis(analysisId: str, update_data: dict) -> bool:
+async def update_analysis(analysisId: str, update_data: dict, stores_result: bool = False) -> bool:
+    """Apply a $set; updates that store the final result use the result write concern"""
     try:
-        collection = await get_collection()
+        collection = await get_collection("results" if stores_result else "status")
+        if settings.analysis_split_storage:
+            update_data, detail = split_document(update_data)
+            if detail is not None:
+                details = await get_collection("details")
+                await details.update_one({"_id": analysisId}, {"$set": detail}, upsert=True)
+        else:
+            pack_document(update_data)
         result = await collection.update_one({"analysisId": analysisId}, {"$set": update_data})
+        await analysis_cache.invalidate(analysisId)
         return result.modified_count > 0
     except Exception as e:
         logger.error(f"❌ Failed to update analysis: {e}")
@@ -75,6 +297,10 @@ async def delete_analysis(analysisId: str) -> bool:
     try:
         collection = await get_collection()
         result = await collection.delete_one({"analysisId": analysisId})
+        if settings.analysis_split_storage:
+            details = await get_collection("details")
+            await details.delete_one({"_id": analysisId})
+        await analysis_cache.invalidate(analysisId)
         return result.deleted_count > 0
     except Exception as e:
         logger.error(f"❌ Failed to delete analysis: {e}")
@@ -95,16 +321,127 @@ async def check_mongo_health() -> dict:
         return {"status": "error", "error": str(e)}
     
 async def get_analyses_by_user_id(userId: str) -> list:
-    """Get all analyses for a specific userId"""
+    """Get all analyses for a specific userId, newest first"""
     try:
-        collection = await get_collection()
-        cursor = collection.find({"userId": userId})
+        collection = await get_collection("history")
+        cursor = collection.find({"userId": userId}).sort([("createdAt", DESCENDING), ("_id", DESCENDING)])
+        docs = await cursor.to_list(length=None)
+        details = {}
+        if settings.analysis_split_storage and docs:
+            details_collection = await get_collection("details")
+            async for detail in details_collection.find({"_id": {"$in": [doc["analysisId"] for doc in docs]}}):
+                details[detail["_id"]] = detail
         analyses = []
-        async for doc in cursor:
+        for doc in docs:
             if '_id' in doc:
                 doc['_id'] = str(doc['_id'])
-            analyses.append(AnalysisDocument(**doc))
+            analyses.append(AnalysisDocument(**merge_detail(doc, details.get(doc["analysisId"]))))
         return analyses
     except Exception as e:
         logger.error(f"❌ Failed to get analyses for userId {userId}: {e}")
-        raise 
\ No newline at end of file
+        raise
+
+# Fields needed to list an analysis; the stored report stays on the server
+HISTORY_PROJECTION = {
+    "analysisId": 1,
+    "status": 1,
+    "resumeFilename": 1,
+    "jobDescriptionFilename": 1,
+    "result.score_out_of_100": 1,
+    "result.resume_eligibility": 1,
+    "result.chance_of_selection_percentage": 1,
+    "processingTime": 1,
+    "createdAt": 1,
+    "updatedAt": 1,
+}
+
+def encode_history_cursor(createdAt: datetime, doc_id: ObjectId) -> str:
+    raw = json.dumps({"t": createdAt.isoformat(), "id": str(doc_id)})
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_history_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Parse a cursor token, raising ValueError when it is malformed"""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(raw["t"]), ObjectId(raw["id"])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise ValueError("Invalid history cursor") from e
+
+async def get_analysis_history(userId: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    One page of a user's analyses, newest first, as summary fields only.
+    Pages continue after the (createdAt, _id) of the previous page's last
+    item, so every page is a bounded walk of the userId/createdAt index.
+    Returns the page and the cursor of the next one (None on the last page).
+    """
+    query: Dict[str, Any] = {"userId": userId}
+    if cursor:
+        createdAt, doc_id = decode_history_cursor(cursor)
+        query["$or"] = [
+            {"createdAt": {"$lt": createdAt}},
+            {"createdAt": createdAt, "_id": {"$lt": doc_id}},
+        ]
+    try:
+        collection = await get_collection("history")
+        docs = await collection.find(query, HISTORY_PROJECTION) \
+            .sort([("createdAt", DESCENDING), ("_id", DESCENDING)]) \
+            .limit(limit + 1) \
+            .to_list(length=limit + 1)
+    except Exception as e:
+        logger.error(f"❌ Failed to get analysis history for userId {userId}: {e}")
+        raise
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_history_cursor(docs[-1]["createdAt"], docs[-1]["_id"])
+    return docs, next_cursor
+
+def _usage_increments(totals: Dict[str, int], analyses: int, model: str) -> Dict[str, Any]:
+    increments = {
+        "analyses": analyses,
+        "promptTokens": totals["promptTokens"],
+        "completionTokens": totals["completionTokens"],
+        "totalTokens": totals["promptTokens"] + totals["completionTokens"],
+    }
+    cost = settings.token_cost_usd(model, totals["promptTokens"], totals["completionTokens"])
+    if cost is not None:
+        increments["costUsd"] = cost
+    return increments
+
+async def record_token_usage(userId: str, usage_by_model: Dict[str, Dict[str, int]], count_analysis: bool = True):
+    """
+    Add an analysis' token usage to the per user, per UTC day, per model
+    rollups. Each rollup is upserted with $inc, so concurrent analyses
+    (across workers and nodes) add up without read-modify-write races.
+    Usage that arrives after the analysis was counted (a late hedge loser)
+    is added with count_analysis=False.
+    """
+    if not usage_by_model:
+        return
+    now = datetime.utcnow()
+    day = now.strftime("%Y-%m-%d")
+    operations = [
+        UpdateOne(
+            {"userId": userId, "day": day, "model": model},
+            {
+                "$inc": _usage_increments(totals, 1 if count_analysis else 0, model),
+                "$set": {"updatedAt": now},
+            },
+            upsert=True,
+        )
+        for model, totals in usage_by_model.items()
+    ]
+    try:
+        collection = await get_collection("token_usage")
+        await collection.bulk_write(operations, ordered=False)
+    except Exception as e:
+        # Accounting must never fail an analysis
+        logger.error(f"❌ Failed to record token usage for userId {userId}: {e}")
+
+async def get_token_usage(userId: str, since_day: str) -> List[Dict[str, Any]]:
+    """A user's token usage rollups from since_day (YYYY-MM-DD) on, newest day first"""
+    collection = await get_collection("token_usage")
+    return await collection.find(
+        {"userId": userId, "day": {"$gte": since_day}},
+        {"_id": 0, "userId": 0, "updatedAt": 0}
+    ).sort([("day", DESCENDING), ("model", ASCENDING)]).to_list(length=None)
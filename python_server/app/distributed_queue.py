@@ -0,0 +1,274 @@
+import asyncio
+import os
+import socket
+import logging
+from uuid import uuid4
+from datetime import datetime, timedelta
+from typing import Optional, Callable, Awaitable, List, Dict, Any
+
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+
+from .config import settings
+from .database import db
+from .job_queue import AnalysisJob, ABANDONED_ON_FAILURE
+
+logger = logging.getLogger(__name__)
+
+
+class MongoAnalysisJobQueue:
+    """
+    Durable analysis queue in a MongoDB collection, served by worker tasks on
+    every instance.
+
+    A job document moves pending -> running -> done (or dead). Workers claim
+    the highest-priority due job with an atomic find_one_and_update, which
+    gives the claimant a lease it renews while the analysis runs. A job whose
+    lease expires (its node crashed or hung) becomes claimable again, and a
+    failed job is retried with exponential backoff until it runs out of
+    attempts. Finished documents drop their text payload and expire through
+    a TTL index.
+    """
+
+    name = "mongo"
+
+    def __init__(self, collection_name: str, maxsize: int, workers: int):
+        self.collection_name = collection_name
+        self.maxsize = maxsize
+        self.worker_count = workers
+        # Set in start(): the queue is built at import, in serve.py's master, before workers fork
+        self.owner: Optional[str] = None
+        self._workers: List[asyncio.Task] = []
+        self._running: Dict[int, str] = {}  # worker index -> claimed job id
+        self._handler: Optional[Callable[[AnalysisJob], Awaitable[None]]] = None
+        self._on_abandoned: Optional[Callable[[AnalysisJob, str], Awaitable[None]]] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self.accepting = False
+        self.active = 0
+        self.claimed = 0
+        self.completed = 0
+        self.retried = 0
+        self.failed = 0
+        self.recovered = 0
+
+    @property
+    def collection(self):
+        return db.database[self.collection_name]
+
+    async def start(
+        self,
+        handler: Callable[[AnalysisJob], Awaitable[None]],
+        on_abandoned: Optional[Callable[[AnalysisJob, str], Awaitable[None]]] = None
+    ):
+        await self.collection.create_index([("state", ASCENDING), ("priority", DESCENDING), ("availableAt", ASCENDING)])
+        await self.collection.create_index([("state", ASCENDING), ("leaseExpiresAt", ASCENDING)])
+        await self.collection.create_index("expireAt", expireAfterSeconds=0)
+        # Unique per start, so no two workers (or restarts reusing a pid) share lease owners
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+        self._handler = handler
+        self._on_abandoned = on_abandoned
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.worker_count)]
+        self.accepting = True
+        logger.info(f"Mongo analysis job queue started on {self.owner} with {self.worker_count} workers")
+
+    async def full(self) -> bool:
+        if not self.accepting:
+            return True
+        pending = await self.collection.count_documents({"state": "pending"}, limit=self.maxsize)
+        return pending >= self.maxsize
+
+    async def enqueue(self, job: AnalysisJob) -> bool:
+        """Persist a job, returning False when the queue is full or shutting down"""
+        if await self.full():
+            return False
+        now = datetime.utcnow()
+        await self.collection.insert_one({
+            "_id": job.analysisId,
+            "userId": job.userId,
+            "state": "pending",
+            "priority": job.priority,
+            "attempts": 0,
+            "availableAt": now,
+            "leaseOwner": None,
+            "leaseExpiresAt": None,
+            "payload": job.to_payload(),
+            "createdAt": now,
+            "updatedAt": now,
+        })
+        self._wakeup.set()
+        return True
+
+    async def _claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        now = datetime.utcnow()
+        return await self.collection.find_one_and_update(
+            {"$or": [
+                {"state": "pending", "availableAt": {"$lte": now}},
+                {"state": "running", "leaseExpiresAt": {"$lte": now}},
+            ]},
+            {
+                "$set": {
+                    "state": "running",
+                    "leaseOwner": worker,
+                    "leaseExpiresAt": now + timedelta(seconds=settings.analysis_job_lease_seconds),
+                    "updatedAt": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("priority", DESCENDING), ("availableAt", ASCENDING)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _renew_lease(self, job_id: str, worker: str):
+        """Extend the lease every third of its length while the job runs"""
+        interval = settings.analysis_job_lease_seconds / 3
+        while True:
+            await asyncio.sleep(interval)
+            result = await self.collection.update_one(
+                {"_id": job_id, "leaseOwner": worker},
+                {"$set": {"leaseExpiresAt": datetime.utcnow() + timedelta(seconds=settings.analysis_job_lease_seconds)}},
+            )
+            if result.matched_count == 0:
+                logger.warning(f"Lease on analysis job {job_id} was lost by {worker}")
+                return
+
+    async def _finish(self, job_id: str, worker: str, state: str, error: Optional[str] = None):
+        now = datetime.utcnow()
+        await self.collection.update_one(
+            {"_id": job_id, "leaseOwner": worker},
+            {
+                "$set": {
+                    "state": state,
+                    "lastError": error,
+                    "leaseOwner": None,
+                    "leaseExpiresAt": None,
+                    "updatedAt": now,
+                    "expireAt": now + timedelta(seconds=settings.analysis_job_retention),
+                },
+                "$unset": {"payload": ""},
+            },
+        )
+
+    async def _retry_later(self, doc: Dict[str, Any], worker: str, error: str):
+        delay = settings.analysis_job_retry_delay * 2 ** (doc["attempts"] - 1)
+        await self.collection.update_one(
+            {"_id": doc["_id"], "leaseOwner": worker},
+            {"$set": {
+                "state": "pending",
+                "availableAt": datetime.utcnow() + timedelta(seconds=delay),
+                "lastError": error,
+                "leaseOwner": None,
+                "leaseExpiresAt": None,
+                "updatedAt": datetime.utcnow(),
+            }},
+        )
+        logger.warning(f"Analysis job {doc['_id']} failed (attempt {doc['attempts']}), retrying in {delay}s: {error}")
+
+    async def _give_up(self, job: AnalysisJob, worker: str, error: str):
+        self.failed += 1
+        await self._finish(job.analysisId, worker, "dead", error)
+        if self._on_abandoned:
+            await self._on_abandoned(job, ABANDONED_ON_FAILURE)
+
+    async def _process(self, doc: Dict[str, Any], worker: str):
+        job = AnalysisJob.from_payload(doc["_id"], doc["userId"], doc["priority"], doc["payload"])
+        if doc["attempts"] > settings.analysis_job_max_attempts:
+            # The lease expired on its last allowed delivery
+            logger.error(f"Analysis job {job.analysisId} abandoned after {doc['attempts'] - 1} deliveries")
+            await self._give_up(job, worker, doc.get("lastError") or "Lease expired")
+            return
+        if doc["attempts"] > 1 and not doc.get("lastError"):
+            self.recovered += 1
+            logger.info(f"Recovered analysis job {job.analysisId} after an expired lease")
+
+        lease = asyncio.create_task(self._renew_lease(job.analysisId, worker))
+        try:
+            await self._handler(job)
+        except Exception as e:
+            if doc["attempts"] < settings.analysis_job_max_attempts:
+                self.retried += 1
+                await self._retry_later(doc, worker, str(e))
+            else:
+                logger.error(f"Analysis job {job.analysisId} failed after {doc['attempts']} attempts: {e}")
+                await self._give_up(job, worker, str(e))
+            return
+        finally:
+            lease.cancel()
+        self.completed += 1
+        await self._finish(job.analysisId, worker, "done")
+
+    async def _worker(self, index: int):
+        worker = f"{self.owner}:{index}"
+        while not self._stopping:
+            try:
+                doc = await self._claim(worker)
+            except Exception as e:
+                logger.error(f"Failed to claim an analysis job in {worker}: {e}")
+                doc = None
+            if doc is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.analysis_job_poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            self.claimed += 1
+            self.active += 1
+            self._running[index] = doc["_id"]
+            try:
+                await self._process(doc, worker)
+            except Exception as e:
+                # Mongo errors while settling the job: its lease expires and it is redelivered
+                logger.error(f"Analysis job {doc['_id']} could not be settled by {worker}: {e}")
+            finally:
+                self.active -= 1
+                self._running.pop(index, None)
+
+    async def _release(self, job_id: str, index: int):
+        """Hand an interrupted job back to the queue without counting the attempt"""
+        await self.collection.update_one(
+            {"_id": job_id, "leaseOwner": f"{self.owner}:{index}"},
+            {
+                "$set": {"state": "pending", "availableAt": datetime.utcnow(), "leaseOwner": None,
+                         "leaseExpiresAt": None, "updatedAt": datetime.utcnow()},
+                "$inc": {"attempts": -1},
+            },
+        )
+
+    async def stop(self, timeout: float):
+        """Stop claiming, let running jobs finish, then release any still running to other nodes"""
+        if not self._workers:
+            return
+        self.accepting = False
+        self._stopping = True
+        self._wakeup.set()
+        done, pending = await asyncio.wait(self._workers, timeout=timeout)
+        if pending:
+            logger.warning(f"{len(self._running)} analysis jobs still running after {timeout}s, releasing them")
+            interrupted = dict(self._running)
+            for worker in pending:
+                worker.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            for index, job_id in interrupted.items():
+                try:
+                    await self._release(job_id, index)
+                except Exception as e:
+                    logger.error(f"Failed to release analysis job {job_id}: {e}")
+        self._workers = []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "owner": self.owner,
+            "accepting": self.accepting,
+            "max_queued": self.maxsize,
+            "active": self.active,
+            "workers": self.worker_count,
+            "claimed": self.claimed,
+            "completed": self.completed,
+            "retried": self.retried,
+            "failed": self.failed,
+            "recovered_leases": self.recovered,
+        }
@@ -1,12 +1,36 @@
 import os
 import io
+import time
 from typing import Optional, Tuple
 import logging
-from docx import Document
-import PyPDF2
-import pdfplumber
-import filetype
 from .config import settings
+from .metrics import STAGE_SECONDS, EXTRACTION_SECONDS, PDF_PREFLIGHT_REJECTIONS
+from .request_timing import record_input
+from .pdf_preflight import scan_pdf, PdfBudgetExceeded, PdfSyntaxError
+
+# Parsing libraries are imported on first use (or by preload_modules before forking) to keep cold start fast
+def _pdfplumber():
+    import pdfplumber
+    return pdfplumber
+
+
+def _pypdf2():
+    import PyPDF2
+    return PyPDF2
+
+
+def _docx():
+    import docx
+    return docx
+
+
+def _filetype():
+    import filetype
+    return filetype
+
+
+# inputStats key prefix per file_type_hint
+INPUT_STATS_PREFIXES = {'resume': 'resume', 'jobdesc': 'jobDescription'}
 
 logger = logging.getLogger(__name__)
 
@@ -14,7 +38,7 @@ class FileProcessor:
     @staticmethod
     def detect_file_type(file_content: bytes, filename: str) -> str:
         try:
-            kind = filetype.guess(file_content)
+            kind = _filetype().guess(file_content)
             if kind and kind.extension.lower() in settings.allowed_extensions_list:
                 return kind.extension.lower()
             if filename:
@@ -37,25 +61,46 @@ class FileProcessor:
         return True, "File size is acceptable"
     
     @staticmethod
-    def validate_pdf_pages(file_content: bytes, filename: str) -> Tuple[bool, str]:
-        try:
-            with pdfplumber.open(io.BytesIO(file_content)) as pdf:
-                page_count = len(pdf.pages)
-                max_pages = settings.max_pdf_pages
-                if page_count > max_pages:
-                    return False, f"PDF '{filename}' has too many pages ({page_count}). Maximum allowed is {max_pages} pages."
-                return True, f"PDF has {page_count} pages (within limit)"
-        except Exception as e:
-            logger.warning(f"Could not validate PDF pages for {filename}: {e}")
-            return True, "Could not validate page count, proceeding"
+    def validate_pdf_pages(file_content: bytes, filename: str, file_type_hint: str = None) -> Tuple[bool, str]:
+        page_count = None
+        if settings.pdf_preflight_enabled:
+            # Structural scan: page count without a full parse, and rejection of pathological documents
+            try:
+                report = scan_pdf(file_content)
+                page_count = report["pages"]
+                logger.debug(f"PDF preflight for {filename}: {report}")
+            except PdfBudgetExceeded as e:
+                PDF_PREFLIGHT_REJECTIONS.inc(budget=e.budget)
+                logger.warning(f"PDF {filename} rejected by preflight ({e.budget}): {e}")
+                return False, f"PDF '{filename}' is too complex to process: {e}."
+            except PdfSyntaxError as e:
+                logger.debug(f"PDF preflight could not read {filename} ({e}), counting pages with pdfplumber")
+            except Exception as e:
+                # A scanner bug must not turn an upload into a 500; pdfplumber still validates it
+                logger.warning(f"PDF preflight failed on {filename} ({type(e).__name__}: {e}), counting pages with pdfplumber")
+        if page_count is None:
+            try:
+                with _pdfplumber().open(io.BytesIO(file_content)) as pdf:
+                    page_count = len(pdf.pages)
+            except Exception as e:
+                logger.warning(f"Could not validate PDF pages for {filename}: {e}")
+                return True, "Could not validate page count, proceeding"
+        if file_type_hint in INPUT_STATS_PREFIXES:
+            record_input(f"{INPUT_STATS_PREFIXES[file_type_hint]}Pages", page_count)
+        max_pages = settings.max_pdf_pages
+        if page_count > max_pages:
+            return False, f"PDF '{filename}' has too many pages ({page_count}). Maximum allowed is {max_pages} pages."
+        return True, f"PDF has {page_count} pages (within limit)"
     
     @staticmethod
-    def validate_docx_pages(file_content: bytes, filename: str) -> Tuple[bool, str]:
+    def validate_docx_pages(file_content: bytes, filename: str, file_type_hint: str = None) -> Tuple[bool, str]:
         try:
-            doc = Document(io.BytesIO(file_content))
+            doc = _docx().Document(io.BytesIO(file_content))
             paragraph_count = len(doc.paragraphs)
             table_count = len(doc.tables)
             estimated_pages = max(1, (paragraph_count * 5 + table_count * 100) // 500)
+            if file_type_hint in INPUT_STATS_PREFIXES:
+                record_input(f"{INPUT_STATS_PREFIXES[file_type_hint]}Pages", estimated_pages)
             max_pages = settings.max_docx_pages
             if estimated_pages > max_pages:
                 return False, f"DOCX '{filename}' appears to have too many pages (estimated {estimated_pages}). Maximum allowed is {max_pages} pages."
@@ -66,59 +111,68 @@ class FileProcessor:
     
     @staticmethod
     def extract_text_from_pdf(file_content: bytes) -> Tuple[str, bool]:
-        text = ""
+        # Page texts are collected in a list and joined once; repeated += copies the growing string
+        parts = []
         success = False
+        started = time.perf_counter()
         try:
-            with pdfplumber.open(io.BytesIO(file_content)) as pdf:
+            with _pdfplumber().open(io.BytesIO(file_content)) as pdf:
                 for page in pdf.pages:
                     page_text = page.extract_text()
+                    # Drop the page's cached layout objects before parsing the next one
+                    page.close()
                     if page_text:
-                        text += page_text + "\n"
+                        parts.append(page_text)
+                text = "\n".join(parts)
                 if text.strip():
                     success = True
-                    logger.info("PDF text extracted successfully using pdfplumber")
+                    logger.debug("PDF text extracted successfully using pdfplumber")
+                    EXTRACTION_SECONDS.observe(time.perf_counter() - started, engine="pdfplumber", outcome="success")
                     return text.strip(), success
         except Exception as e:
             logger.warning(f"pdfplumber failed: {str(e)}")
+        EXTRACTION_SECONDS.observe(time.perf_counter() - started, engine="pdfplumber", outcome="failure")
+        started = time.perf_counter()
         try:
-            pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
-            for page_num in range(len(pdf_reader.pages)):
-                page = pdf_reader.pages[page_num]
+            pdf_reader = _pypdf2().PdfReader(io.BytesIO(file_content))
+            parts = []
+            for page in pdf_reader.pages:
                 page_text = page.extract_text()
                 if page_text:
-                    text += page_text + "\n"
+                    parts.append(page_text)
+            text = "\n".join(parts)
             if text.strip():
                 success = True
-                logger.info("PDF text extracted successfully using PyPDF2")
+                logger.debug("PDF text extracted successfully using PyPDF2")
+                EXTRACTION_SECONDS.observe(time.perf_counter() - started, engine="pypdf2", outcome="success")
                 return text.strip(), success
         except Exception as e:
             logger.error(f"PyPDF2 also failed: {str(e)}")
+        EXTRACTION_SECONDS.observe(time.perf_counter() - started, engine="pypdf2", outcome="failure")
+        started = time.perf_counter()
         try:
             decoded_text = file_content.decode('utf-8', errors='ignore')
             if len(decoded_text.strip()) > 50:
                 success = True
-                logger.info("PDF processed as plain text")
+                logger.debug("PDF processed as plain text")
+                EXTRACTION_SECONDS.observe(time.perf_counter() - started, engine="pdf_plain_text", outcome="success")
                 return decoded_text.strip(), success
         except Exception as e:
             logger.error(f"Plain text extraction failed: {str(e)}")
+        EXTRACTION_SECONDS.observe(time.perf_counter() - started, engine="pdf_plain_text", outcome="failure")
         return "Error: Unable to extract text from PDF file", False
     
     @staticmethod
     def extract_text_from_docx(file_content: bytes) -> Tuple[str, bool]:
         try:
-            doc = Document(io.BytesIO(file_content))
-            text = ""
-            for paragraph in doc.paragraphs:
-                if paragraph.text.strip():
-                    text += paragraph.text + "\n"
+            doc = _docx().Document(io.BytesIO(file_content))
+            lines = [paragraph.text for paragraph in doc.paragraphs if paragraph.text.strip()]
             for table in doc.tables:
                 for row in table.rows:
-                    for cell in row.cells:
-                        if cell.text.strip():
-                            text += cell.text + " "
-                    text += "\n"
+                    lines.append(" ".join(cell.text for cell in row.cells if cell.text.strip()))
+            text = "\n".join(lines)
             if text.strip():
-                logger.info("DOCX text extracted successfully")
+                logger.debug("DOCX text extracted successfully")
                 return text.strip(), True
             else:
                 return "Error: DOCX file appears to be empty", False
@@ -127,7 +181,7 @@ class FileProcessor:
             try:
                 decoded_text = file_content.decode('utf-8', errors='ignore')
                 if len(decoded_text.strip()) > 50:
-                    logger.info("DOCX processed as plain text")
+                    logger.debug("DOCX processed as plain text")
                     return decoded_text.strip(), True
             except Exception as e2:
                 logger.error(f"Plain text extraction from DOCX failed: {str(e2)}")
@@ -140,7 +194,7 @@ class FileProcessor:
             try:
                 text = file_content.decode(encoding)
                 if text.strip():
-                    logger.info(f"TXT file decoded successfully using {encoding}")
+                    logger.debug(f"TXT file decoded successfully using {encoding}")
                     return text.strip(), True
             except UnicodeDecodeError:
                 continue
@@ -150,7 +204,7 @@ class FileProcessor:
         try:
             text = file_content.decode('utf-8', errors='ignore')
             if text.strip():
-                logger.info("TXT file decoded with error handling")
+                logger.debug("TXT file decoded with error handling")
                 return text.strip(), True
         except Exception as e:
             logger.error(f"Final TXT decoding attempt failed: {str(e)}")
@@ -163,8 +217,9 @@ class FileProcessor:
         size_valid, size_msg = FileProcessor.validate_file_size(file_content, filename)
         if not size_valid:
             return size_msg, False, "unknown"
-        file_type = FileProcessor.detect_file_type(file_content, filename)
-        logger.info(f"Processing file: {filename}, detected type: {file_type}")
+        with STAGE_SECONDS.time(stage="type_detection"):
+            file_type = FileProcessor.detect_file_type(file_content, filename)
+        logger.debug(f"Processing file: {filename}, detected type: {file_type}")
         # Enforce allowed file types based on hint
         if file_type_hint == 'resume':
             allowed = settings.allowed_resume_extensions_list
@@ -179,19 +234,25 @@ class FileProcessor:
             if file_type not in allowed:
                 return f"Error: Unsupported file type '{file_type}'. Allowed types: {', '.join(allowed)}.", False, file_type
         if file_type == 'pdf':
-            pages_valid, pages_msg = FileProcessor.validate_pdf_pages(file_content, filename)
+            with STAGE_SECONDS.time(stage="page_validation"):
+                pages_valid, pages_msg = FileProcessor.validate_pdf_pages(file_content, filename, file_type_hint)
             if not pages_valid:
                 return pages_msg, False, file_type
             text, success = FileProcessor.extract_text_from_pdf(file_content)
             return text, success, file_type
         elif file_type == 'docx':
-            pages_valid, pages_msg = FileProcessor.validate_docx_pages(file_content, filename)
+            with STAGE_SECONDS.time(stage="page_validation"):
+                pages_valid, pages_msg = FileProcessor.validate_docx_pages(file_content, filename, file_type_hint)
             if not pages_valid:
                 return pages_msg, False, file_type
+            started = time.perf_counter()
             text, success = FileProcessor.extract_text_from_docx(file_content)
+            EXTRACTION_SECONDS.observe(time.perf_counter() - started, engine="docx", outcome="success" if success else "failure")
             return text, success, file_type
         elif file_type == 'txt' or file_type == 'unknown':
+            started = time.perf_counter()
             text, success = FileProcessor.extract_text_from_txt(file_content)
+            EXTRACTION_SECONDS.observe(time.perf_counter() - started, engine="txt", outcome="success" if success else "failure")
             return text, success, file_type if file_type != 'unknown' else 'txt'
         else:
             return f"Error: Unsupported file type '{file_type}'. Allowed types: {', '.join(allowed)}.", False, file_type
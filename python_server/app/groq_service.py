@@ -1,11 +1,23 @@
 import os
 import json
+import asyncio
 import logging
 import re
-from typing import Dict, Any, Optional
-from groq import Groq
+import time
+import threading
+import contextvars
+from types import SimpleNamespace
+from concurrent.futures import wait, FIRST_COMPLETED
+from typing import Dict, Any, Optional, List, Callable, Iterator
 from dotenv import load_dotenv
 from .config import settings
+from .hedging import hedge_policy, hedge_executor, CompletionCancelled
+from .key_pool import groq_key_pool, is_rate_limit_error
+from .model_router import model_router
+from .metrics import STAGE_SECONDS, LLM_SECONDS, LLM_TOKENS, FALLBACK_RESPONSES
+from .models import ResumeAnalysisReport
+from .request_timing import record_input, add_input, record_stage
+from .log_config import payload_sampler
 # Static security validation removed - now using AI-based validation
 
 # Load environment variables
@@ -13,54 +25,101 @@ load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Characters that separate JSON tokens; a short repeated overlap must start after one
+_TOKEN_BOUNDARY = ' \t\r\n"{}[],:'
+
+
+class TruncationStats:
+    """Counts completions cut off at max_tokens and how they were recovered"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.completions = 0
+        self.truncated = 0
+        self.continuation_requests = 0
+        self.outcomes = {"continued": 0, "repaired": 0, "unrecovered": 0}
+
+    def record_completion(self, truncated: bool):
+        with self._lock:
+            self.completions += 1
+            if truncated:
+                self.truncated += 1
+
+    def record_continuation(self):
+        with self._lock:
+            self.continuation_requests += 1
+
+    def record_outcome(self, outcome: str):
+        with self._lock:
+            self.outcomes[outcome] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_tokens": settings.groq_max_tokens,
+                "completions": self.completions,
+                "truncated": self.truncated,
+                "truncation_rate": round(self.truncated / self.completions, 4) if self.completions else 0.0,
+                "continuation_requests": self.continuation_requests,
+                "outcomes": dict(self.outcomes),
+            }
+
+
+truncation_stats = TruncationStats()
+
+
+def _new_attempt(stream: bool) -> Dict[str, Any]:
+    """State shared between _hedged_completion and one attempt running in _run_completion_attempts"""
+    return {"cancelled": False, "model": None, "key": None, "stream": stream, "started": threading.Event()}
+
 
 class GroqService:
     """Service class for interacting with Groq AI API"""
     
     def __init__(self):
         """Initialize the Groq service with API key and configuration"""
-        # Log what is loaded from settings and env
-        logger.info(f"GROQ_API_KEY from settings: {getattr(settings, 'groq_api_key', None)}")
-        logger.info(f"GROQ_API_KEY from os.environ: {os.getenv('GROQ_API_KEY')}")
-        logger.info(f"GROQ_MODEL from settings: {getattr(settings, 'groq_model', None)}")
-        logger.info(f"GROQ_MODEL from os.environ: {os.getenv('GROQ_MODEL')}")
-        # Use fallback if settings.groq_api_key is empty string
-        self.api_key = settings.groq_api_key or os.getenv("GROQ_API_KEY")
-        if not self.api_key:
+        # Clients live in the shared key pool so connections are reused across requests
+        if not len(groq_key_pool):
             raise ValueError("GROQ_API_KEY environment variable is required")
+        self.api_key = settings.groq_api_keys_list[0]
         
         self.model = settings.groq_model or os.getenv("GROQ_MODEL", "llama3-70b-8192")
-        self.client = Groq(api_key=self.api_key)
+        self.client = groq_key_pool.primary_client
         
         # Response schema loading removed
         self.response_schema = {}
         
-        logger.info(f"GroqService initialized with model: {self.model}")
+        # Model and key actually used by the last completion (set by _create_completion)
+        self.last_model: Optional[str] = None
+        self.last_key: Optional[str] = None
+        
+        # Tokens reported by every completion of this service, per model (hedge threads add concurrently)
+        self.token_usage: Dict[str, Dict[str, int]] = {}
+        self._usage_lock = threading.Lock()
+        # Receives usage recorded after take_usage (a hedge loser still closing its stream)
+        self._late_usage: Optional[Callable[[Dict[str, Dict[str, int]]], None]] = None
+        
+        logger.debug(f"GroqService initialized with model: {self.model}")
     
     async def check_health(self) -> Dict[str, Any]:
-        """Check the health of the Groq service"""
+        """Check the health of the Groq service without spending completion tokens"""
         try:
-            # Test API connection with a simple request
-            test_prompt = "Hello, this is a health check. Please respond with 'OK'."
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": test_prompt}],
-                max_tokens=10,
-                temperature=0
-            )
-            
-            if response.choices and response.choices[0].message.content:
+            # Listing models verifies the key and connectivity; run it off the event loop
+            models = await asyncio.to_thread(self.client.models.list)
+            available = {model.id for model in models.data}
+            missing = [model for model in settings.groq_models_list if model not in available]
+            if missing:
                 return {
-                    "status": "healthy",
+                    "status": "degraded",
+                    "error": f"Configured models not available: {', '.join(missing)}",
                     "model": self.model,
                     "api_key_configured": bool(self.api_key)
                 }
-            else:
-                return {
-                    "status": "degraded",
-                    "error": "No response from Groq API",
-                    "model": self.model
-                }
+            return {
+                "status": "healthy",
+                "model": self.model,
+                "api_key_configured": bool(self.api_key)
+            }
         except Exception as e:
             logger.error(f"Groq health check failed: {str(e)}")
             return {
@@ -98,6 +157,7 @@ class GroqService:
     def _get_fallback_response(self) -> Dict[str, Any]:
         """Get a fallback response when AI analysis fails completely"""
         logger.warning("Using fallback response due to AI service failure")
+        FALLBACK_RESPONSES.inc()
         return {
             "security_validation": "Failed",
             "security_error": "AI analysis service encountered an error. Please try again with a valid job description and resume.",
@@ -136,22 +196,261 @@ class GroqService:
             "resume_analysis_report": None
         }
     
+    def _parse_json(self, content: str) -> Any:
+        with STAGE_SECONDS.time(stage="json_parse"):
+            return json.loads(content)
+
     def _estimate_tokens(self, text: str) -> int:
         """Estimate token count for text (rough approximation: 1 token ≈ 4 characters)"""
         return len(text) // 4
 
-    def analyze_resume(self, resume_text: str, job_description: str) -> Dict[str, Any]:
+    def _create_completion(
+        self,
+        messages: List[Dict[str, str]],
+        estimated_tokens: int,
+        depth: str = "standard",
+        prefer_model: Optional[str] = None,
+        **kwargs
+    ):
+        """
+        Run a chat completion, recording its wall time as the llm stage
+        (parallel hedge attempts are not added up).
+        """
+        started = time.perf_counter()
+        try:
+            return self._hedged_completion(messages, estimated_tokens, depth, prefer_model, **kwargs)
+        finally:
+            record_stage("llm", time.perf_counter() - started)
+
+    def _hedged_completion(
+        self,
+        messages: List[Dict[str, str]],
+        estimated_tokens: int,
+        depth: str,
+        prefer_model: Optional[str],
+        **kwargs
+    ):
+        """
+        Run a chat completion, hedging it with a second identical request when
+        the primary has not returned within the recent latency percentile.
+        """
+        delay = hedge_policy.hedge_delay()
+        if delay is None:
+            primary = _new_attempt(stream=False)
+            response = self._run_completion_attempts(messages, estimated_tokens, depth, prefer_model, primary, None, **kwargs)
+            return self._finish_completion(primary, response)
+
+        # Attempts that may race are streamed, so the loser can drop its connection and stop generating
+        primary = _new_attempt(stream=True)
+        # Run in copies of this context so the attempts still report into the request's timing
+        primary_future = hedge_executor.submit(
+            contextvars.copy_context().run, self._run_completion_attempts, messages, estimated_tokens, depth, prefer_model, primary, None, **kwargs
+        )
+        # The hedge delay counts from when the primary starts, not from when it was queued;
+        # a primary still queued after a whole delay is treated as slow
+        done = set()
+        if primary["started"].wait(timeout=delay):
+            done, _ = wait([primary_future], timeout=delay)
+        if done or not hedge_policy.try_fire():
+            return self._finish_completion(primary, primary_future.result())
+
+        logger.info(f"Groq call still running after {delay:.2f}s, firing hedge request")
+        hedge = _new_attempt(stream=True)
+        hedge_future = hedge_executor.submit(
+            contextvars.copy_context().run, self._run_completion_attempts, messages, estimated_tokens, depth, prefer_model, hedge, primary, **kwargs
+        )
+        attempts = {primary_future: primary, hedge_future: hedge}
+        pending = set(attempts)
+        last_error: Optional[Exception] = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                # The other attempt closes its stream at its next chunk and starts no fallbacks
+                for other in pending:
+                    attempts[other]["cancelled"] = True
+                    other.cancel()
+                if future is hedge_future:
+                    hedge_policy.record_win()
+                return self._finish_completion(attempts[future], response)
+        raise last_error or RuntimeError("Hedged completion failed")
+
+    def _finish_completion(self, attempt: Dict[str, Any], response):
+        self.last_model = attempt["model"]
+        self.last_key = attempt["key"].label if attempt["key"] else None
+        record_input("model", self.last_model)
+        return response
+
+    def _run_completion_attempts(
+        self,
+        messages: List[Dict[str, str]],
+        estimated_tokens: int,
+        depth: str,
+        prefer_model: Optional[str],
+        attempt: Dict[str, Any],
+        avoid: Optional[Dict[str, Any]],
+        **kwargs
+    ):
+        """
+        Try the routed models in order using the least-loaded API key. A
+        rate-limited key is retried on the next key for the same model; other
+        errors fall back to the next candidate model. A hedge attempt (avoid
+        set) steers clear of the primary's key while another one has capacity.
+        """
+        attempt["started"].set()
+        last_error: Optional[Exception] = None
+        avoid_keys = [avoid["key"]] if avoid and avoid["key"] else []
+        candidates = model_router.candidates(estimated_tokens, depth, prefer=prefer_model)
+        for excluded in ([avoid_keys, []] if avoid_keys else [[]]):
+            acquired_any = False
+            for model in candidates:
+                tried_keys = list(excluded)
+                while not attempt["cancelled"]:
+                    key = groq_key_pool.acquire(model, estimated_tokens, exclude=tried_keys)
+                    if key is None:
+                        break
+                    acquired_any = True
+                    tried_keys.append(key)
+                    attempt["model"], attempt["key"] = model, key
+                    model_router.record_start(model)
+                    started = time.perf_counter()
+                    try:
+                        if attempt["stream"]:
+                            response, headers = self._stream_completion(key, model, messages, attempt, estimated_tokens, **kwargs)
+                        else:
+                            raw_response = key.client.chat.completions.with_raw_response.create(
+                                model=model,
+                                messages=messages,
+                                **kwargs
+                            )
+                            response, headers = raw_response.parse(), raw_response.headers
+                    except CompletionCancelled as e:
+                        groq_key_pool.release(key, model)
+                        model_router.record_cancelled(model)
+                        LLM_SECONDS.observe(time.perf_counter() - started, model=model, key=key.label, outcome="cancelled")
+                        self._count_usage(model, e.usage)
+                        raise
+                    except Exception as e:
+                        groq_key_pool.release(key, model, error=e)
+                        model_router.record_failure(model, e)
+                        last_error = e
+                        LLM_SECONDS.observe(time.perf_counter() - started, model=model, key=key.label,
+                                            outcome="rate_limited" if is_rate_limit_error(e) else "error")
+                        if is_rate_limit_error(e):
+                            continue
+                        break
+                    latency = time.perf_counter() - started
+                    groq_key_pool.release(key, model, headers=headers)
+                    model_router.record_success(model, latency)
+                    hedge_policy.record_latency(latency)
+                    LLM_SECONDS.observe(latency, model=model, key=key.label, outcome="success")
+                    if getattr(response, "usage", None):
+                        self._count_usage(model, response.usage)
+                    logger.debug(f"Completion served by {model} on {key.label} in {latency:.2f}s")
+                    return response
+                if attempt["cancelled"]:
+                    raise RuntimeError("Completion attempt cancelled after hedge race")
+            if acquired_any:
+                break
+        raise last_error or RuntimeError("No Groq model or API key has remaining capacity")
+
+    def _stream_completion(self, key, model: str, messages: List[Dict[str, str]], attempt: Dict[str, Any], estimated_tokens: int, **kwargs):
+        """
+        Streamed completion for an attempt that may race, assembled into the
+        shape of a regular response, with the rate-limit headers. The
+        cancelled flag is checked between chunks; closing the stream drops
+        the connection, so Groq stops generating for the loser.
+        """
+        stream = key.client.chat.completions.create(model=model, messages=messages, stream=True, **kwargs)
+        parts: List[str] = []
+        finish_reason = None
+        usage = None
+        chunks = 0
+        try:
+            for chunk in stream:
+                if attempt["cancelled"]:
+                    # Groq reports usage in the last chunk only; estimate what the abandoned attempt consumed
+                    raise CompletionCancelled(SimpleNamespace(prompt_tokens=estimated_tokens, completion_tokens=chunks))
+                chunks += 1
+                if chunk.choices:
+                    choice = chunk.choices[0]
+                    if choice.delta is not None and choice.delta.content:
+                        parts.append(choice.delta.content)
+                    if choice.finish_reason:
+                        finish_reason = choice.finish_reason
+                x_groq = getattr(chunk, "x_groq", None)
+                if x_groq is not None and getattr(x_groq, "usage", None) is not None:
+                    usage = x_groq.usage
+        finally:
+            stream.close()
+        message = SimpleNamespace(content="".join(parts))
+        response = SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason=finish_reason)], usage=usage)
+        return response, stream.response.headers
+
+    def _count_usage(self, model: str, usage):
+        LLM_TOKENS.inc(usage.prompt_tokens or 0, model=model, kind="prompt")
+        LLM_TOKENS.inc(usage.completion_tokens or 0, model=model, kind="completion")
+        add_input("promptTokens", usage.prompt_tokens or 0)
+        add_input("completionTokens", usage.completion_tokens or 0)
+        self._record_usage(model, usage)
+
+    def _record_usage(self, model: str, usage):
+        recorded = {"promptTokens": usage.prompt_tokens or 0, "completionTokens": usage.completion_tokens or 0}
+        with self._usage_lock:
+            totals = self.token_usage.setdefault(model, {"promptTokens": 0, "completionTokens": 0})
+            totals["promptTokens"] += recorded["promptTokens"]
+            totals["completionTokens"] += recorded["completionTokens"]
+            late_usage = self._late_usage
+        if late_usage is not None:
+            late_usage({model: recorded})
+
+    def take_usage(self, on_late_usage: Optional[Callable[[Dict[str, Dict[str, int]]], None]] = None) -> Dict[str, Dict[str, int]]:
+        """
+        Copy of the usage recorded so far, per model, for persisting. Usage
+        recorded afterwards is passed to on_late_usage, so tokens of a hedge
+        loser that finishes after the analysis are still accounted for.
+        """
+        with self._usage_lock:
+            self._late_usage = on_late_usage
+            return {model: dict(totals) for model, totals in self.token_usage.items()}
+
+    def usage_summary(self) -> Optional[Dict[str, Any]]:
+        """Token usage across all models for the analysis document, or None if Groq reported none"""
+        with self._usage_lock:
+            if not self.token_usage:
+                return None
+            prompt = sum(totals["promptTokens"] for totals in self.token_usage.values())
+            completion = sum(totals["completionTokens"] for totals in self.token_usage.values())
+            costs = [
+                settings.token_cost_usd(model, totals["promptTokens"], totals["completionTokens"])
+                for model, totals in self.token_usage.items()
+            ]
+        return {
+            "promptTokens": prompt,
+            "completionTokens": completion,
+            "totalTokens": prompt + completion,
+            "costUsd": sum(costs) if None not in costs else None,
+            "model": self.last_model,
+        }
+
+    def analyze_resume(self, resume_text: str, job_description: str, depth: str = "standard") -> Dict[str, Any]:
         """
         Analyze resume against job description using Groq AI
         
         Args:
             resume_text: The extracted resume text
             job_description: The job description text
+            depth: Requested analysis depth (quick/standard/detailed), used for model routing
             
         Returns:
             Dictionary containing comprehensive resume analysis
         """
         try:
+            prompt_started = time.perf_counter()
             # TOKEN OPTIMIZATION - Reduce input lengths to prevent rate limit
             max_resume_length = 2500  # Further reduced from 3000 to prevent token limit
             if len(resume_text) > max_resume_length:
@@ -394,6 +693,9 @@ class GroqService:
             # Estimate tokens and check if we're likely to exceed limits
             estimated_tokens = self._estimate_tokens(prompt)
             logger.debug(f"Estimated tokens: {estimated_tokens}")
+            STAGE_SECONDS.observe(time.perf_counter() - prompt_started, stage="prompt_build")
+            record_input("estimatedPromptTokens", estimated_tokens)
+            record_input("depth", depth)
             
             # If estimated tokens are too high, use fallback immediately
             if estimated_tokens > 4500:  # More conservative limit (reduced from 5000)
@@ -401,20 +703,25 @@ class GroqService:
                 return self._get_fallback_response()
             
             try:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": "You are an expert HR consultant. Provide comprehensive analysis in JSON format only."},
-                        {"role": "user", "content": prompt}
-                    ],
+                messages = [
+                    {"role": "system", "content": "You are an expert HR consultant. Provide comprehensive analysis in JSON format only."},
+                    {"role": "user", "content": prompt}
+                ]
+                response = self._create_completion(
+                    messages=messages,
+                    estimated_tokens=estimated_tokens,
+                    depth=depth,
                     temperature=0.2,
-                    max_tokens=5000  # More conservative (reduced from 6000 to stay within limits)
+                    max_tokens=settings.groq_max_tokens
                 )
                 
                 raw_content = response.choices[0].message.content
-                logger.info(f"Raw response content (first 500 chars): {raw_content[:500]}")
-                logger.info(f"Response length: {len(raw_content) if raw_content else 0}")
-                logger.info(f"Response type: {type(raw_content)}")
+                truncated = response.choices[0].finish_reason == "length"
+                truncation_stats.record_completion(truncated)
+                if truncated and raw_content:
+                    with STAGE_SECONDS.time(stage="json_repair"):
+                        raw_content = self._recover_truncated_content(messages, raw_content, estimated_tokens, depth)
+                payload_sampler.debug(logger, "groq_raw_response", "Raw Groq response", raw_content)
                 
                 # Log if response contains common problematic patterns
                 if "Here is the detailed analysis" in raw_content:
@@ -430,7 +737,7 @@ class GroqService:
                 
                 try:
                     # Try to parse the raw content directly first
-                    result = json.loads(raw_content)
+                    result = self._parse_json(raw_content)
                     
                     # AI-BASED SECURITY VALIDATION (INTEGRATED IN SAME API CALL)
                     # The AI has already performed security validation as part of its analysis
@@ -444,9 +751,10 @@ class GroqService:
                         return result  # Return the validation error response directly
                     
                     # Validate and fix missing fields only for successful analyses
-                    result = self._validate_and_fix_response(result)
+                    with STAGE_SECONDS.time(stage="response_fixup"):
+                        result = self._validate_and_fix_response(result)
                     
-                    logger.info("Resume analysis completed successfully")
+                    logger.debug("Resume analysis completed successfully")
                     return result
                 except json.JSONDecodeError as e:
                     logger.warning(f"Direct JSON parsing failed, attempting to extract JSON from response: {e}")
@@ -456,8 +764,8 @@ class GroqService:
                         # Method 1: Clean and try to parse
                         cleaned_content = self._clean_json_content(raw_content)
                         if cleaned_content != raw_content:
-                            logger.debug(f"Cleaned content: {cleaned_content[:200]}...")
-                            result = json.loads(cleaned_content)
+                            payload_sampler.debug(logger, "groq_cleaned_content", "Cleaned content", cleaned_content)
+                            result = self._parse_json(cleaned_content)
                             
                             # Check for validation errors before applying fixes
                             if result.get("security_validation") == "Failed":
@@ -468,8 +776,9 @@ class GroqService:
                                 logger.error(f"AI detected invalid job description: {result.get('validation_error', 'Unknown validation error')}")
                                 return result
                             
-                            result = self._validate_and_fix_response(result)
-                            logger.info("Resume analysis completed successfully after content cleaning")
+                            with STAGE_SECONDS.time(stage="response_fixup"):
+                                result = self._validate_and_fix_response(result)
+                            logger.debug("Resume analysis completed successfully after content cleaning")
                             return result
                         
                         # Method 2: Look for JSON content between curly braces
@@ -478,8 +787,8 @@ class GroqService:
                         
                         if start_idx != -1 and end_idx > start_idx:
                             json_content = raw_content[start_idx:end_idx]
-                            logger.debug(f"Extracted JSON content: {json_content[:200]}...")
-                            result = json.loads(json_content)
+                            payload_sampler.debug(logger, "groq_extracted_json", "Extracted JSON content", json_content)
+                            result = self._parse_json(json_content)
                             
                             # Check for validation errors before applying fixes
                             if result.get("security_validation") == "Failed":
@@ -490,8 +799,9 @@ class GroqService:
                                 logger.error(f"AI detected invalid job description: {result.get('validation_error', 'Unknown validation error')}")
                                 return result
                             
-                            result = self._validate_and_fix_response(result)
-                            logger.info("Resume analysis completed successfully after JSON extraction")
+                            with STAGE_SECONDS.time(stage="response_fixup"):
+                                result = self._validate_and_fix_response(result)
+                            logger.debug("Resume analysis completed successfully after JSON extraction")
                             return result
                         
                         # Method 3: Try to find JSON after common prefixes
@@ -513,8 +823,8 @@ class GroqService:
                                 json_end = json_part.rfind('}') + 1
                                 if json_start != -1 and json_end > json_start:
                                     json_content = json_part[json_start:json_end]
-                                    logger.debug(f"Extracted JSON after prefix '{prefix}': {json_content[:200]}...")
-                                    result = json.loads(json_content)
+                                    payload_sampler.debug(logger, "groq_prefix_json", f"Extracted JSON after prefix '{prefix}'", json_content)
+                                    result = self._parse_json(json_content)
                                     
                                     # Check for validation errors before applying fixes
                                     if result.get("security_validation") == "Failed":
@@ -525,8 +835,9 @@ class GroqService:
                                         logger.error(f"AI detected invalid job description: {result.get('validation_error', 'Unknown validation error')}")
                                         return result
                                     
-                                    result = self._validate_and_fix_response(result)
-                                    logger.info("Resume analysis completed successfully after prefix-based extraction")
+                                    with STAGE_SECONDS.time(stage="response_fixup"):
+                                        result = self._validate_and_fix_response(result)
+                                    logger.debug("Resume analysis completed successfully after prefix-based extraction")
                                     return result
                         
                         logger.error("No JSON content found in response")
@@ -549,6 +860,158 @@ class GroqService:
             logger.error(f"Error in analyze_resume: {e}")
             return self._get_fallback_response()
     
+    def _recover_truncated_content(
+        self,
+        messages: List[Dict[str, str]],
+        partial: str,
+        estimated_tokens: int,
+        depth: str
+    ) -> str:
+        """
+        Recover a completion that hit max_tokens: ask the same model to continue
+        from where it stopped and splice the pieces, then, if the JSON is still
+        incomplete, close it at the last complete value so the missing sections
+        are filled in by _validate_and_fix_response.
+        """
+        logger.warning(f"Completion truncated at max_tokens={settings.groq_max_tokens} ({len(partial)} chars), requesting continuation")
+        content = partial
+        model = self.last_model
+        for _ in range(settings.groq_max_continuations):
+            continuation_messages = messages + [
+                {"role": "assistant", "content": content},
+                {"role": "user", "content": "Your previous response was cut off. Continue the JSON exactly where it stopped. Output only the remaining characters, without repeating earlier output, markdown or commentary."}
+            ]
+            try:
+                response = self._create_completion(
+                    messages=continuation_messages,
+                    estimated_tokens=estimated_tokens + self._estimate_tokens(content),
+                    depth=depth,
+                    prefer_model=model,
+                    temperature=0.2,
+                    max_tokens=settings.groq_continuation_max_tokens
+                )
+            except Exception as e:
+                logger.error(f"Continuation request failed: {e}")
+                break
+            truncation_stats.record_continuation()
+            continuation = response.choices[0].message.content or ""
+            if response.choices[0].finish_reason == "length":
+                content = self._splice_continuation(content, continuation)
+                continue
+            spliced = next(
+                (candidate for candidate in self._splice_candidates(content, continuation) if self._parses(candidate)),
+                None
+            )
+            if spliced is not None:
+                content = spliced
+                break
+            # Every way of joining the pieces is invalid JSON, so the continuation did not
+            # line up with the truncated text; ask for it again from the same point
+            logger.warning("Continuation does not splice into valid JSON, requesting it again")
+
+        try:
+            json.loads(self._clean_json_content(content))
+            truncation_stats.record_outcome("continued")
+            return content
+        except json.JSONDecodeError:
+            pass
+
+        repaired = self._close_truncated_json(content)
+        if repaired is not None:
+            try:
+                result = self._drop_incomplete_sections(json.loads(repaired))
+                truncation_stats.record_outcome("repaired")
+                logger.warning("Truncated completion repaired by closing the JSON; missing sections will use defaults")
+                return json.dumps(result)
+            except json.JSONDecodeError:
+                pass
+        truncation_stats.record_outcome("unrecovered")
+        return content
+
+    def _parses(self, content: str) -> bool:
+        try:
+            json.loads(self._clean_json_content(content))
+            return True
+        except json.JSONDecodeError:
+            return False
+
+    def _splice_continuation(self, content: str, continuation: str) -> str:
+        """Append a continuation, dropping markdown fences and any repeated overlap"""
+        return next(self._splice_candidates(content, continuation))
+
+    def _splice_candidates(self, content: str, continuation: str) -> Iterator[str]:
+        """
+        Yield the ways of joining a continuation to truncated content, most likely first:
+        a restarted document, then each overlap the model may have repeated (longest
+        first), then plain concatenation. Overlaps of up to 10 characters only count when
+        they start on a token or quote boundary, so that a restated partial word such as
+        'hello wor' + 'hello world' is merged while 'ab' + 'bc' is not.
+        """
+        continuation = re.sub(r'^\s*```(?:json)?\s*', '', continuation)
+        continuation = re.sub(r'\s*```\s*$', '', continuation)
+        stripped = continuation.lstrip()
+        if stripped.startswith('{') and self._parses(stripped):
+            # The model restarted the whole document instead of continuing it
+            yield stripped
+        for size in range(min(len(content), len(continuation), 200), 0, -1):
+            if not content.endswith(continuation[:size]):
+                continue
+            start = len(content) - size
+            if size > 10 or start == 0 or content[start - 1] in _TOKEN_BOUNDARY or continuation[0] in _TOKEN_BOUNDARY:
+                yield content + continuation[size:]
+        yield content + continuation
+
+    def _close_truncated_json(self, content: str) -> Optional[str]:
+        """Cut truncated JSON back to its last complete value and close open brackets"""
+        start = content.find('{')
+        if start == -1:
+            return None
+        content = content[start:]
+        stack: List[str] = []
+        in_string = False
+        escape = False
+        last_cut = None
+        for i, ch in enumerate(content):
+            if in_string:
+                if escape:
+                    escape = False
+                elif ch == '\\':
+                    escape = True
+                elif ch == '"':
+                    in_string = False
+                continue
+            if ch == '"':
+                in_string = True
+            elif ch in '{[':
+                stack.append('}' if ch == '{' else ']')
+            elif ch in '}]':
+                if stack:
+                    stack.pop()
+                if not stack:
+                    return content[:i + 1]
+                last_cut = (i + 1, list(stack))
+            elif ch == ',':
+                last_cut = (i, list(stack))
+        if last_cut is None:
+            return None
+        cut, open_brackets = last_cut
+        return content[:cut].rstrip().rstrip(',') + ''.join(reversed(open_brackets))
+
+    def _drop_incomplete_sections(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Remove report sections cut off mid-way so they are replaced with defaults"""
+        report = result.get("resume_analysis_report")
+        if not isinstance(report, dict):
+            return result
+        for name, field in ResumeAnalysisReport.model_fields.items():
+            if name not in report:
+                continue
+            try:
+                field.annotation(**report[name])
+            except Exception:
+                logger.warning(f"Dropping incomplete section '{name}' from truncated completion")
+                del report[name]
+        return result
+
     def _validate_and_fix_response(self, result: Dict[str, Any]) -> Dict[str, Any]:
         """Validate and fix missing fields in the AI response"""
         try:
@@ -593,7 +1056,7 @@ class GroqService:
                 report = result["resume_analysis_report"]
                 result["resume_analysis_report"] = self._validate_and_fix_analysis_report(report)
             
-            logger.info("Response validation and fixing completed successfully")
+            logger.debug("Response validation and fixing completed successfully")
             return result
             
         except Exception as e:
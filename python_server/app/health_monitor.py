@@ -0,0 +1,135 @@
+import asyncio
+import time
+import logging
+from datetime import datetime
+from typing import Dict, Any, Optional
+
+from .config import settings
+from .database import check_mongo_health
+from .groq_service import GroqService
+
+logger = logging.getLogger(__name__)
+
+
+def _psutil():
+    import psutil
+    return psutil
+
+
+class HealthMonitor:
+    """
+    Background prober for MongoDB, Groq and host resources.
+
+    Health endpoints read the cached snapshot instead of probing on every hit,
+    so load balancer polling costs neither tokens nor event loop time.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.started_at = time.time()
+        self.services: Dict[str, Dict[str, Any]] = {}
+        self.system: Optional[Dict[str, Any]] = None
+
+    def start(self):
+        if self._task is None:
+            _psutil().cpu_percent(interval=None)  # Prime the CPU counter; later calls measure since the last probe
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await self.probe_once()
+            await asyncio.sleep(settings.health_probe_interval)
+
+    async def probe_once(self):
+        mongo, groq = await asyncio.gather(
+            self._probe("mongo", check_mongo_health()),
+            self._probe("groq", self._check_groq()),
+        )
+        self.services = {"mongo": mongo, "groq": groq}
+        self.system = self._system_info()
+
+    async def _probe(self, name: str, check) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            status = await asyncio.wait_for(check, timeout=settings.health_probe_timeout)
+        except asyncio.TimeoutError:
+            status = {"status": "unhealthy", "error": f"{name} probe timed out"}
+        except Exception as e:
+            logger.warning(f"{name} health probe failed: {e}")
+            status = {"status": "unhealthy", "error": str(e)}
+        status["checked_at"] = time.time()
+        status["probe_seconds"] = round(time.perf_counter() - started, 3)
+        return status
+
+    async def _check_groq(self) -> Dict[str, Any]:
+        try:
+            groq_service = GroqService()
+        except ValueError as e:
+            return {"status": "unhealthy", "error": str(e), "api_key_configured": False}
+        return await groq_service.check_health()
+
+    def _system_info(self) -> Optional[Dict[str, Any]]:
+        try:
+            psutil = _psutil()
+            memory = psutil.virtual_memory()
+            disk = psutil.disk_usage('/')
+            return {
+                "cpu_percent": psutil.cpu_percent(interval=None),
+                "memory_percent": memory.percent,
+                "memory_available_gb": round(memory.available / (1024**3), 2),
+                "disk_percent": disk.percent,
+                "disk_free_gb": round(disk.free / (1024**3), 2)
+            }
+        except Exception as e:
+            logger.warning(f"Could not get system info: {e}")
+            return None
+
+    def service_status(self, name: str) -> Dict[str, Any]:
+        """Cached status of one service, annotated with its age and staleness"""
+        status = self.services.get(name)
+        if status is None:
+            return {"status": "unknown", "error": "Not probed yet", "stale": True}
+        age = time.time() - status["checked_at"]
+        return {
+            **status,
+            "checked_at": datetime.utcfromtimestamp(status["checked_at"]).isoformat(),
+            "age_seconds": round(age, 1),
+            "stale": age > settings.health_stale_after,
+        }
+
+    def overall_status(self) -> str:
+        mongo = self.service_status("mongo")
+        groq = self.service_status("groq")
+        mongo_healthy = mongo.get("status") == "connected" and not mongo["stale"]
+        groq_healthy = groq.get("status") == "healthy" and not groq["stale"]
+        if mongo_healthy and groq_healthy:
+            return "healthy"
+        elif mongo_healthy or groq_healthy:
+            return "degraded"
+        return "unhealthy"
+
+    def is_live(self) -> bool:
+        """Liveness: the process serves requests and the prober has not died"""
+        return self._task is None or not self._task.done()
+
+    def is_ready(self) -> bool:
+        """
+        Readiness: a fresh probe shows MongoDB connected. Groq is left out, so
+        an outage there does not pull every instance while history, status
+        and cached results keep working; /health reports it.
+        """
+        mongo = self.service_status("mongo")
+        return mongo.get("status") == "connected" and not mongo["stale"]
+
+
+# Global health monitor instance, started from the application lifespan
+health_monitor = HealthMonitor()
@@ -0,0 +1,105 @@
+import os
+import threading
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CompletionCancelled(Exception):
+    """A racing completion was abandoned because the other request answered first"""
+
+    def __init__(self, usage):
+        super().__init__("Completion attempt cancelled after hedge race")
+        self.usage = usage
+
+
+class HedgePolicy:
+    """
+    Decides when a slow Groq call gets a second, identical request.
+
+    The hedge delay is a percentile of recent single-attempt latencies. Every
+    request earns a fraction of a hedge token (groq_hedge_max_rate) and every
+    hedge spends a whole one, so hedges never exceed that share of traffic.
+    """
+
+    MAX_BUDGET = 10.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=settings.groq_hedge_window)
+        self._budget = 0.0
+        self.requests = 0
+        self.fired = 0
+        self.won = 0
+        self.denied = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.groq_hedge_enabled
+
+    def record_latency(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait for the primary call before hedging, None to not hedge"""
+        if not self.enabled:
+            return None
+        with self._lock:
+            self.requests += 1
+            self._budget = min(self._budget + settings.groq_hedge_max_rate, self.MAX_BUDGET)
+            if len(self._latencies) < settings.groq_hedge_min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * settings.groq_hedge_percentile / 100))
+        return ordered[index]
+
+    def try_fire(self) -> bool:
+        """Spend one hedge token, False when the hedge budget is exhausted"""
+        with self._lock:
+            if self._budget < 1:
+                self.denied += 1
+                return False
+            self._budget -= 1
+            self.fired += 1
+            return True
+
+    def record_win(self):
+        with self._lock:
+            self.won += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "requests": self.requests,
+                "hedges_fired": self.fired,
+                "hedges_won": self.won,
+                "hedges_denied_by_budget": self.denied,
+                "latency_samples": len(self._latencies),
+            }
+
+
+def hedge_workers() -> int:
+    """
+    Threads for racing attempts. analyze_resume runs on asyncio's default
+    executor (min(32, CPU count + 4) threads), so by default every one of
+    those calls gets room for a primary and a hedge and the race never
+    caps LLM concurrency below that of the analyses.
+    """
+    if settings.groq_hedge_max_workers > 0:
+        return settings.groq_hedge_max_workers
+    return 2 * min(32, (os.cpu_count() or 1) + 4)
+
+
+# Global hedge policy and the threads primary/hedge attempts race on
+hedge_policy = HedgePolicy()
+hedge_executor = ThreadPoolExecutor(
+    max_workers=hedge_workers(),
+    thread_name_prefix="groq-hedge"
+)
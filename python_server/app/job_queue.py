@@ -0,0 +1,163 @@
+import asyncio
+import itertools
+import logging
+from typing import Optional, Callable, Awaitable, List, Dict, Any
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Shorter analyses are served first so quick requests aren't stuck behind detailed ones
+JOB_PRIORITIES = {"quick": 2, "standard": 1, "detailed": 0}
+
+ABANDONED_ON_SHUTDOWN = "Server restarted before the analysis could run, please try again"
+ABANDONED_ON_FAILURE = "AI analysis failed, please try again"
+
+
+class AnalysisJob:
+    """Inputs of a queued analysis: the text the /analyze request extracted and validated"""
+
+    def __init__(
+        self,
+        analysisId: str,
+        userId: str,
+        resume_text: str,
+        resumeFilename: str,
+        job_description_text: str,
+        jobDescriptionFilename: str,
+        depth: str = "standard",
+        inputStats: Optional[Dict[str, Any]] = None,
+        priority: Optional[int] = None,
+    ):
+        self.analysisId = analysisId
+        self.userId = userId
+        self.resume_text = resume_text
+        self.resumeFilename = resumeFilename
+        self.job_description_text = job_description_text
+        self.jobDescriptionFilename = jobDescriptionFilename
+        self.depth = depth
+        self.inputStats = inputStats or {}
+        self.priority = JOB_PRIORITIES.get(depth, 0) if priority is None else priority
+
+    def to_payload(self) -> Dict[str, Any]:
+        return {
+            "resume_text": self.resume_text,
+            "resumeFilename": self.resumeFilename,
+            "job_description_text": self.job_description_text,
+            "jobDescriptionFilename": self.jobDescriptionFilename,
+            "depth": self.depth,
+            "inputStats": self.inputStats,
+        }
+
+    @classmethod
+    def from_payload(cls, analysisId: str, userId: str, priority: int, payload: Dict[str, Any]) -> "AnalysisJob":
+        return cls(analysisId=analysisId, userId=userId, priority=priority, **payload)
+
+
+class AnalysisJobQueue:
+    """
+    Bounded in-process queue of analysis jobs served by a fixed pool of
+    worker tasks, highest priority first. On shutdown it stops accepting
+    jobs and drains the queue for up to graceful_shutdown_timeout seconds.
+    """
+
+    name = "memory"
+
+    def __init__(self, maxsize: int, workers: int):
+        self.maxsize = maxsize
+        self.worker_count = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._handler: Optional[Callable[[AnalysisJob], Awaitable[None]]] = None
+        self._on_abandoned: Optional[Callable[[AnalysisJob, str], Awaitable[None]]] = None
+        self._sequence = itertools.count()
+        self.accepting = False
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+
+    async def start(
+        self,
+        handler: Callable[[AnalysisJob], Awaitable[None]],
+        on_abandoned: Optional[Callable[[AnalysisJob, str], Awaitable[None]]] = None
+    ):
+        """
+        Start the workers. `handler` runs a job and raises when it failed;
+        `on_abandoned` is called with a reason for jobs that will never run.
+        """
+        self._queue = asyncio.PriorityQueue(maxsize=self.maxsize)
+        self._handler = handler
+        self._on_abandoned = on_abandoned
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.worker_count)]
+        self.accepting = True
+        logger.info(f"Analysis job queue started with {self.worker_count} workers")
+
+    async def full(self) -> bool:
+        return not self.accepting or self._queue.full()
+
+    async def enqueue(self, job: AnalysisJob) -> bool:
+        """Add a job, returning False when the queue is full or shutting down"""
+        if await self.full():
+            return False
+        self._queue.put_nowait((-job.priority, next(self._sequence), job))
+        return True
+
+    async def _worker(self, index: int):
+        while True:
+            _, _, job = await self._queue.get()
+            self.active += 1
+            try:
+                await self._handler(job)
+                self.completed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Analysis job {job.analysisId} failed in worker {index}: {e}")
+                if self._on_abandoned:
+                    await self._on_abandoned(job, ABANDONED_ON_FAILURE)
+            finally:
+                self.active -= 1
+                self._queue.task_done()
+
+    async def stop(self, timeout: float):
+        """Stop accepting jobs, drain what is queued, then cancel the workers"""
+        if self._queue is None:
+            return
+        self.accepting = False
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Analysis queue not drained after {timeout}s, abandoning remaining jobs")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        while not self._queue.empty():
+            _, _, job = self._queue.get_nowait()
+            if self._on_abandoned:
+                await self._on_abandoned(job, ABANDONED_ON_SHUTDOWN)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "accepting": self.accepting,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "max_queued": self.maxsize,
+            "active": self.active,
+            "workers": self.worker_count,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+def create_analysis_queue():
+    """Build the queue selected by settings.analysis_queue_backend"""
+    backend = settings.analysis_queue_backend
+    if backend == "mongo":
+        from .distributed_queue import MongoAnalysisJobQueue
+        return MongoAnalysisJobQueue(settings.analysis_jobs_collection, settings.analysis_queue_size, settings.analysis_workers)
+    if backend != "memory":
+        logger.warning(f"Unknown analysis queue backend '{backend}', using the in-process queue")
+    return AnalysisJobQueue(settings.analysis_queue_size, settings.analysis_workers)
+
+
+# Global analysis job queue, started from the application lifespan
+analysis_queue = create_analysis_queue()
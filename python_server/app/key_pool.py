@@ -0,0 +1,221 @@
+import time
+import threading
+import logging
+from typing import Dict, List, Optional, Any, Iterable, TYPE_CHECKING
+
+from .config import settings
+
+if TYPE_CHECKING:
+    from groq import Groq
+
+logger = logging.getLogger(__name__)
+
+
+def parse_reset_seconds(value: Optional[str]) -> Optional[float]:
+    """Parse Groq reset/retry values such as '2.5', '7.66s', '1m30s' or '250ms' into seconds"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    total = 0.0
+    number = ""
+    i = 0
+    while i < len(value):
+        ch = value[i]
+        if ch.isdigit() or ch == ".":
+            number += ch
+        elif value.startswith("ms", i):
+            total += float(number or 0) / 1000
+            number = ""
+            i += 1
+        elif ch in "hms":
+            total += float(number or 0) * {"h": 3600, "m": 60, "s": 1}[ch]
+            number = ""
+        else:
+            return None
+        i += 1
+    return total
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+class ModelQuota:
+    """Rate-limit window reported by Groq for one key and model"""
+
+    def __init__(self):
+        self.limit_requests: Optional[int] = None
+        self.remaining_requests: Optional[int] = None
+        self.limit_tokens: Optional[int] = None
+        self.remaining_tokens: Optional[int] = None
+        self.reset_at = 0.0
+
+    def known(self, now: float) -> bool:
+        # Header values only describe the current rate-limit window
+        return now < self.reset_at
+
+    def update(self, headers: Any):
+        values = {
+            "limit_requests": headers.get("x-ratelimit-limit-requests"),
+            "remaining_requests": headers.get("x-ratelimit-remaining-requests"),
+            "limit_tokens": headers.get("x-ratelimit-limit-tokens"),
+            "remaining_tokens": headers.get("x-ratelimit-remaining-tokens"),
+        }
+        if values["remaining_requests"] is None and values["remaining_tokens"] is None:
+            return
+        for name, value in values.items():
+            if value is not None:
+                setattr(self, name, int(float(value)))
+        reset = parse_reset_seconds(headers.get("x-ratelimit-reset-tokens")) or 60.0
+        self.reset_at = time.time() + reset
+
+
+class PooledKey:
+    """One Groq API key with its own long-lived client"""
+
+    def __init__(self, index: int, api_key: str):
+        self.index = index
+        self.label = f"key-{index}:...{api_key[-4:]}"
+        self._api_key = api_key
+        self._client: Optional["Groq"] = None
+        self._client_lock = threading.Lock()
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.rate_limited = 0
+        self.cooldown_until = 0.0
+        self.last_used = 0.0
+        self.quotas: Dict[str, ModelQuota] = {}
+
+    @property
+    def client(self) -> "Groq":
+        """Created on first use, so importing the app does not import the groq SDK"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    from groq import Groq
+                    self._client = Groq(api_key=self._api_key)
+        return self._client
+
+    def quota(self, model: str) -> ModelQuota:
+        if model not in self.quotas:
+            self.quotas[model] = ModelQuota()
+        return self.quotas[model]
+
+    def budget(self, model: str, estimated_tokens: int, now: float) -> Optional[float]:
+        """Remaining token budget for a model after in-flight calls, None when exhausted"""
+        if now < self.cooldown_until:
+            return None
+        quota = self.quotas.get(model)
+        if quota is None or not quota.known(now):
+            # Nothing reported for this window yet, assume a fresh quota
+            return float("inf")
+        if quota.remaining_requests is not None and quota.remaining_requests <= self.in_flight:
+            return None
+        if quota.remaining_tokens is None:
+            return float("inf")
+        remaining = quota.remaining_tokens - self.in_flight * estimated_tokens
+        return remaining if remaining >= estimated_tokens else None
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        models = {}
+        for model, quota in self.quotas.items():
+            if not quota.known(now):
+                continue
+            utilization = None
+            if quota.limit_requests and quota.remaining_requests is not None:
+                utilization = round(1 - quota.remaining_requests / quota.limit_requests, 3)
+            models[model] = {
+                "remaining_requests": quota.remaining_requests,
+                "remaining_tokens": quota.remaining_tokens,
+                "request_utilization": utilization,
+            }
+        return {
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "rate_limited": self.rate_limited,
+            "cooling_down": now < self.cooldown_until,
+            "cooldown_remaining_seconds": round(max(0.0, self.cooldown_until - now), 1),
+            "models": models,
+        }
+
+
+class GroqKeyPool:
+    """
+    Least-loaded pool of Groq API keys.
+
+    Each call goes to the key with the most remaining token budget for the
+    requested model; keys that returned 429 are skipped until their
+    retry-after (or the configured cooldown) has passed.
+    """
+
+    def __init__(self, api_keys: List[str]):
+        self._lock = threading.Lock()
+        self.keys = [PooledKey(i, key) for i, key in enumerate(api_keys)]
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def primary_client(self) -> Optional["Groq"]:
+        return self.keys[0].client if self.keys else None
+
+    def has_capacity(self, model: str, estimated_tokens: int) -> bool:
+        now = time.time()
+        with self._lock:
+            return any(k.budget(model, estimated_tokens, now) is not None for k in self.keys)
+
+    def acquire(self, model: str, estimated_tokens: int, exclude: Iterable[PooledKey] = ()) -> Optional[PooledKey]:
+        """Reserve the least-loaded key for a call, or None if every key is exhausted"""
+        now = time.time()
+        excluded = {k.index for k in exclude}
+        with self._lock:
+            best = None
+            best_rank = None
+            for key in self.keys:
+                if key.index in excluded:
+                    continue
+                budget = key.budget(model, estimated_tokens, now)
+                if budget is None:
+                    continue
+                rank = (budget, -key.in_flight, -key.last_used)
+                if best_rank is None or rank > best_rank:
+                    best, best_rank = key, rank
+            if best is not None:
+                best.in_flight += 1
+                best.requests += 1
+                best.last_used = now
+            return best
+
+    def release(self, key: PooledKey, model: str, headers: Optional[Any] = None, error: Optional[Exception] = None):
+        """Return a key after a call, updating its quota or cooldown"""
+        with self._lock:
+            key.in_flight = max(0, key.in_flight - 1)
+            if headers is not None:
+                key.quota(model).update(headers)
+            if error is None:
+                return
+            key.failures += 1
+            response = getattr(error, "response", None)
+            if response is not None:
+                key.quota(model).update(response.headers)
+            if is_rate_limit_error(error):
+                key.rate_limited += 1
+                retry_after = parse_reset_seconds(response.headers.get("retry-after")) if response is not None else None
+                cooldown = retry_after or settings.groq_key_cooldown
+                key.cooldown_until = time.time() + cooldown
+                logger.warning(f"Groq {key.label} rate limited, cooling down for {cooldown:.1f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            return {key.label: key.to_dict(now) for key in self.keys}
+
+
+# Global key pool, shared by every GroqService so clients and their connections are reused
+groq_key_pool = GroqKeyPool(settings.groq_api_keys_list)
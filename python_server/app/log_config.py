@@ -0,0 +1,159 @@
+import os
+import re
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, Tuple
+
+from .config import settings
+
+# ID of the request (or queued analysis) being handled, attached to every log record
+request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+
+# Secrets that must never reach the logs, with their replacements
+REDACTIONS = (
+    (re.compile(r"gsk_[A-Za-z0-9]{8,}"), "gsk_[REDACTED]"),
+    (re.compile(r"(?i)(bearer\s+)[A-Za-z0-9\-_.=]+"), r"\1[REDACTED]"),
+    (re.compile(r"eyJ[A-Za-z0-9_-]+\.eyJ[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+"), "[REDACTED_JWT]"),
+    (re.compile(r"(mongodb(?:\+srv)?://)[^:/@\s]+:[^@\s]+@"), r"\1[REDACTED]@"),
+    (re.compile(r"(?i)((?:api[_-]?key|secret|password|token)[\"']?\s*[:=]\s*[\"']?)[^\s\"',}]+"), r"\1[REDACTED]"),
+)
+
+# Record attributes that are not user-supplied `extra` fields
+_STANDARD_ATTRS = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "request_id"}
+
+
+def redact(text: str) -> str:
+    for pattern, replacement in REDACTIONS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamps records with the current request ID; handler filters run in the caller's thread and context"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class RedactingFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return redact(super().format(record))
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including any `extra` fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "requestId": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        return redact(json.dumps(entry, default=str, ensure_ascii=False))
+
+
+class PayloadSampler:
+    """
+    Rate-limits logging of large debug payloads (raw model output and the
+    like): at most one payload per key every log_payload_interval seconds,
+    truncated to log_payload_chars. Suppressed payloads are counted and
+    reported with the next one that is logged.
+    """
+
+    def __init__(self):
+        self._last: Dict[str, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def debug(self, logger: logging.Logger, key: str, label: str, payload: Optional[str]):
+        if not logger.isEnabledFor(logging.DEBUG) or payload is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            last, suppressed = self._last.get(key, (0.0, 0))
+            if now - last < settings.log_payload_interval:
+                self._last[key] = (last, suppressed + 1)
+                return
+            self._last[key] = (now, 0)
+        limit = settings.log_payload_chars
+        logger.debug(
+            f"{label} ({len(payload)} chars, {suppressed} suppressed since last sample): {payload[:limit]}"
+            + ("..." if len(payload) > limit else "")
+        )
+
+
+# Global payload sampler instance
+payload_sampler = PayloadSampler()
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+
+def _build_output_handler() -> logging.Handler:
+    handler = logging.StreamHandler(sys.stderr)
+    if settings.log_format == "json":
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(RedactingFormatter("%(asctime)s - %(levelname)s - [%(request_id)s] %(name)s - %(message)s"))
+    return handler
+
+
+def _start_listener():
+    global _listener
+    log_queue = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = QueueListener(log_queue, _build_output_handler(), respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logging():
+    """
+    Route all logging (including uvicorn's) through a QueueHandler, so
+    callers on the event loop only enqueue records; a listener thread
+    formats, redacts and writes them. Safe to call more than once.
+    """
+    global _queue_handler
+    if _queue_handler is not None:
+        return
+    _queue_handler = QueueHandler(queue.SimpleQueue())
+    _queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(settings.log_level.upper())
+
+    # uvicorn's own handlers would write synchronously; let its loggers propagate to the queue instead
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+    for name in ("pymongo", "motor", "urllib3", "httpx"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    _start_listener()
+    atexit.register(stop_logging)
+    # The listener thread does not survive fork (serve.py workers); start a fresh one in each child
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_start_listener)
@@ -0,0 +1,116 @@
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from typing import Dict, Any, Optional
+
+from .config import settings
+from .metrics import LOOP_LAG_SECONDS, LOOP_STALLS
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    """
+    Measures event-loop scheduling lag and reports what blocks the loop.
+
+    A task sleeps loop_monitor_interval seconds at a time and records how
+    late it wakes up. Because a blocked loop cannot run that task, a
+    watchdog thread also checks the task's heartbeat; once the loop has
+    been stuck for loop_lag_threshold seconds it logs the loop thread's
+    current stack, i.e. the synchronous code doing the blocking. With
+    loop_slow_callback_ms set, asyncio debug mode additionally logs every
+    callback or task step that runs longer than that.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat = time.monotonic()
+        self._stall_reported = False
+        self._last_stack_logged = 0.0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.stacks_logged = 0
+
+    async def _run(self):
+        interval = settings.loop_monitor_interval
+        while True:
+            expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            lag = max(0.0, now - expected)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            LOOP_LAG_SECONDS.observe(lag)
+            if lag >= settings.loop_lag_threshold:
+                self.stalls += 1
+                LOOP_STALLS.inc()
+
+    def _watch(self):
+        threshold = settings.loop_lag_threshold
+        while not self._stopped.wait(threshold / 2):
+            blocked = time.monotonic() - self._heartbeat - settings.loop_monitor_interval
+            if blocked < threshold:
+                self._stall_reported = False
+                continue
+            # One stack per stall, and at most one every loop_stall_log_interval seconds
+            if self._stall_reported:
+                continue
+            self._stall_reported = True
+            now = time.monotonic()
+            if now - self._last_stack_logged < settings.loop_stall_log_interval:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            self._last_stack_logged = now
+            self.stacks_logged += 1
+            stack = "".join(traceback.format_stack(frame))
+            logger.warning(f"Event loop blocked for at least {blocked * 1000:.0f}ms; loop thread stack:\n{stack}")
+
+    def start(self):
+        if self._task is not None or settings.loop_monitor_interval <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        if settings.loop_slow_callback_ms > 0:
+            # asyncio logs "Executing <Task ...> took X seconds" for every slower step
+            loop.set_debug(True)
+            loop.slow_callback_duration = settings.loop_slow_callback_ms / 1000
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._run())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join)
+            self._watchdog = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self._task is not None,
+            "last_lag_ms": round(self.last_lag * 1000, 2),
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "stalls": self.stalls,
+            "stacks_logged": self.stacks_logged,
+            "threshold_ms": round(settings.loop_lag_threshold * 1000, 1),
+            "slow_callback_ms": settings.loop_slow_callback_ms or None,
+        }
+
+
+# Global event loop monitor instance, started from the application lifespan
+loop_monitor = LoopMonitor()
@@ -0,0 +1,172 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+import tracemalloc
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, Any, Optional
+
+from .config import settings
+from .metrics import MEMORY_RSS_DELTA_BYTES, MEMORY_BUDGET_WAITS
+from .request_timing import current_timing, record_stage, record_input
+
+logger = logging.getLogger(__name__)
+
+# psutil.Process of this process, created on first use
+_process = None
+_process_pid: Optional[int] = None
+
+# Only one stage is traced at a time, so its peak is not mixed with another traced stage's
+_trace_lock = threading.Lock()
+
+
+def _psutil():
+    import psutil
+    return psutil
+
+
+class MemoryBudgetTimeout(Exception):
+    """Raised when an extraction waited memory_budget_wait_seconds without fitting in the budget"""
+
+
+def rss_bytes() -> int:
+    """Resident set size of this process"""
+    global _process, _process_pid
+    if os.getpid() != _process_pid:
+        # First call, or a forked worker (serve.py): psutil.Process is bound to the pid it was created with
+        _process, _process_pid = _psutil().Process(os.getpid()), os.getpid()
+    return _process.memory_info().rss
+
+
+def estimate_document_bytes(content: Optional[bytes], filename: Optional[str]) -> int:
+    """Working memory an upload is expected to need while it is parsed, from its size and format"""
+    if not content:
+        return 0
+    name = (filename or "").lower()
+    if name.endswith(".pdf") or content[:5] == b"%PDF-":
+        factor = settings.memory_pdf_expansion
+    elif name.endswith(".docx") or content[:2] == b"PK":
+        factor = settings.memory_docx_expansion
+    else:
+        factor = settings.memory_text_expansion
+    return int(len(content) * factor)
+
+
+def start_allocation_tracing():
+    """Start tracemalloc when a share of stages is to be traced (debug; every allocation gets slower)"""
+    if settings.memory_trace_sample_rate > 0 and not tracemalloc.is_tracing():
+        tracemalloc.start(1)
+        logger.info(f"Tracing allocations for {settings.memory_trace_sample_rate:.0%} of measured stages")
+
+
+@contextmanager
+def measure_memory(stage: str):
+    """
+    Record a stage's memory on the current request: the RSS delta always
+    (process-wide, so concurrent requests show up in it, and freed memory
+    is not always returned to the OS), and for a sample of stages while
+    tracemalloc runs, the peak of Python allocations above the stage's
+    starting point.
+    """
+    traced = (
+        tracemalloc.is_tracing()
+        and random.random() < settings.memory_trace_sample_rate
+        and _trace_lock.acquire(blocking=False)
+    )
+    try:
+        if traced:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        rss_before = rss_bytes()
+        try:
+            yield
+        finally:
+            delta = rss_bytes() - rss_before
+            MEMORY_RSS_DELTA_BYTES.observe(max(delta, 0), stage=stage)
+            timing = current_timing.get()
+            if timing is not None:
+                timing.add_memory(stage, "rssDeltaKb", delta // 1024)
+                if traced:
+                    peak = tracemalloc.get_traced_memory()[1] - baseline
+                    timing.add_memory(stage, "peakAllocatedKb", max(peak, 0) // 1024)
+    finally:
+        if traced:
+            _trace_lock.release()
+
+
+class MemoryBudget:
+    """
+    Bounds the estimated working memory of extractions running at once in
+    this process. A reservation that would push the total over
+    memory_budget_mb waits until running extractions release theirs; one
+    extraction is always admitted when nothing else runs, so an upload
+    larger than the whole budget still completes.
+    """
+
+    def __init__(self):
+        self._condition = asyncio.Condition()
+        self.in_use = 0
+        self.peak = 0
+        self.active = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+
+    def _fits(self, amount: int, budget: int) -> bool:
+        return self.active == 0 or self.in_use + amount <= budget
+
+    @asynccontextmanager
+    async def reserve(self, amount: int):
+        budget = settings.memory_budget_mb * 1024 * 1024
+        if budget <= 0:
+            yield
+            return
+        record_input("estimatedMemoryKb", amount // 1024)
+        async with self._condition:
+            if not self._fits(amount, budget):
+                self.waits += 1
+                started = time.perf_counter()
+                try:
+                    await asyncio.wait_for(
+                        self._condition.wait_for(lambda: self._fits(amount, budget)),
+                        timeout=settings.memory_budget_wait_seconds,
+                    )
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    MEMORY_BUDGET_WAITS.inc(outcome="timeout")
+                    raise MemoryBudgetTimeout(
+                        f"Waited {settings.memory_budget_wait_seconds}s for {amount // 1024} KB of extraction memory"
+                    )
+                waited = time.perf_counter() - started
+                self.wait_seconds += waited
+                record_stage("memory_wait", waited)
+                MEMORY_BUDGET_WAITS.inc(outcome="admitted")
+            self.in_use += amount
+            self.active += 1
+            self.peak = max(self.peak, self.in_use)
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.in_use -= amount
+                self.active -= 1
+                self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "budget_mb": settings.memory_budget_mb or None,
+            "in_use_mb": round(self.in_use / (1024 * 1024), 1),
+            "peak_mb": round(self.peak / (1024 * 1024), 1),
+            "active_extractions": self.active,
+            "waits": self.waits,
+            "timeouts": self.timeouts,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "rss_mb": round(rss_bytes() / (1024 * 1024), 1),
+            "allocation_tracing": tracemalloc.is_tracing(),
+        }
+
+
+# Global extraction memory budget instance
+memory_budget = MemoryBudget()
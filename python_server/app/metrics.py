@@ -0,0 +1,407 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Any, List, Tuple, Optional, Callable
+
+try:
+    import fcntl
+except ImportError:  # Windows: serve.py runs a single worker there
+    fcntl = None
+
+from .config import settings
+from .request_timing import record_stage
+
+logger = logging.getLogger(__name__)
+
+# Snapshot of all exited workers in metrics_dir
+RETIRED_SNAPSHOT = "retired.json"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+
+class Metric:
+    """
+    Base for metrics whose values are sharded per thread: each thread only
+    ever writes its own dict, so recording needs no lock (the request path,
+    to_thread workers and hedge threads never contend). Collection sums the
+    shards.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = labelnames
+        self._local = threading.local()
+        self._shards: List[Dict[tuple, Any]] = []
+        self._shards_lock = threading.Lock()
+
+    def _shard(self) -> Dict[tuple, Any]:
+        shard = getattr(self._local, "values", None)
+        if shard is None:
+            shard = {}
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.values = shard
+        return shard
+
+    def _key(self, labels: Dict[str, Any]) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _copies(self) -> List[Dict[tuple, Any]]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        # dict() copies under the GIL, so a concurrent insert can't break iteration
+        return [dict(shard) for shard in shards]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def collect(self) -> Dict[tuple, float]:
+        totals: Dict[tuple, float] = {}
+        for shard in self._copies():
+            for key, value in shard.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+        timing_stage: Optional[Callable[[Dict[str, Any]], str]] = None,
+    ):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Maps an observation's labels to a stage of the current request's timing
+        self.timing_stage = timing_stage
+
+    def observe(self, value: float, **labels):
+        shard = self._shard()
+        key = self._key(labels)
+        entry = shard.get(key)
+        if entry is None:
+            # Per-bucket (non-cumulative) counts with a final +Inf bucket, sum, count
+            entry = shard[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+        if self.timing_stage is not None:
+            record_stage(self.timing_stage(labels), value)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def collect(self) -> Dict[tuple, list]:
+        totals: Dict[tuple, list] = {}
+        for shard in self._copies():
+            for key, (counts, total, count) in shard.items():
+                entry = totals.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+                entry[2] += count
+        return totals
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class MetricsRegistry:
+    """
+    Holds the application metrics and renders them in the Prometheus text
+    format. When metrics_dir is set (serve.py sets it for multi-worker runs)
+    every worker periodically writes its snapshot there as
+    <pid>-<start>.json, and /metrics on any worker merges all snapshots, so
+    scrapes see totals for the whole server whichever worker answers.
+    Snapshots of exited workers are folded into retired.json, so counters
+    never go backwards and the directory does not grow with restarts.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._snapshot_pid: Optional[int] = None
+        self._snapshot_name = ""
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help_text, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+        timing_stage: Optional[Callable[[Dict[str, Any]], str]] = None,
+    ) -> Histogram:
+        return self._register(Histogram(name, help_text, labelnames, buckets, timing_stage))
+
+    def _register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = {}
+        for metric in self._metrics.values():
+            entry = {"type": metric.kind, "help": metric.help, "labelnames": list(metric.labelnames),
+                     "values": [[list(key), value] for key, value in metric.collect().items()]}
+            if isinstance(metric, Histogram):
+                entry["buckets"] = list(metric.buckets)
+            snapshot[metric.name] = entry
+        return snapshot
+
+    @staticmethod
+    def merge(snapshots: List[Dict[str, Any]]) -> Dict[str, Any]:
+        merged: Dict[str, Any] = {}
+        for snapshot in snapshots:
+            for name, entry in snapshot.items():
+                target = merged.setdefault(name, {**entry, "values": {}})
+                for key, value in entry["values"]:
+                    key = tuple(key)
+                    if entry["type"] == "histogram":
+                        current = target["values"].get(key)
+                        if current is None or len(current[0]) != len(value[0]):
+                            target["values"][key] = [list(value[0]), value[1], value[2]]
+                        else:
+                            current[0] = [a + b for a, b in zip(current[0], value[0])]
+                            current[1] += value[1]
+                            current[2] += value[2]
+                    else:
+                        target["values"][key] = target["values"].get(key, 0) + value
+        return merged
+
+    def _own_snapshot_name(self) -> str:
+        """
+        This process' snapshot file name. The start time sets it apart from an
+        exited worker whose pid was reused, which would otherwise overwrite
+        that worker's counters and make them go backwards.
+        """
+        if self._snapshot_pid != os.getpid():
+            # Set again after a fork (serve.py), since workers inherit the registry
+            self._snapshot_pid = os.getpid()
+            self._snapshot_name = f"{self._snapshot_pid}-{time.time_ns()}.json"
+        return self._snapshot_name
+
+    @staticmethod
+    def _write_json(path: str, data: Dict[str, Any]):
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, path)
+
+    def write_snapshot(self):
+        if not settings.metrics_dir:
+            return
+        self._write_json(os.path.join(settings.metrics_dir, self._own_snapshot_name()), self.snapshot())
+
+    @contextmanager
+    def _directory_lock(self, exclusive: bool):
+        """Readers share it; folding takes it exclusively so no scrape counts a worker twice"""
+        with open(os.path.join(settings.metrics_dir, "snapshots.lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    @staticmethod
+    def _process_exists(pid: int) -> bool:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def fold_retired(self):
+        """Merge the snapshots of exited workers into retired.json and delete them"""
+        if not settings.metrics_dir or not os.path.isdir(settings.metrics_dir):
+            return
+        with self._directory_lock(exclusive=True):
+            dead = []
+            for filename in os.listdir(settings.metrics_dir):
+                pid = filename.split("-", 1)[0]
+                if filename.endswith(".json") and pid.isdigit() and not self._process_exists(int(pid)):
+                    dead.append(filename)
+            if not dead:
+                return
+            retired_path = os.path.join(settings.metrics_dir, RETIRED_SNAPSHOT)
+            snapshots = []
+            for filename in [RETIRED_SNAPSHOT] + dead:
+                try:
+                    with open(os.path.join(settings.metrics_dir, filename)) as f:
+                        snapshots.append(json.load(f))
+                except FileNotFoundError:
+                    continue
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Dropping unreadable metrics snapshot {filename}: {e}")
+            retired = {
+                name: {**entry, "values": [[list(key), value] for key, value in entry["values"].items()]}
+                for name, entry in self.merge(snapshots).items()
+            }
+            # Written before the dead files are removed, so a crash in between never loses counts
+            self._write_json(retired_path, retired)
+            for filename in dead:
+                os.remove(os.path.join(settings.metrics_dir, filename))
+        logger.info(f"Folded {len(dead)} exited workers' metric snapshots into {RETIRED_SNAPSHOT}")
+
+    def _read_snapshots(self) -> List[Dict[str, Any]]:
+        snapshots = [self.snapshot()]
+        if not settings.metrics_dir or not os.path.isdir(settings.metrics_dir):
+            return snapshots
+        own = self._own_snapshot_name()
+        with self._directory_lock(exclusive=False):
+            for filename in os.listdir(settings.metrics_dir):
+                if not filename.endswith(".json") or filename == own:
+                    continue
+                try:
+                    with open(os.path.join(settings.metrics_dir, filename)) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Skipping unreadable metrics snapshot {filename}: {e}")
+        return snapshots
+
+    def render(self) -> str:
+        """All workers' metrics in the Prometheus text exposition format"""
+        lines = []
+        for name, entry in sorted(self.merge(self._read_snapshots()).items()):
+            labelnames = entry["labelnames"]
+            lines.append(f"# HELP {name} {entry['help']}")
+            lines.append(f"# TYPE {name} {entry['type']}")
+            for key, value in sorted(entry["values"].items()):
+                if entry["type"] == "histogram":
+                    counts, total, count = value
+                    cumulative = 0
+                    for bound, bucket_count in zip(list(entry["buckets"]) + [float("inf")], counts):
+                        cumulative += bucket_count
+                        le = _format_number(bound) if bound != float("inf") else "+Inf"
+                        lines.append(f"{name}_bucket{_format_labels(labelnames, key, ('le', le))} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_number(total)}")
+                    lines.append(f"{name}_count{_format_labels(labelnames, key)} {count}")
+                else:
+                    lines.append(f"{name}{_format_labels(labelnames, key)} {_format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    async def _run_writer(self):
+        while True:
+            await asyncio.sleep(settings.metrics_flush_interval)
+            try:
+                await asyncio.to_thread(self.write_snapshot)
+                await asyncio.to_thread(self.fold_retired)
+            except Exception as e:
+                logger.warning(f"Failed to write metrics snapshot: {e}")
+
+    def start(self):
+        """Start publishing this worker's snapshot when metrics are shared across workers"""
+        if settings.metrics_dir and self._task is None:
+            os.makedirs(settings.metrics_dir, exist_ok=True)
+            self._task = asyncio.create_task(self._run_writer())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+            self.write_snapshot()
+
+
+# Global metrics registry and the application's metrics
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram(
+    "resume_analyzer_stage_duration_seconds",
+    "Time spent in each stage of an analysis request",
+    ("stage",),
+    timing_stage=lambda labels: labels["stage"],
+)
+EXTRACTION_SECONDS = metrics.histogram(
+    "resume_analyzer_extraction_duration_seconds",
+    "Text extraction time per engine",
+    ("engine", "outcome"),
+    timing_stage=lambda labels: "extraction",
+)
+LLM_SECONDS = metrics.histogram(
+    "resume_analyzer_llm_request_duration_seconds",
+    "Groq chat completion latency per model and API key",
+    ("model", "key", "outcome"),
+    buckets=(0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 7.5, 10.0, 15.0, 20.0, 30.0, 45.0, 60.0, 90.0),
+)
+LLM_TOKENS = metrics.counter(
+    "resume_analyzer_llm_tokens_total",
+    "Tokens reported by Groq usage, by model and kind (prompt/completion)",
+    ("model", "kind"),
+)
+FALLBACK_RESPONSES = metrics.counter(
+    "resume_analyzer_fallback_responses_total",
+    "Analyses answered with the canned fallback response",
+)
+VALIDATION_REJECTIONS = metrics.counter(
+    "resume_analyzer_validation_rejections_total",
+    "Analysis requests rejected by input or AI validation",
+    ("reason",),
+)
+LOOP_LAG_SECONDS = metrics.histogram(
+    "resume_analyzer_event_loop_lag_seconds",
+    "How late the event loop ran a timer it was asked to run, sampled continuously",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+LOOP_STALLS = metrics.counter(
+    "resume_analyzer_event_loop_stalls_total",
+    "Lag samples at or above loop_lag_threshold",
+)
+MEMORY_RSS_DELTA_BYTES = metrics.histogram(
+    "resume_analyzer_memory_rss_delta_bytes",
+    "Growth of the process RSS across a stage of an analysis (process-wide, so concurrent requests add to it)",
+    ("stage",),
+    buckets=tuple(mb * 1024 * 1024 for mb in (0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500)),
+)
+MEMORY_BUDGET_WAITS = metrics.counter(
+    "resume_analyzer_memory_budget_waits_total",
+    "Extractions that had to wait for the in-flight memory budget, by outcome (admitted/timeout)",
+    ("outcome",),
+)
+PDF_PREFLIGHT_REJECTIONS = metrics.counter(
+    "resume_analyzer_pdf_preflight_rejections_total",
+    "PDF uploads rejected by the structural pre-flight scan, by exceeded budget",
+    ("budget",),
+)
+RATE_LIMIT_REJECTIONS = metrics.counter(
+    "resume_analyzer_rate_limit_rejections_total",
+    "Requests rejected by the daily rate limit",
+    ("client",),
+)
@@ -1,6 +1,7 @@
+import re
 import time
-from datetime import datetime, timedelta
-from typing import Dict, Tuple, Optional
+from uuid import uuid4
+from typing import Dict, Tuple, Optional, Any
 from fastapi import Request, HTTPException
 from fastapi.responses import JSONResponse
 import logging
@@ -10,8 +11,11 @@ from jwt.exceptions import InvalidTokenError
 
 from app.models import ErrorResponse
 from app.config import settings
+from app.metrics import RATE_LIMIT_REJECTIONS
+from app.request_timing import start_timing
+from app.log_config import request_id_var
+from app.rate_limit_store import create_rate_limit_store
 
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 
 logger = logging.getLogger()  # Use the root logger for all middleware logs
@@ -21,13 +25,21 @@ SECRET_KEY = settings.jwt_secret
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 
 class RateLimiter:
-    """In-memory rate limiter with daily limits"""
+    """
+    Counter-based rate limiter with bounded memory.
+
+    Requests are counted per fixed window in a pluggable store (in-process,
+    shared memory or MongoDB). The sliding algorithm weights the previous
+    window's count by how much of it still overlaps the trailing window, so
+    each check is O(1) regardless of request volume. Requests are keyed by
+    the JWT userId when present and by client IP otherwise.
+    """
     
     def __init__(self):
-        self.requests: Dict[str, list] = {}  # IP -> list of timestamps
-        self.daily_limits: Dict[str, int] = {}  # IP -> daily request count
         self.max_requests_per_day = settings.max_requests_per_day  # Use config setting
-        self.cleanup_interval = 3600  # Cleanup every hour
+        self.window_seconds = settings.rate_limit_window_seconds
+        self.algorithm = settings.rate_limit_algorithm
+        self.store = create_rate_limit_store()
     
     def _get_client_ip(self, request: Request) -> str:
         """Get client IP address"""
@@ -44,63 +56,58 @@ class RateLimiter:
         # Fallback to client host
         return request.client.host if request.client else "unknown"
     
-    def _cleanup_old_requests(self):
-        """Clean up old request timestamps"""
-        current_time = time.time()
-        cutoff_time = current_time - 86400  # 24 hours ago
-        
-        for ip in list(self.requests.keys()):
-            self.requests[ip] = [
-                timestamp for timestamp in self.requests[ip] 
-                if timestamp > cutoff_time
-            ]
-            
-            # Remove IP if no recent requests
-            if not self.requests[ip]:
-                del self.requests[ip]
-                if ip in self.daily_limits:
-                    del self.daily_limits[ip]
+    def _get_rate_limit_key(self, request: Request) -> str:
+        """Key requests by userId from a valid JWT, falling back to client IP"""
+        auth_header = request.headers.get("Authorization")
+        if auth_header and auth_header.startswith("Bearer "):
+            try:
+                payload = jwt.decode(auth_header.split(" ", 1)[1], SECRET_KEY, algorithms=[ALGORITHM])
+                if payload.get("userId"):
+                    return f"user:{payload['userId']}"
+            except InvalidTokenError:
+                pass
+        return f"ip:{self._get_client_ip(request)}"
     
-    def _get_daily_count(self, ip: str) -> int:
-        """Get daily request count for IP"""
-        current_time = time.time()
-        day_start = current_time - (current_time % 86400)  # Start of current day
-        
-        # Count requests from today
-        today_requests = [
-            timestamp for timestamp in self.requests.get(ip, [])
-            if timestamp >= day_start
-        ]
-        
-        return len(today_requests)
+    def _estimate_count(self, current: int, previous: int, now: float) -> int:
+        """Requests in the trailing window"""
+        if self.algorithm == "fixed":
+            return current
+        elapsed_fraction = (now % self.window_seconds) / self.window_seconds
+        return int(current + previous * (1 - elapsed_fraction))
     
-    def check_rate_limit(self, request: Request) -> Tuple[bool, Optional[str]]:
+    def reset_time(self, now: float) -> int:
+        return int(now - (now % self.window_seconds) + self.window_seconds)
+    
+    async def check_rate_limit(self, request: Request) -> Tuple[bool, Optional[str], int]:
         """
         Check if request is within rate limits
         
         Returns:
-            (allowed, error_message)
+            (allowed, error_message, remaining)
         """
-        client_ip = self._get_client_ip(request)
-        
-        # Periodic cleanup
-        if time.time() % self.cleanup_interval < 1:
-            self._cleanup_old_requests()
-        
-        # Initialize request list for this IP
-        if client_ip not in self.requests:
-            self.requests[client_ip] = []
+        key = self._get_rate_limit_key(request)
+        now = time.time()
+        window = int(now // self.window_seconds)
         
-        # Check daily limit
-        daily_count = self._get_daily_count(client_ip)
+        current, previous = await self.store.add(key, window)
+        count = self._estimate_count(current, previous, now)
         
-        if daily_count >= self.max_requests_per_day:
-            return False, f"Daily limit exceeded. Maximum {self.max_requests_per_day} requests per day allowed."
+        if count > self.max_requests_per_day:
+            # Rejected requests don't consume quota
+            await self.store.add(key, window, -1)
+            RATE_LIMIT_REJECTIONS.inc(client=key.split(":", 1)[0])
+            return False, f"Daily limit exceeded. Maximum {self.max_requests_per_day} requests per day allowed.", 0
         
-        # Add current request
-        self.requests[client_ip].append(time.time())
-        
-        return True, None
+        return True, None, self.max_requests_per_day - count
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_requests_per_day": self.max_requests_per_day,
+            "window_seconds": self.window_seconds,
+            "algorithm": self.algorithm,
+            "backend": self.store.name,
+            **self.store.stats()
+        }
 
 # Global rate limiter instance
 rate_limiter = RateLimiter()
@@ -109,14 +116,18 @@ async def rate_limit_middleware(request: Request, call_next):
     """Rate limiting middleware"""
     
     # Skip rate limiting for health checks and documentation
-    if request.url.path in ["/", "/docs", "/redoc", "/openapi.json", "/api/v1/health", "/api/v1/health/simple"]:
+    if request.url.path in ["/", "/docs", "/redoc", "/openapi.json", "/api/v1/health", "/api/v1/health/simple", "/api/v1/health/live", "/api/v1/health/ready", "/api/v1/ready", "/metrics", "/api/v1/admin/profile"]:
+        return await call_next(request)
+    
+    # Polling an analysis' status or reading usage must not consume the daily analysis quota
+    if request.method == "GET" and (request.url.path.startswith("/api/v1/analysis/") or request.url.path == "/api/v1/usage"):
         return await call_next(request)
     
     # Check rate limit
-    allowed, error_message = rate_limiter.check_rate_limit(request)
+    allowed, error_message, remaining = await rate_limiter.check_rate_limit(request)
     
     if not allowed:
-        logger.warning(f"Rate limit exceeded for IP: {request.client.host}")
+        logger.warning(f"Rate limit exceeded for {rate_limiter._get_rate_limit_key(request)}")
         return JSONResponse(
             status_code=429,
             content=ErrorResponse(
@@ -126,19 +137,34 @@ async def rate_limit_middleware(request: Request, call_next):
             ).dict()
         )
     
-    # Add rate limit headers to response
     response = await call_next(request)
     
     # Add rate limit headers
-    client_ip = rate_limiter._get_client_ip(request)
-    daily_count = rate_limiter._get_daily_count(client_ip)
-    
     response.headers["X-RateLimit-Limit"] = str(rate_limiter.max_requests_per_day)
-    response.headers["X-RateLimit-Remaining"] = str(rate_limiter.max_requests_per_day - daily_count)
-    response.headers["X-RateLimit-Reset"] = str(int(time.time() + 86400 - (time.time() % 86400)))
+    response.headers["X-RateLimit-Remaining"] = str(remaining)
+    response.headers["X-RateLimit-Reset"] = str(rate_limiter.reset_time(time.time()))
     
     return response
 
+async def server_timing_middleware(request: Request, call_next):
+    """Give each request a timing context and report its stages in a Server-Timing header"""
+    timing = start_timing()
+    response = await call_next(request)
+    response.headers["Server-Timing"] = timing.server_timing_header()
+    return response
+
+# Client-supplied request IDs are only trusted when short and log-safe
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+async def request_id_middleware(request: Request, call_next):
+    """Tag the request's log records with an ID, reusing X-Request-ID when it is well-formed"""
+    incoming = request.headers.get("X-Request-ID", "")
+    request_id = incoming if REQUEST_ID_PATTERN.match(incoming) else uuid4().hex
+    request_id_var.set(request_id)
+    response = await call_next(request)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
 def get_current_user_id(request: Request) -> str:
     """Extract userId from JWT in Authorization header."""
     auth_header = request.headers.get("Authorization")
@@ -152,4 +178,19 @@ def get_current_user_id(request: Request) -> str:
             raise HTTPException(status_code=401, detail="userId missing in token")
         return userId
     except InvalidTokenError:
-        raise HTTPException(status_code=401, detail="Invalid token")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+def get_current_admin_id(request: Request) -> str:
+    """Extract adminId from an admin JWT (signed with the same secret as user tokens)."""
+    auth_header = request.headers.get("Authorization")
+    if not auth_header or not auth_header.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Missing or invalid Authorization header")
+    token = auth_header.split(" ", 1)[1]
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except InvalidTokenError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    adminId = payload.get("adminId")
+    if not adminId:
+        raise HTTPException(status_code=403, detail="Admin token required")
+    return adminId
@@ -0,0 +1,139 @@
+import time
+import threading
+import logging
+from typing import Dict, List, Optional, Any
+
+from .config import settings
+from .key_pool import groq_key_pool, is_rate_limit_error, parse_reset_seconds
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_DEPTHS = ("quick", "standard", "detailed")
+
+
+class ModelStats:
+    """Live statistics for a single Groq model"""
+
+    def __init__(self, name: str, rank: int):
+        self.name = name
+        self.rank = rank  # Position in the configured list, 0 = fastest
+        self.latency_ewma: Optional[float] = None
+        self.samples = 0
+        self.in_flight = 0
+        self.consecutive_errors = 0
+        self.cooldown_until = 0.0
+        self.last_error: Optional[str] = None
+
+    def to_dict(self, now: float) -> Dict[str, Any]:
+        return {
+            "rank": self.rank,
+            "latency_ewma_seconds": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+            "samples": self.samples,
+            "in_flight": self.in_flight,
+            "cooling_down": now < self.cooldown_until,
+            "consecutive_errors": self.consecutive_errors,
+            "last_error": self.last_error,
+        }
+
+
+class ModelRouter:
+    """
+    Size-aware routing between the configured Groq models.
+
+    Models are configured fastest first. Simple requests prefer the fastest
+    model and demanding ones (large inputs or detailed depth) the largest;
+    models that are cooling down after errors, have no key with remaining
+    quota or run slower than the latency ceiling are moved to the back of the
+    candidate list.
+    """
+
+    def __init__(self, models: List[str]):
+        self._lock = threading.Lock()
+        self.models = models
+        self._stats: Dict[str, ModelStats] = {
+            name: ModelStats(name, rank) for rank, name in enumerate(models)
+        }
+
+    def is_demanding(self, estimated_tokens: int, depth: str = "standard") -> bool:
+        """Whether a request should go to the largest model"""
+        if depth == "detailed":
+            return True
+        if depth == "quick":
+            return False
+        return estimated_tokens >= settings.groq_large_input_tokens
+
+    def _availability(self, stats: ModelStats, estimated_tokens: int, now: float) -> int:
+        """0 = available, 1 = degraded (slow), 2 = saturated (no quota), 3 = cooling down"""
+        if now < stats.cooldown_until:
+            return 3
+        if not groq_key_pool.has_capacity(stats.name, estimated_tokens):
+            return 2
+        if stats.latency_ewma is not None and stats.latency_ewma > settings.groq_model_max_latency:
+            return 1
+        return 0
+
+    def candidates(self, estimated_tokens: int, depth: str = "standard", prefer: Optional[str] = None) -> List[str]:
+        """
+        Return models in the order they should be tried for this request.
+        A preferred model (e.g. to continue its own output) goes first while
+        it is available.
+        """
+        demanding = self.is_demanding(estimated_tokens, depth)
+        now = time.time()
+        with self._lock:
+            ordered = sorted(
+                self._stats.values(),
+                key=lambda s: (
+                    self._availability(s, estimated_tokens, now),
+                    s.name != prefer,
+                    -s.rank if demanding else s.rank,
+                ),
+            )
+        return [s.name for s in ordered]
+
+    def record_start(self, model: str):
+        with self._lock:
+            self._stats[model].in_flight += 1
+
+    def record_cancelled(self, model: str):
+        """Record a call abandoned because a racing request already answered"""
+        with self._lock:
+            self._stats[model].in_flight = max(0, self._stats[model].in_flight - 1)
+
+    def record_success(self, model: str, latency: float):
+        """Record a completed call"""
+        alpha = settings.groq_latency_ewma_alpha
+        with self._lock:
+            stats = self._stats[model]
+            stats.in_flight = max(0, stats.in_flight - 1)
+            stats.samples += 1
+            stats.latency_ewma = latency if stats.latency_ewma is None else (
+                alpha * latency + (1 - alpha) * stats.latency_ewma
+            )
+            stats.consecutive_errors = 0
+            stats.last_error = None
+
+    def record_failure(self, model: str, error: Exception):
+        """Record a failed call and put the model into cooldown"""
+        with self._lock:
+            stats = self._stats[model]
+            stats.in_flight = max(0, stats.in_flight - 1)
+            stats.last_error = str(error)[:200]
+            if is_rate_limit_error(error):
+                # Quota is per key; the key pool cools the key down instead
+                return
+            stats.consecutive_errors += 1
+            response = getattr(error, "response", None)
+            retry_after = parse_reset_seconds(response.headers.get("retry-after")) if response is not None else None
+            cooldown = retry_after or settings.groq_model_cooldown * min(2 ** (stats.consecutive_errors - 1), 8)
+            stats.cooldown_until = time.time() + cooldown
+        logger.warning(f"Groq model {model} cooling down for {cooldown:.1f}s after error: {stats.last_error}")
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            return {name: s.to_dict(now) for name, s in self._stats.items()}
+
+
+# Global model router instance, shared by every GroqService
+model_router = ModelRouter(settings.groq_models_list)
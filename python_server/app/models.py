@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 from datetime import datetime
 from bson import ObjectId
 
@@ -86,6 +86,13 @@ class ErrorResponse(BaseModel):
     message: str = Field(..., description="Error message")
     details: Optional[str] = Field(None, description="Additional error details")
 
+class TokenUsage(BaseModel):
+    promptTokens: int = Field(0, description="Prompt tokens reported by Groq")
+    completionTokens: int = Field(0, description="Completion tokens reported by Groq")
+    totalTokens: int = Field(0, description="Prompt plus completion tokens")
+    costUsd: Optional[float] = Field(None, description="Cost from GROQ_MODEL_PRICES, None when a model used has no price")
+    model: Optional[str] = Field(None, description="Model that produced the result")
+
 class AnalysisDocument(BaseModel):
     id: Optional[str] = Field(None, alias="_id", description="MongoDB document ID")
     analysisId: str = Field(..., description="Unique analysis ID")
@@ -94,8 +101,14 @@ class AnalysisDocument(BaseModel):
     jobDescriptionFilename: Optional[str] = Field(None, description="Job description filename")
     jobDescriptionText: Optional[str] = Field(None, description="Job description text")
     result: Optional[ResumeAnalysisResponse] = Field(None, description="Analysis result")
-    status: str = Field(default="completed", description="Analysis status")
+    status: str = Field(default="completed", description="Analysis status (queued/extracting/analyzing/completed/failed)")
+    progress: Optional[int] = Field(None, description="Progress percentage of a queued analysis")
+    error: Optional[str] = Field(None, description="Error message if the analysis failed")
     processingTime: Optional[float] = Field(None, description="Processing time in seconds")
+    timings: Optional[Dict[str, float]] = Field(None, description="Milliseconds spent in each processing stage")
+    inputStats: Optional[Dict[str, Any]] = Field(None, description="Input sizes, token counts and model used")
+    memory: Optional[Dict[str, Dict[str, int]]] = Field(None, description="Per-stage RSS deltas (and sampled allocation peaks) in KB")
+    tokenUsage: Optional[TokenUsage] = Field(None, description="Tokens consumed by the analysis, including retries and hedged requests")
     createdAt: datetime = Field(default_factory=datetime.utcnow, description="Creation timestamp")
     updatedAt: datetime = Field(default_factory=datetime.utcnow, description="Last update timestamp")
 
@@ -120,4 +133,41 @@ class AnalysisStatus(BaseModel):
     status: str = Field(..., description="Current status")
     message: str = Field(..., description="status message")
     progress: Optional[int] = Field(None, description="Progress percentage")
-    result: Optional[ResumeAnalysisResponse] = Field(None, description="Analysis result if completed")
\ No newline at end of file
+    result: Optional[ResumeAnalysisResponse] = Field(None, description="Analysis result if completed")
+
+class AnalysisSummary(BaseModel):
+    analysisId: str = Field(..., description="Unique analysis ID")
+    status: str = Field(..., description="Analysis status")
+    resumeFilename: str = Field(..., description="Original resume filename")
+    jobDescriptionFilename: Optional[str] = Field(None, description="Job description filename")
+    score: Optional[int] = Field(None, description="Resume score out of 100")
+    eligibility: Optional[str] = Field(None, description="Resume eligibility")
+    chanceOfSelection: Optional[int] = Field(None, description="Selection chance percentage")
+    processingTime: Optional[float] = Field(None, description="Processing time in seconds")
+    createdAt: datetime = Field(..., description="Creation timestamp")
+    updatedAt: Optional[datetime] = Field(None, description="Last update timestamp")
+
+class AnalysisDetail(BaseModel):
+    analysisId: str = Field(..., description="Unique analysis ID")
+    result: Optional[ResumeAnalysisResponse] = Field(None, description="Full analysis result")
+    jobDescriptionText: Optional[str] = Field(None, description="Job description text")
+
+class AnalysisHistoryPage(BaseModel):
+    items: List[AnalysisSummary] = Field(..., description="Analyses, newest first")
+    nextCursor: Optional[str] = Field(None, description="Cursor for the next page, null on the last page")
+    limit: int = Field(..., description="Page size used")
+
+class TokenUsageRollup(BaseModel):
+    day: str = Field(..., description="UTC day (YYYY-MM-DD)")
+    model: str = Field(..., description="Groq model")
+    analyses: int = Field(0, description="Analyses that used the model that day")
+    promptTokens: int = Field(0, description="Prompt tokens")
+    completionTokens: int = Field(0, description="Completion tokens")
+    totalTokens: int = Field(0, description="Prompt plus completion tokens")
+    costUsd: float = Field(0.0, description="Cost from GROQ_MODEL_PRICES (tokens of unpriced models add nothing)")
+
+class TokenUsageReport(BaseModel):
+    userId: str = Field(..., description="User the rollups belong to")
+    days: int = Field(..., description="Number of days covered, ending today (UTC)")
+    items: List[TokenUsageRollup] = Field(..., description="Rollups, newest day first")
+    total: TokenUsage = Field(..., description="Sum over the items")
@@ -0,0 +1,647 @@
+"""
+Pre-flight structural scan of PDF uploads.
+
+Reads the trailer, the cross-reference sections and the page tree
+directly from the raw bytes, without pdfminer's layout machinery, and
+enforces structural budgets (object count, xref chain length, page tree
+depth, image count, decoded stream size and decompression ratio) so
+pathological documents are rejected before a full parser touches them.
+Streams are inflated with a bounded output size (streams only checked
+against the budgets are inflated chunk by chunk and discarded), images are
+checked against their declared dimensions without being decoded, and the
+stream sweep stops when the preflight time budget is used up.
+
+scan_pdf raises PdfBudgetExceeded for a document over a budget and
+PdfSyntaxError when it cannot read the structure; such documents are left
+to pdfplumber, which repairs more damage than this scanner does.
+"""
+import re
+import time
+import zlib
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Nesting of arrays and dictionaries within one object
+MAX_NESTING = 64
+# Reference chains (a reference to a reference ...) followed before giving up
+MAX_REFERENCE_CHAIN = 16
+# Object loads nested inside one another (e.g. an object stream whose /Length sits in another object stream)
+MAX_LOAD_DEPTH = 16
+# Decoded size of a stream the (pure Python) PNG predictor is undone on; xref streams are far smaller
+MAX_PREDICTOR_BYTES = 64 * 1024
+# Streams smaller than this when decoded are not held to the compression ratio
+RATIO_FLOOR_BYTES = 1024 * 1024
+# Bytes at the end of the file searched for startxref
+TAIL_BYTES = 2048
+# Output inflated at a time from a stream that is only measured
+INFLATE_CHUNK_BYTES = 256 * 1024
+
+_SKIP = re.compile(rb"(?:[\x00\t\n\x0c\r ]|%[^\r\n]*)*")
+_REGULAR = re.compile(rb"[^\x00\t\n\x0c\r ()<>\[\]{}/%]*")
+_REFERENCE = re.compile(rb"(\d+)[\x00\t\n\x0c\r ]+(\d+)[\x00\t\n\x0c\r ]+R(?![^\x00\t\n\x0c\r ()<>\[\]{}/%])")
+_STRING_DELIMITER = re.compile(rb"[\\()]")
+_NUMBER = re.compile(rb"[+-]?(?:\d+\.?\d*|\.\d+)")
+_OBJECT_HEADER = re.compile(rb"[\x00\t\n\x0c\r ]*(\d+)[\x00\t\n\x0c\r ]+(\d+)[\x00\t\n\x0c\r ]+obj")
+_OBJECT_SCAN = re.compile(rb"(?<![0-9])(\d+)[\x00\t\n\x0c\r ]+(\d+)[\x00\t\n\x0c\r ]+obj\b")
+_STREAM_KEYWORD = re.compile(rb"[\x00\t\n\x0c\r ]*stream(?:\r\n|\n|\r)?")
+_STARTXREF = re.compile(rb"startxref[\x00\t\n\x0c\r ]+(\d+)")
+_XREF_SUBSECTION = re.compile(rb"[\x00\t\n\x0c\r ]*(\d+)[ \t]+(\d+)")
+_XREF_ENTRY = re.compile(rb"[\x00\t\n\x0c\r ]*(\d{1,10})[ \t]+(\d{1,5})[ \t]+([nf])")
+
+# Components per colour space, for the declared size of an image; unknown spaces count as 4
+_COLOR_COMPONENTS = {"DeviceGray": 1, "CalGray": 1, "G": 1, "DeviceRGB": 3, "CalRGB": 3, "RGB": 3, "Lab": 3, "DeviceCMYK": 4, "CMYK": 4, "Indexed": 1, "I": 1}
+
+
+class PdfBudgetExceeded(Exception):
+    """The document exceeds a structural budget; `budget` names which one"""
+
+    def __init__(self, budget: str, message: str):
+        super().__init__(message)
+        self.budget = budget
+
+
+class PdfSyntaxError(Exception):
+    """The scanner could not read the document's structure"""
+
+
+class _Name(str):
+    """A PDF name, stored without its leading slash"""
+
+
+class _Ref:
+    __slots__ = ("num", "gen")
+
+    def __init__(self, num: int, gen: int):
+        self.num = num
+        self.gen = gen
+
+    def __repr__(self) -> str:
+        return f"{self.num} {self.gen} R"
+
+
+def _png_unpredict(data: bytes, columns: int, bytes_per_pixel: int) -> bytes:
+    """Undo PNG row predictors (DecodeParms /Predictor >= 10)"""
+    row_length = columns * bytes_per_pixel
+    previous = bytearray(row_length)
+    out = bytearray()
+    for start in range(0, len(data) - row_length, row_length + 1):
+        kind = data[start]
+        row = bytearray(data[start + 1:start + 1 + row_length])
+        if kind == 0:
+            out += row
+            previous = row
+            continue
+        if kind == 2:
+            # Up, the predictor xref streams use; no dependency within the row
+            row = bytearray((value + above) & 0xFF for value, above in zip(row, previous))
+            out += row
+            previous = row
+            continue
+        for i in range(len(row)):
+            left = row[i - bytes_per_pixel] if i >= bytes_per_pixel else 0
+            up = previous[i]
+            if kind == 1:
+                row[i] = (row[i] + left) & 0xFF
+            elif kind == 3:
+                row[i] = (row[i] + ((left + up) >> 1)) & 0xFF
+            elif kind == 4:
+                upper_left = previous[i - bytes_per_pixel] if i >= bytes_per_pixel else 0
+                estimate = left + up - upper_left
+                distances = (abs(estimate - left), abs(estimate - up), abs(estimate - upper_left))
+                row[i] = (row[i] + (left, up, upper_left)[distances.index(min(distances))]) & 0xFF
+        out += row
+        previous = row
+    return bytes(out)
+
+
+def _positive_int(value: Any, minimum: int = 1) -> Optional[int]:
+    """The value if it is an int of at least `minimum` (bool excluded), else None"""
+    if isinstance(value, int) and not isinstance(value, bool) and value >= minimum:
+        return value
+    return None
+
+
+class _PdfScanner:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.offsets: Dict[int, int] = {}
+        self.compressed: Dict[int, Tuple[int, int]] = {}
+        self.known: set = set()
+        self.trailer: Dict[str, Any] = {}
+        self.xref_sections = 0
+        self.decoded_bytes = 0
+        self.streams = 0
+        self.images = 0
+        self.sweep_complete = True
+        self.deadline = time.monotonic() + settings.pdf_preflight_max_seconds if settings.pdf_preflight_max_seconds > 0 else None
+        self._objects: Dict[int, Any] = {}
+        self._load_depth = 0
+        self._decoded_streams: set = set()
+        self._object_streams: Dict[int, Tuple[bytes, Dict[int, int]]] = {}
+
+    # Lexing and parsing
+
+    def _skip(self, pos: int) -> int:
+        return _SKIP.match(self.data, pos).end()
+
+    def parse_object(self, pos: int, depth: int = 0) -> Tuple[Any, int]:
+        if depth > MAX_NESTING:
+            raise PdfBudgetExceeded("nesting", f"Objects nested deeper than {MAX_NESTING} levels")
+        data = self.data
+        pos = self._skip(pos)
+        if pos >= len(data):
+            raise PdfSyntaxError("Unexpected end of file")
+        char = data[pos:pos + 1]
+        if data.startswith(b"<<", pos):
+            result: Dict[str, Any] = {}
+            pos += 2
+            while True:
+                pos = self._skip(pos)
+                if data.startswith(b">>", pos):
+                    return result, pos + 2
+                key, pos = self.parse_object(pos, depth + 1)
+                if not isinstance(key, _Name):
+                    raise PdfSyntaxError(f"Dictionary key is not a name at offset {pos}")
+                result[key], pos = self.parse_object(pos, depth + 1)
+        if char == b"[":
+            items: List[Any] = []
+            pos += 1
+            while True:
+                pos = self._skip(pos)
+                if data.startswith(b"]", pos):
+                    return items, pos + 1
+                item, pos = self.parse_object(pos, depth + 1)
+                items.append(item)
+        if char == b"/":
+            end = _REGULAR.match(data, pos + 1).end()
+            raw = data[pos + 1:end]
+            if b"#" in raw:
+                raw = re.sub(rb"#([0-9A-Fa-f]{2})", lambda m: bytes([int(m.group(1), 16)]), raw)
+            return _Name(raw.decode("latin-1")), end
+        if char == b"(":
+            return self._literal_string(pos)
+        if char == b"<":
+            end = data.find(b">", pos)
+            if end < 0:
+                raise PdfSyntaxError(f"Unterminated hex string at offset {pos}")
+            return data[pos + 1:end], end + 1
+        reference = _REFERENCE.match(data, pos)
+        if reference:
+            return _Ref(int(reference.group(1)), int(reference.group(2))), reference.end()
+        number = _NUMBER.match(data, pos)
+        if number:
+            text = number.group()
+            return (float(text) if b"." in text else int(text)), number.end()
+        end = _REGULAR.match(data, pos).end()
+        keyword = data[pos:end]
+        if keyword == b"true":
+            return True, end
+        if keyword == b"false":
+            return False, end
+        if keyword == b"null":
+            return None, end
+        raise PdfSyntaxError(f"Unexpected token {keyword[:20]!r} at offset {pos}")
+
+    def _literal_string(self, pos: int) -> Tuple[bytes, int]:
+        data = self.data
+        level = 0
+        start = pos
+        while True:
+            # Jump between backslashes and parentheses; other bytes need no look
+            delimiter = _STRING_DELIMITER.search(data, pos)
+            if delimiter is None:
+                raise PdfSyntaxError(f"Unterminated string at offset {start}")
+            pos = delimiter.start()
+            char = data[pos]
+            if char == 0x5C:  # backslash escapes the next byte
+                pos += 2
+                continue
+            if char == 0x28:
+                level += 1
+            else:
+                level -= 1
+                if level == 0:
+                    return data[start + 1:pos], pos + 1
+            pos += 1
+
+    def read_indirect(self, offset: int, with_stream: bool = True) -> Tuple[Any, Optional[Tuple[int, int]]]:
+        """
+        Object at a file offset, with the bounds of its stream data if it
+        has one. Locating the data may resolve an indirect /Length;
+        with_stream=False skips that, so resolving references never chains
+        through the streams of the objects they point to.
+        """
+        header = _OBJECT_HEADER.match(self.data, offset)
+        if not header:
+            raise PdfSyntaxError(f"No object at offset {offset}")
+        value, pos = self.parse_object(header.end())
+        keyword = _STREAM_KEYWORD.match(self.data, pos)
+        if not with_stream or not isinstance(value, dict) or not keyword:
+            return value, None
+        start = keyword.end()
+        length = self.resolve(value.get("Length"))
+        if isinstance(length, int) and 0 <= length and self.data.startswith(b"endstream", self._skip(start + length)):
+            return value, (start, start + length)
+        # Missing or wrong /Length, as full parsers tolerate: use the endstream keyword
+        end = self.data.find(b"endstream", start)
+        if end < 0:
+            raise PdfSyntaxError(f"Unterminated stream at offset {offset}")
+        return value, (start, end)
+
+    # Cross-reference sections
+
+    def _add_entry(self, num: int, offset: Optional[int] = None, in_stream: Optional[Tuple[int, int]] = None):
+        # Sections are read newest first, so an object's first entry wins
+        if num in self.known:
+            return
+        self.known.add(num)
+        if offset is not None:
+            self.offsets[num] = offset
+        elif in_stream is not None:
+            self.compressed[num] = in_stream
+        if len(self.offsets) + len(self.compressed) > settings.pdf_max_objects:
+            raise PdfBudgetExceeded("objects", f"More than {settings.pdf_max_objects} objects")
+
+    def _check_entry_count(self, count: int):
+        if count > settings.pdf_max_objects:
+            raise PdfBudgetExceeded("objects", f"Cross-reference section lists {count} objects (maximum {settings.pdf_max_objects})")
+
+    def _read_xref_table(self, pos: int) -> Dict[str, Any]:
+        data = self.data
+        while True:
+            pos = self._skip(pos)
+            if data.startswith(b"trailer", pos):
+                trailer, _ = self.parse_object(pos + 7)
+                if not isinstance(trailer, dict):
+                    raise PdfSyntaxError("Trailer is not a dictionary")
+                return trailer
+            subsection = _XREF_SUBSECTION.match(data, pos)
+            if not subsection:
+                raise PdfSyntaxError(f"Malformed cross-reference table at offset {pos}")
+            first, count = int(subsection.group(1)), int(subsection.group(2))
+            self._check_entry_count(count)
+            pos = subsection.end()
+            for num in range(first, first + count):
+                entry = _XREF_ENTRY.match(data, pos)
+                if not entry:
+                    raise PdfSyntaxError(f"Malformed cross-reference entry at offset {pos}")
+                pos = entry.end()
+                if entry.group(3) == b"n":
+                    self._add_entry(num, offset=int(entry.group(1)))
+                else:
+                    self.known.add(num)
+
+    def _read_xref_stream(self, offset: int) -> Dict[str, Any]:
+        value, bounds = self.read_indirect(offset)
+        if not isinstance(value, dict) or value.get("Type") != "XRef" or bounds is None:
+            raise PdfSyntaxError(f"No cross-reference stream at offset {offset}")
+        widths = value.get("W")
+        if not isinstance(widths, list) or len(widths) != 3 or not all(isinstance(w, int) and 0 <= w <= 8 for w in widths):
+            raise PdfSyntaxError("Invalid /W in cross-reference stream")
+        size = value.get("Size")
+        index = value.get("Index", [0, size])
+        if not isinstance(index, list) or len(index) % 2 or not all(isinstance(i, int) and i >= 0 for i in index):
+            raise PdfSyntaxError("Invalid /Index in cross-reference stream")
+        self._check_entry_count(sum(index[1::2]))
+        rows = self.decode_stream(value, bounds)
+        row_length = sum(widths)
+        pos = 0
+        for first, count in zip(index[::2], index[1::2]):
+            for num in range(first, first + count):
+                row = rows[pos:pos + row_length]
+                if len(row) < row_length:
+                    return value
+                pos += row_length
+                fields = []
+                field_start = 0
+                for width in widths:
+                    fields.append(int.from_bytes(row[field_start:field_start + width], "big"))
+                    field_start += width
+                kind = fields[0] if widths[0] else 1
+                if kind == 1:
+                    self._add_entry(num, offset=fields[1])
+                elif kind == 2:
+                    self._add_entry(num, in_stream=(fields[1], fields[2]))
+                else:
+                    self.known.add(num)
+        return value
+
+    def read_xref_chain(self):
+        tail_start = max(0, len(self.data) - TAIL_BYTES)
+        matches = list(_STARTXREF.finditer(self.data, tail_start))
+        if not matches:
+            raise PdfSyntaxError("No startxref")
+        offset: Optional[int] = int(matches[-1].group(1))
+        visited = set()
+        while offset is not None and offset not in visited:
+            visited.add(offset)
+            self.xref_sections += 1
+            if self.xref_sections > settings.pdf_max_xref_sections:
+                raise PdfBudgetExceeded("xref_sections", f"More than {settings.pdf_max_xref_sections} cross-reference sections")
+            pos = self._skip(offset)
+            if self.data.startswith(b"xref", pos):
+                trailer = self._read_xref_table(pos + 4)
+                hybrid = trailer.get("XRefStm")
+                if isinstance(hybrid, int):
+                    self._read_xref_stream(hybrid)
+            else:
+                trailer = self._read_xref_stream(offset)
+            for key, value in trailer.items():
+                self.trailer.setdefault(key, value)
+            previous = trailer.get("Prev")
+            offset = previous if isinstance(previous, int) else None
+
+    def rebuild_xref(self):
+        """Locate objects by scanning for `N G obj`, as full parsers do when the xref is unusable"""
+        self.offsets, self.compressed, self.known, self.trailer = {}, {}, set(), {}
+        self._objects.clear()
+        found: Dict[int, int] = {}
+        for match in _OBJECT_SCAN.finditer(self.data):
+            found[int(match.group(1))] = match.start()
+            if len(found) > settings.pdf_max_objects:
+                raise PdfBudgetExceeded("objects", f"More than {settings.pdf_max_objects} objects")
+        self.offsets = found
+        self.known = set(found)
+        position = self.data.rfind(b"trailer")
+        if position >= 0:
+            try:
+                trailer, _ = self.parse_object(position + 7)
+                if isinstance(trailer, dict):
+                    self.trailer = trailer
+            except PdfSyntaxError:
+                pass
+        if "Root" not in self.trailer:
+            # No classic trailer; a cross-reference stream carries the same keys and the compressed entries
+            for offset in found.values():
+                try:
+                    value, _ = self.read_indirect(offset)
+                    if isinstance(value, dict) and value.get("Type") == "XRef" and "Root" in value:
+                        self.trailer = self._read_xref_stream(offset)
+                        break
+                except PdfSyntaxError:
+                    continue
+
+    # Objects and streams
+
+    def decode_stream(self, dictionary: Dict[str, Any], bounds: Tuple[int, int]) -> bytes:
+        """Stream data with FlateDecode undone (the only filter xref and object streams use in practice)"""
+        raw = self.data[bounds[0]:bounds[1]]
+        filters = self.resolve(dictionary.get("Filter"))
+        filters = filters if isinstance(filters, list) else [filters] if filters else []
+        if not filters:
+            return raw
+        if len(filters) != 1 or filters[0] not in ("FlateDecode", "Fl"):
+            raise PdfSyntaxError(f"Unsupported filter {filters}")
+        data = self.inflate(raw)
+        self._decoded_streams.add(bounds[0])
+        params = self.resolve(dictionary.get("DecodeParms"))
+        if isinstance(params, list):
+            params = params[0] if params else None
+        if isinstance(params, dict) and _positive_int(self.resolve(params.get("Predictor")), 10):
+            columns = _positive_int(self.resolve(params.get("Columns", 1)))
+            colors = _positive_int(self.resolve(params.get("Colors", 1)))
+            bits = _positive_int(self.resolve(params.get("BitsPerComponent", 8)))
+            if not columns or not colors or not bits or columns * colors * bits > 8 * 65536:
+                raise PdfSyntaxError("Invalid predictor parameters")
+            if len(data) > MAX_PREDICTOR_BYTES:
+                raise PdfSyntaxError(f"Predicted stream of {len(data)} bytes is too large for the scanner")
+            data = _png_unpredict(data, columns, max(1, colors * bits // 8))
+        return data
+
+    def _inflate_limits(self, raw_size: int) -> Tuple[int, int, int]:
+        """Output allowed for a stream, and the ratio and per-stream limits it is the smallest of"""
+        stream_limit = settings.pdf_max_stream_bytes
+        total_limit = settings.pdf_max_decoded_bytes - self.decoded_bytes
+        ratio_limit = max(RATIO_FLOOR_BYTES, int(raw_size * settings.pdf_max_compression_ratio))
+        return max(0, min(stream_limit, total_limit, ratio_limit)), ratio_limit, stream_limit
+
+    def _inflate_exceeded(self, limit: int, ratio_limit: int, stream_limit: int) -> PdfBudgetExceeded:
+        if limit == ratio_limit:
+            return PdfBudgetExceeded(
+                "compression_ratio",
+                f"A stream expands more than {settings.pdf_max_compression_ratio:g}x when decompressed",
+            )
+        if limit == stream_limit:
+            return PdfBudgetExceeded("stream_bytes", f"A stream decompresses to more than {stream_limit} bytes")
+        return PdfBudgetExceeded("decoded_bytes", f"Streams decompress to more than {settings.pdf_max_decoded_bytes} bytes in total")
+
+    def inflate(self, raw: bytes) -> bytes:
+        """Inflate with the output bounded by the stream, total and ratio budgets"""
+        limit, ratio_limit, stream_limit = self._inflate_limits(len(raw))
+        decompressor = zlib.decompressobj()
+        try:
+            out = decompressor.decompress(raw, limit + 1)
+        except zlib.error as e:
+            raise PdfSyntaxError(f"Corrupt compressed stream: {e}")
+        if len(out) > limit:
+            raise self._inflate_exceeded(limit, ratio_limit, stream_limit)
+        self.decoded_bytes += len(out)
+        return out
+
+    def measure_inflated(self, raw: bytes) -> bool:
+        """
+        Check a stream against the inflate budgets without keeping its data:
+        output is inflated a chunk at a time and discarded, stopping at the
+        first chunk over a budget. Returns False when the preflight deadline
+        passed before the stream was fully measured.
+        """
+        limit, ratio_limit, stream_limit = self._inflate_limits(len(raw))
+        decompressor = zlib.decompressobj()
+        pending = raw
+        size = 0
+        try:
+            while True:
+                chunk = decompressor.decompress(pending, INFLATE_CHUNK_BYTES)
+                pending = decompressor.unconsumed_tail
+                size += len(chunk)
+                if size > limit:
+                    raise self._inflate_exceeded(limit, ratio_limit, stream_limit)
+                if decompressor.eof or not chunk:
+                    break
+                if self.out_of_time():
+                    self.decoded_bytes += size
+                    return False
+        except zlib.error as e:
+            raise PdfSyntaxError(f"Corrupt compressed stream: {e}")
+        self.decoded_bytes += size
+        return True
+
+    def out_of_time(self) -> bool:
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def _object_stream(self, num: int) -> Tuple[bytes, Dict[int, int]]:
+        if num not in self._object_streams:
+            if num not in self.offsets:
+                raise PdfSyntaxError(f"Object stream {num} not found")
+            value, bounds = self.read_indirect(self.offsets[num])
+            if not isinstance(value, dict) or value.get("Type") != "ObjStm" or bounds is None:
+                raise PdfSyntaxError(f"Object {num} is not an object stream")
+            data = self.decode_stream(value, bounds)
+            first, count = value.get("First"), value.get("N")
+            if not isinstance(first, int) or not isinstance(count, int):
+                raise PdfSyntaxError(f"Object stream {num} lacks /First or /N")
+            self._check_entry_count(count)
+            numbers = re.findall(rb"\d+", data[:first])[:2 * count]
+            offsets = {int(numbers[i]): first + int(numbers[i + 1]) for i in range(0, len(numbers) - 1, 2)}
+            self._object_streams[num] = (data, offsets)
+        return self._object_streams[num]
+
+    def _load(self, num: int) -> Any:
+        if num in self._objects:
+            return self._objects[num]
+        # Marked before loading, so a cycle or a failed load reads as null
+        self._objects[num] = None
+        if self._load_depth >= MAX_LOAD_DEPTH:
+            raise PdfSyntaxError(f"Objects nested more than {MAX_LOAD_DEPTH} loads deep")
+        self._load_depth += 1
+        try:
+            if num in self.offsets:
+                self._objects[num] = self.read_indirect(self.offsets[num], with_stream=False)[0]
+            elif num in self.compressed:
+                data, offsets = self._object_stream(self.compressed[num][0])
+                if num in offsets:
+                    # Parse inside the decoded object stream with a scanner over its data
+                    inner = _PdfScanner(data)
+                    self._objects[num] = inner.parse_object(offsets[num])[0]
+        finally:
+            self._load_depth -= 1
+        return self._objects[num]
+
+    def resolve(self, value: Any) -> Any:
+        for _ in range(MAX_REFERENCE_CHAIN):
+            if not isinstance(value, _Ref):
+                return value
+            value = self._load(value.num)
+        raise PdfSyntaxError("Reference chain too long")
+
+    # Budgets
+
+    def sweep_streams(self):
+        """
+        Check every stream object: count, image sizes and decompression. The
+        first budget breach ends the sweep; so does the preflight deadline,
+        leaving sweep_complete False and the rest of the document to the
+        full parser.
+        """
+        for num, offset in self.offsets.items():
+            if self.out_of_time():
+                self._stop_sweep()
+                return
+            try:
+                value, bounds = self.read_indirect(offset)
+            except PdfSyntaxError:
+                # Damaged objects are skipped here, as full parsers do; only budgets reject
+                continue
+            if bounds is None:
+                continue
+            self.streams += 1
+            if bounds[0] in self._decoded_streams:
+                continue
+            if self.resolve(value.get("Subtype")) == "Image":
+                self.images += 1
+                if self.images > settings.pdf_max_images:
+                    raise PdfBudgetExceeded("images", f"More than {settings.pdf_max_images} images")
+                self._check_image(value)
+                continue
+            filters = self.resolve(value.get("Filter"))
+            first_filter = filters[0] if isinstance(filters, list) and filters else filters
+            if first_filter in ("FlateDecode", "Fl"):
+                try:
+                    measured = self.measure_inflated(self.data[bounds[0]:bounds[1]])
+                except PdfSyntaxError:
+                    continue
+                if not measured:
+                    self._stop_sweep()
+                    return
+
+    def _stop_sweep(self):
+        self.sweep_complete = False
+        logger.warning(
+            f"PDF preflight stopped after {self.streams} streams: "
+            f"time budget of {settings.pdf_preflight_max_seconds:g}s used up"
+        )
+
+    def _check_image(self, image: Dict[str, Any]):
+        width, height = self.resolve(image.get("Width")), self.resolve(image.get("Height"))
+        if not isinstance(width, int) or not isinstance(height, int):
+            return
+        if image.get("ImageMask") is True:
+            bits, components = 1, 1
+        else:
+            bits = self.resolve(image.get("BitsPerComponent"))
+            bits = bits if isinstance(bits, int) else 8
+            space = self.resolve(image.get("ColorSpace"))
+            if isinstance(space, list) and space:
+                space = self.resolve(space[0])
+            components = _COLOR_COMPONENTS.get(space, 4) if isinstance(space, str) else 4
+        declared = width * height * components * bits // 8
+        if declared > settings.pdf_max_stream_bytes:
+            raise PdfBudgetExceeded("image_bytes", f"An image of {width}x{height} decodes to more than {settings.pdf_max_stream_bytes} bytes")
+
+    def count_pages(self) -> int:
+        root = self.resolve(self.trailer.get("Root"))
+        if not isinstance(root, dict):
+            raise PdfSyntaxError("No document catalog")
+        pages = 0
+        visited = set()
+        stack: List[Tuple[Any, int]] = [(root.get("Pages"), 1)]
+        while stack:
+            node, depth = stack.pop()
+            if depth > settings.pdf_max_page_tree_depth:
+                raise PdfBudgetExceeded("page_tree_depth", f"Page tree deeper than {settings.pdf_max_page_tree_depth} levels")
+            if isinstance(node, _Ref):
+                if node.num in visited:
+                    continue
+                visited.add(node.num)
+            node = self.resolve(node)
+            if not isinstance(node, dict):
+                continue
+            kids = self.resolve(node.get("Kids"))
+            if isinstance(kids, list) and node.get("Type") != "Page":
+                stack.extend((kid, depth + 1) for kid in kids)
+            elif node.get("Type") != "Pages":
+                pages += 1
+        if not pages:
+            raise PdfSyntaxError("Page tree has no pages")
+        return pages
+
+
+def scan_pdf(data: bytes) -> Dict[str, Any]:
+    """
+    Structural report of a PDF: page count, objects, xref sections,
+    streams, images, decoded bytes and whether every stream was checked
+    within the time budget. Raises PdfBudgetExceeded, or
+    PdfSyntaxError when not even the objects can be located; `pages` is
+    None when the page tree could not be read.
+    """
+    if b"%PDF-" not in data[:1024]:
+        raise PdfSyntaxError("No PDF header")
+    scanner = _PdfScanner(data)
+    pages: Optional[int] = None
+    try:
+        scanner.read_xref_chain()
+        pages = scanner.count_pages()
+    except PdfSyntaxError as e:
+        logger.debug(f"Cross-reference unusable ({e}), scanning for objects")
+        scanner.rebuild_xref()
+        if not scanner.offsets:
+            raise PdfSyntaxError("No objects found")
+        try:
+            pages = scanner.count_pages()
+        except PdfSyntaxError as e:
+            logger.debug(f"Page tree unreadable: {e}")
+    # Budgets apply even when the page tree is unreadable, since the full parser will still try
+    scanner.sweep_streams()
+    return {
+        "pages": pages,
+        "objects": len(scanner.offsets) + len(scanner.compressed),
+        "xrefSections": scanner.xref_sections,
+        "streams": scanner.streams,
+        "images": scanner.images,
+        "decodedBytes": scanner.decoded_bytes,
+        "sweepComplete": scanner.sweep_complete,
+    }
@@ -0,0 +1,116 @@
+import os
+import sys
+import time
+import threading
+import tracemalloc
+import logging
+from typing import Dict, Any, List
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilerBusyError(Exception):
+    """Raised when a profile is requested while another one is running"""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    Wall-clock sampling profiler over all threads of the process.
+
+    A sampler thread reads sys._current_frames() every
+    profiler_sample_interval_ms and counts each thread's stack, so the
+    profiled code runs unmodified; the cost is one stack walk per thread
+    per sample. Stacks are returned in the collapsed format
+    ("thread;outer;...;inner count") that flamegraph.pl, speedscope and
+    similar tools read. Only one profile runs at a time per process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.profiles_taken = 0
+
+    def _sample(self, seconds: float, interval: float) -> Dict[str, Any]:
+        own_ident = threading.get_ident()
+        stacks: Dict[str, int] = {}
+        samples = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                labels.append(names.get(ident, f"thread-{ident}"))
+                stack = ";".join(reversed(labels))
+                stacks[stack] = stacks.get(stack, 0) + 1
+            samples += 1
+            time.sleep(interval)
+        return {"samples": samples, "stacks": stacks}
+
+    def _allocation_diff(self, before: tracemalloc.Snapshot, top: int) -> List[Dict[str, Any]]:
+        after = tracemalloc.take_snapshot()
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+        diff = after.filter_traces(filters).compare_to(before.filter_traces(filters), "lineno")
+        return [
+            {
+                "site": str(stat.traceback),
+                "size_diff_kb": round(stat.size_diff / 1024, 1),
+                "size_kb": round(stat.size / 1024, 1),
+                "count_diff": stat.count_diff,
+            }
+            for stat in diff[:top]
+        ]
+
+    def profile(self, seconds: float, trace_allocations: bool = False, top: int = 20) -> Dict[str, Any]:
+        """Sample all threads for `seconds` (capped); blocking, so run it in a worker thread"""
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusyError("A profile is already running in this process")
+        started_tracing = False
+        try:
+            seconds = min(max(seconds, 0.1), settings.profiler_max_seconds)
+            interval = settings.profiler_sample_interval_ms / 1000
+            before = None
+            if trace_allocations:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(settings.profiler_tracemalloc_frames)
+                    started_tracing = True
+                before = tracemalloc.take_snapshot()
+
+            logger.info(f"Profiling pid {os.getpid()} for {seconds:.1f}s (allocations: {trace_allocations})")
+            result = self._sample(seconds, interval)
+            collapsed = "\n".join(
+                f"{stack} {count}" for stack, count in sorted(result["stacks"].items(), key=lambda item: -item[1])
+            )
+            report: Dict[str, Any] = {
+                "pid": os.getpid(),
+                "seconds": seconds,
+                "interval_ms": settings.profiler_sample_interval_ms,
+                "samples": result["samples"],
+                "collapsed": collapsed,
+            }
+            if before is not None:
+                report["allocations"] = self._allocation_diff(before, top)
+            self.profiles_taken += 1
+            return report
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+            self._lock.release()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+
+# Global sampling profiler instance
+sampling_profiler = SamplingProfiler()
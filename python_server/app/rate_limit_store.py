@@ -0,0 +1,208 @@
+import asyncio
+import hashlib
+import os
+import struct
+import logging
+import tempfile
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Tuple, Any, Optional
+
+from pymongo import ReturnDocument
+
+from .config import settings
+from .database import db
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitStore:
+    """
+    Counter storage for the rate limiter.
+
+    Each key keeps one counter per fixed window; `add` returns the count of
+    the current window (after adding) and of the previous window, which is
+    all a sliding-window estimate needs.
+    """
+
+    name = "base"
+
+    async def add(self, key: str, window: int, amount: int = 1) -> Tuple[int, int]:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class MemoryRateLimitStore(RateLimitStore):
+    """Per-process counters in a bounded LRU"""
+
+    name = "memory"
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._counters: "OrderedDict[str, list]" = OrderedDict()  # key -> [window, current, previous]
+
+    async def add(self, key: str, window: int, amount: int = 1) -> Tuple[int, int]:
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = [window, 0, 0]
+            self._counters[key] = counter
+            if len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+        else:
+            self._counters.move_to_end(key)
+        if counter[0] != window:
+            counter[2] = counter[1] if counter[0] == window - 1 else 0
+            counter[0], counter[1] = window, 0
+        counter[1] = max(0, counter[1] + amount)
+        return counter[1], counter[2]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"tracked_keys": len(self._counters), "max_keys": self.max_keys}
+
+
+class SharedMemoryRateLimitStore(RateLimitStore):
+    """
+    Counters in a fixed-size shared memory table, shared by all workers on
+    one host. Each slot holds (key hash, window, current, previous); lookups
+    probe a few neighbouring slots and reuse the stalest one when full.
+    Access is serialised with an flock on a lock file (POSIX only), taken
+    without blocking so a worker waiting for it keeps serving other requests.
+    """
+
+    name = "shared_memory"
+    SLOT = struct.Struct("QqII")
+    PROBES = 16
+    LOCK_RETRY_SECONDS = 0.0005
+
+    def __init__(self, name: str, slots: int):
+        import fcntl
+        from multiprocessing import shared_memory, resource_tracker
+
+        self._fcntl = fcntl
+        self.slots = slots
+        size = slots * self.SLOT.size
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            self._shm = shared_memory.SharedMemory(name=name)
+        # The table outlives individual workers; don't let this process unlink it on exit
+        try:
+            resource_tracker.unregister(self._shm._name, "shared_memory")
+        except Exception:
+            pass
+        self._lock_path = os.path.join(tempfile.gettempdir(), f"{name}.lock")
+        self._lock_file = None
+        self._lock_pid: Optional[int] = None
+        self.lock_retries = 0
+
+    def _process_lock_file(self):
+        """
+        The lock file as opened by this process. flock is held per open file
+        description, and serve.py builds the store before forking, so a
+        description inherited from the master would not exclude siblings.
+        """
+        if self._lock_pid != os.getpid():
+            self._lock_file = open(self._lock_path, "a+")
+            self._lock_pid = os.getpid()
+        return self._lock_file
+
+    def _hash(self, key: str) -> int:
+        # 0 marks an empty slot
+        return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+
+    async def add(self, key: str, window: int, amount: int = 1) -> Tuple[int, int]:
+        key_hash = self._hash(key)
+        buf = self._shm.buf
+        lock_file = self._process_lock_file()
+        while True:
+            try:
+                self._fcntl.flock(lock_file, self._fcntl.LOCK_EX | self._fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                # Another worker holds it for a few microseconds; yield instead of blocking the loop
+                self.lock_retries += 1
+                await asyncio.sleep(self.LOCK_RETRY_SECONDS)
+        # No await until the lock is released, so this process' coroutines never interleave inside it
+        try:
+            target = None
+            free = None
+            stalest = None
+            for probe in range(self.PROBES):
+                offset = ((key_hash + probe) % self.slots) * self.SLOT.size
+                slot = self.SLOT.unpack_from(buf, offset)
+                if slot[0] == key_hash:
+                    target = offset
+                    _, slot_window, current, previous = slot
+                    break
+                if free is None and (slot[0] == 0 or slot[1] < window - 1):
+                    free = offset
+                if stalest is None or slot[1] < stalest[1]:
+                    stalest = (offset, slot[1])
+            if target is None:
+                # New key: take an empty or expired slot, else evict the stalest neighbour
+                target = free if free is not None else stalest[0]
+                slot_window, current, previous = window, 0, 0
+            if slot_window != window:
+                previous = current if slot_window == window - 1 else 0
+                current = 0
+            current = max(0, current + amount)
+            self.SLOT.pack_into(buf, target, key_hash, window, current, previous)
+            return current, previous
+        finally:
+            self._fcntl.flock(lock_file, self._fcntl.LOCK_UN)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"slots": self.slots, "segment": self._shm.name, "lock_retries": self.lock_retries}
+
+
+class MongoRateLimitStore(RateLimitStore):
+    """
+    Counters in MongoDB, shared by every node. One document per key and
+    window, incremented atomically with $inc and removed by a TTL index
+    once the following window is over.
+    """
+
+    name = "mongo"
+
+    def __init__(self, collection_name: str, window_seconds: int):
+        self.collection_name = collection_name
+        self.window_seconds = window_seconds
+        self._indexed = False
+
+    async def _collection(self):
+        collection = db.database[self.collection_name]
+        if not self._indexed:
+            await collection.create_index("expireAt", expireAfterSeconds=0)
+            self._indexed = True
+        return collection
+
+    async def add(self, key: str, window: int, amount: int = 1) -> Tuple[int, int]:
+        collection = await self._collection()
+        expire_at = datetime.utcfromtimestamp((window + 2) * self.window_seconds)
+        current_doc, previous_doc = await asyncio.gather(
+            collection.find_one_and_update(
+                {"_id": f"{key}:{window}"},
+                {"$inc": {"count": amount}, "$setOnInsert": {"expireAt": expire_at}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            ),
+            collection.find_one({"_id": f"{key}:{window - 1}"}, {"count": 1}),
+        )
+        return max(0, current_doc["count"]), previous_doc["count"] if previous_doc else 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"collection": self.collection_name}
+
+
+def create_rate_limit_store() -> RateLimitStore:
+    """Build the store selected by settings.rate_limit_backend"""
+    backend = settings.rate_limit_backend
+    if backend == "shared_memory":
+        return SharedMemoryRateLimitStore(settings.rate_limit_shm_name, settings.rate_limit_shm_slots)
+    if backend == "mongo":
+        return MongoRateLimitStore(settings.rate_limit_collection, settings.rate_limit_window_seconds)
+    if backend not in ("memory", ""):
+        logger.warning(f"Unknown rate limit backend '{backend}', using in-process memory")
+    return MemoryRateLimitStore(settings.rate_limit_max_keys)
@@ -0,0 +1,70 @@
+import time
+from contextvars import ContextVar
+from typing import Optional, Dict, Any
+
+
+class RequestTiming:
+    """
+    Stage durations, memory and input characteristics of one request (or
+    queued analysis). Stages observed through the metrics histograms are
+    added automatically; repeated stages (e.g. two extractions) accumulate.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.inputs: Dict[str, Any] = {}
+        self.memory: Dict[str, Dict[str, int]] = {}
+
+    def add_stage(self, stage: str, seconds: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def set_input(self, name: str, value: Any):
+        self.inputs[name] = value
+
+    def add_input(self, name: str, amount: int):
+        self.inputs[name] = self.inputs.get(name, 0) + amount
+
+    def add_memory(self, stage: str, name: str, kilobytes: int):
+        values = self.memory.setdefault(stage, {})
+        values[name] = values.get(name, 0) + kilobytes
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def stage_milliseconds(self) -> Dict[str, float]:
+        return {stage: round(seconds * 1000, 2) for stage, seconds in self.stages.items()}
+
+    def server_timing_header(self) -> str:
+        """Server-Timing header value, durations in milliseconds"""
+        entries = [f"{stage};dur={ms}" for stage, ms in self.stage_milliseconds().items()]
+        entries.append(f"total;dur={round(self.elapsed() * 1000, 2)}")
+        return ", ".join(entries)
+
+
+# Timing context of the request being handled; copied into to_thread and hedge threads
+current_timing: ContextVar[Optional[RequestTiming]] = ContextVar("current_timing", default=None)
+
+
+def start_timing() -> RequestTiming:
+    timing = RequestTiming()
+    current_timing.set(timing)
+    return timing
+
+
+def record_stage(stage: str, seconds: float):
+    timing = current_timing.get()
+    if timing is not None:
+        timing.add_stage(stage, seconds)
+
+
+def record_input(name: str, value: Any):
+    timing = current_timing.get()
+    if timing is not None:
+        timing.set_input(name, value)
+
+
+def add_input(name: str, amount: int):
+    timing = current_timing.get()
+    if timing is not None:
+        timing.add_input(name, amount)
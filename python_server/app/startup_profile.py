@@ -0,0 +1,179 @@
+"""
+Startup profiling: per-module import times and time-to-ready.
+
+main.py imports this module first, so the import timer (enabled with
+STARTUP_PROFILE=1) sees every later import. It is read from the
+environment directly because loading settings is itself part of what is
+measured.
+
+Run `python -m app.startup_profile` to import the application once and
+print the report; it exits non-zero when imports exceed
+STARTUP_TARGET_SECONDS.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import importlib
+import threading
+from importlib.abc import MetaPathFinder
+from typing import Dict, Any, Optional, List
+
+logger = logging.getLogger(__name__)
+
+# Parsing and SDK packages imported on first use; preload_heavy_modules loads them ahead of traffic
+HEAVY_MODULES = ("pdfplumber", "PyPDF2", "docx", "filetype", "groq")
+
+
+class _TimedLoader:
+    """Wraps a module loader to time exec_module; other attributes are delegated"""
+
+    def __init__(self, loader, name: str, timer: "ImportTimer"):
+        self._loader = loader
+        self._name = name
+        self._timer = timer
+
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._timer.enter()
+        started = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._timer.leave(self._name, time.perf_counter() - started)
+
+
+class ImportTimer(MetaPathFinder):
+    """
+    Records how long each module takes to execute on import, both
+    cumulative (including the modules it imports) and self time.
+    """
+
+    def __init__(self):
+        self.cumulative: Dict[str, float] = {}
+        self.self_time: Dict[str, float] = {}
+        self._local = threading.local()
+
+    def _children(self) -> List[float]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def enter(self):
+        self._children().append(0.0)
+
+    def leave(self, name: str, elapsed: float):
+        stack = self._children()
+        children = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        self.cumulative[name] = elapsed
+        self.self_time[name] = max(0.0, elapsed - children)
+
+    def find_spec(self, fullname, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = _TimedLoader(spec.loader, fullname, self)
+            return spec
+        return None
+
+    def packages(self) -> Dict[str, float]:
+        """Self time summed per top-level package"""
+        totals: Dict[str, float] = {}
+        for name, seconds in self.self_time.items():
+            root = name.split(".", 1)[0]
+            totals[root] = totals.get(root, 0.0) + seconds
+        return totals
+
+
+class StartupProfile:
+    """Milestones of process startup, in seconds since this module was imported"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.import_timer: Optional[ImportTimer] = None
+
+    def install_import_timer(self):
+        if self.import_timer is None:
+            self.import_timer = ImportTimer()
+            sys.meta_path.insert(0, self.import_timer)
+
+    def remove_import_timer(self):
+        if self.import_timer is not None and self.import_timer in sys.meta_path:
+            sys.meta_path.remove(self.import_timer)
+
+    def mark(self, phase: str):
+        self.phases[phase] = round(time.perf_counter() - self.started, 3)
+
+    def report(self, top: int = 15) -> Dict[str, Any]:
+        report: Dict[str, Any] = {"phases": dict(self.phases), "time_to_ready": self.phases.get("ready")}
+        if self.import_timer is not None:
+            timer = self.import_timer
+            report["slowest_packages"] = {
+                name: round(seconds, 3)
+                for name, seconds in sorted(timer.packages().items(), key=lambda item: -item[1])[:top]
+            }
+            report["slowest_modules"] = {
+                name: round(seconds, 3)
+                for name, seconds in sorted(timer.self_time.items(), key=lambda item: -item[1])[:top]
+            }
+        return report
+
+    def log_ready(self, target_seconds: float):
+        self.mark("ready")
+        ready = self.phases["ready"]
+        logger.info(f"Ready in {ready:.2f}s (phases: {self.phases})")
+        if self.import_timer is not None:
+            logger.info(f"Slowest imports: {self.report(top=10)['slowest_packages']}")
+        if target_seconds and ready > target_seconds:
+            logger.warning(f"Startup took {ready:.2f}s, over the {target_seconds:.1f}s target")
+
+
+def preload_heavy_modules():
+    """Import the lazily imported dependencies, e.g. before forking workers or in the background"""
+    for name in HEAVY_MODULES:
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            logger.warning(f"Could not preload {name}: {e}")
+    startup_profile.mark("heavy_modules_preloaded")
+
+
+# Global startup profile instance
+startup_profile = StartupProfile()
+if os.getenv("STARTUP_PROFILE", "").lower() in ("1", "true", "yes"):
+    startup_profile.install_import_timer()
+
+
+def main() -> int:
+    # Run as a script this file is __main__; use the module instance main.py records into
+    from app.startup_profile import startup_profile as profile
+    profile.install_import_timer()
+    import main  # noqa: F401
+    profile.mark("app_imported")
+    from app.config import settings
+    report = profile.report()
+    print(json.dumps(report, indent=2))
+    imported = profile.phases["app_imported"]
+    if settings.startup_target_seconds and imported > settings.startup_target_seconds:
+        print(f"❌ Import took {imported:.2f}s, over the {settings.startup_target_seconds:.1f}s target")
+        return 1
+    print(f"✅ Import took {imported:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
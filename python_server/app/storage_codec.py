@@ -0,0 +1,114 @@
+import json
+import zlib
+import logging
+import importlib.util
+from typing import Dict, Any
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Bulky, rarely re-read fields stored compressed; summary fields stay plain BSON so they remain queryable
+COMPRESSED_FIELDS = ("result.resume_analysis_report", "jobDescriptionText")
+
+# First byte of a compressed value names its codec, so documents written with either can be read
+CODEC_TAGS = {"zlib": b"\x01", "zstd": b"\x02"}
+
+
+class StorageCompressionStats:
+    """Sizes of the fields compressed on write"""
+
+    def __init__(self):
+        self.values = 0
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+
+    def record(self, raw: int, stored: int):
+        self.values += 1
+        self.raw_bytes += raw
+        self.stored_bytes += stored
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "codec": settings.analysis_storage_compression,
+            "compressed_values": self.values,
+            "raw_bytes": self.raw_bytes,
+            "stored_bytes": self.stored_bytes,
+            "ratio": round(self.stored_bytes / self.raw_bytes, 3) if self.raw_bytes else None,
+        }
+
+
+# Global compression statistics instance
+storage_compression_stats = StorageCompressionStats()
+
+
+def _zstd():
+    import zstandard
+    return zstandard
+
+
+def storage_codec() -> str:
+    """The configured codec, or "none"; zstd falls back to zlib when zstandard is missing"""
+    codec = settings.analysis_storage_compression
+    if codec == "zstd" and not importlib.util.find_spec("zstandard"):
+        logger.warning("zstandard is not installed, compressing analyses with zlib")
+        return "zlib"
+    return codec if codec in CODEC_TAGS else "none"
+
+
+def compress_value(value: Any, codec: str) -> bytes:
+    raw = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if codec == "zstd":
+        data = _zstd().ZstdCompressor(level=settings.analysis_compression_level).compress(raw)
+    else:
+        data = zlib.compress(raw, settings.analysis_compression_level)
+    storage_compression_stats.record(len(raw), len(data) + 1)
+    return CODEC_TAGS[codec] + data
+
+
+def decompress_value(data: bytes) -> Any:
+    tag, payload = data[:1], data[1:]
+    if tag == CODEC_TAGS["zstd"]:
+        raw = _zstd().ZstdDecompressor().decompress(payload)
+    elif tag == CODEC_TAGS["zlib"]:
+        raw = zlib.decompress(payload)
+    else:
+        raise ValueError(f"Unknown compressed field codec {tag!r}")
+    return json.loads(raw)
+
+
+def _parent(doc: Dict[str, Any], path: str):
+    *parents, leaf = path.split(".")
+    for key in parents:
+        doc = doc.get(key) if isinstance(doc, dict) else None
+        if doc is None:
+            return None, leaf
+    return (doc if isinstance(doc, dict) else None), leaf
+
+
+def pack_document(doc: Dict[str, Any], codec: str = None) -> Dict[str, Any]:
+    """
+    Compress COMPRESSED_FIELDS of a document (or $set update) in place.
+    Values shorter than analysis_compression_min_bytes are left as they are.
+    """
+    codec = codec or storage_codec()
+    if codec == "none":
+        return doc
+    for path in COMPRESSED_FIELDS:
+        parent, leaf = _parent(doc, path)
+        if parent is None or parent.get(leaf) is None or isinstance(parent[leaf], bytes):
+            continue
+        value = parent[leaf]
+        if isinstance(value, str) and len(value) < settings.analysis_compression_min_bytes:
+            continue
+        parent[leaf] = compress_value(value, codec)
+    return doc
+
+
+def unpack_document(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Decompress any compressed COMPRESSED_FIELDS of a stored document in place"""
+    for path in COMPRESSED_FIELDS:
+        parent, leaf = _parent(doc, path)
+        if parent is not None and isinstance(parent.get(leaf), bytes):
+            parent[leaf] = decompress_value(parent[leaf])
+    return doc
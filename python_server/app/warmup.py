@@ -0,0 +1,176 @@
+import io
+import time
+import asyncio
+import logging
+import zipfile
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+from .config import settings
+from .database import get_collection
+from .key_pool import groq_key_pool
+from .startup_profile import preload_heavy_modules, startup_profile
+
+logger = logging.getLogger(__name__)
+
+WARMUP_TEXT = "Warm-up resume: Software Engineer with Python experience"
+
+
+def tiny_pdf() -> bytes:
+    """One-page PDF using a standard font, so pdfminer loads its font metrics and encodings"""
+    content = b"BT /F1 12 Tf 10 20 Td (" + WARMUP_TEXT.encode("ascii") + b") Tj ET"
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 400 50] /Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def tiny_docx() -> bytes:
+    """Minimal single-paragraph DOCX"""
+    parts = {
+        "[Content_Types].xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/word/document.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+            '</Types>'
+        ),
+        "_rels/.rels": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" '
+            'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+            'Target="word/document.xml"/>'
+            '</Relationships>'
+        ),
+        "word/document.xml": (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+            f'<w:body><w:p><w:r><w:t>{WARMUP_TEXT}</w:t></w:r></w:p></w:body>'
+            '</w:document>'
+        ),
+    }
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, xml in parts.items():
+            archive.writestr(name, xml)
+    return buffer.getvalue()
+
+
+def warm_up_parsers():
+    """
+    Run every extraction engine once on the bundled documents. The engines
+    are called directly rather than through FileProcessor so warm-up runs do
+    not show up in the extraction metrics.
+    """
+    import filetype
+    import pdfplumber
+    import PyPDF2
+    import docx
+
+    pdf, docx_bytes = tiny_pdf(), tiny_docx()
+    filetype.guess(pdf)
+    filetype.guess(docx_bytes)
+    with pdfplumber.open(io.BytesIO(pdf)) as document:
+        texts = [page.extract_text() for page in document.pages]
+    if not any(texts):
+        raise RuntimeError("pdfplumber extracted no text from the warm-up PDF")
+    for page in PyPDF2.PdfReader(io.BytesIO(pdf)).pages:
+        page.extract_text()
+    if not any(p.text for p in docx.Document(io.BytesIO(docx_bytes)).paragraphs):
+        raise RuntimeError("python-docx extracted no text from the warm-up DOCX")
+
+
+def warm_up_groq():
+    """Open a connection (TLS handshake included) on every pooled key's client without spending tokens"""
+    for key in groq_key_pool.keys:
+        key.client.models.list()
+
+
+async def warm_up_mongo():
+    """Touch the analysisId index and the collections the request path uses (the pool is warmed on connect)"""
+    for purpose in ("results", "status", "history", "token_usage"):
+        await get_collection(purpose)
+    results = await get_collection("results")
+    await results.find_one({"analysisId": "__warmup__"}, {"_id": 1})
+
+
+class WarmupState:
+    """
+    Warm-up half of this worker's readiness: False until the warm-up has
+    run, and False again once shutdown begins. A failed or timed-out step
+    does not hold it back (the dependency probes decide whether MongoDB
+    and Groq are usable); status() reports it as ok=False instead.
+    """
+
+    def __init__(self):
+        self.ready = False
+        self.draining = False
+        self.timed_out = False
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self.seconds: Optional[float] = None
+
+    async def _step(self, name: str, run: Callable[[], Awaitable[Any]]):
+        started = time.perf_counter()
+        try:
+            await run()
+            self.steps[name] = {"ok": True}
+        except Exception as e:
+            logger.warning(f"Warm-up step {name} failed: {e}")
+            self.steps[name] = {"ok": False, "error": str(e)}
+        self.steps[name]["seconds"] = round(time.perf_counter() - started, 3)
+
+    async def _run_steps(self):
+        await self._step("modules", lambda: asyncio.to_thread(preload_heavy_modules))
+        # The three are independent, so they warm concurrently
+        await asyncio.gather(
+            self._step("parsers", lambda: asyncio.to_thread(warm_up_parsers)),
+            self._step("groq", lambda: asyncio.to_thread(warm_up_groq)),
+            self._step("mongo", warm_up_mongo),
+        )
+
+    async def run(self):
+        started = time.perf_counter()
+        if settings.warmup_enabled:
+            try:
+                await asyncio.wait_for(self._run_steps(), timeout=settings.warmup_timeout)
+            except asyncio.TimeoutError:
+                self.timed_out = True
+                logger.warning(f"Warm-up did not finish within {settings.warmup_timeout}s, marking ready anyway")
+        self.seconds = round(time.perf_counter() - started, 3)
+        self.ready = not self.draining
+        logger.info(f"Warm-up finished in {self.seconds:.2f}s: {self.steps}")
+        startup_profile.log_ready(settings.startup_target_seconds)
+
+    def drain(self):
+        """Stop reporting ready so load balancers stop routing here during shutdown"""
+        self.draining = True
+        self.ready = False
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "ok": not self.timed_out and all(step["ok"] for step in self.steps.values()),
+            "timed_out": self.timed_out,
+            "draining": self.draining,
+            "warmup_seconds": self.seconds,
+            "steps": self.steps,
+        }
+
+
+# Global warm-up state instance
+warmup_state = WarmupState()
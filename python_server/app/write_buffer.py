@@ -0,0 +1,261 @@
+import asyncio
+import os
+import time
+import logging
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Any, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no serve.py workers share the spill file
+    fcntl = None
+
+from bson import json_util
+from pymongo.errors import BulkWriteError
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+
+class AnalysisWriteBuffer:
+    """
+    Write-behind buffer for completed analyses.
+
+    Documents are collected and written with one unordered insert_many per
+    target collection when `batch_size` of them are waiting or every
+    `flush_interval` seconds. With
+    "ack" durability the caller waits for the batch holding its document,
+    so concurrent requests share a single round trip. With "fire_and_forget"
+    the caller returns immediately and batches that cannot be written are
+    appended to a local spill file, which is replayed once MongoDB accepts
+    writes again. Every serve.py worker shares the spill file; appends and
+    the replay's rotation hold an flock, and its I/O runs in a thread.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, durability: str, spill_path: str, max_pending: int):
+        if durability not in ("ack", "fire_and_forget"):
+            logger.warning(f"Unknown write durability '{durability}', using ack")
+            durability = "ack"
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self.spill_path = spill_path
+        self.max_pending = max_pending
+        self._collections: Dict[str, Any] = {}
+        self._pending: List[Tuple[str, Dict[str, Any], Optional[asyncio.Future]]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.documents_written = 0
+        self.duplicates = 0
+        self.failed_flushes = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.last_batch_size = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self, collections: Dict[str, Any]):
+        """Start flushing; `collections` maps target names to collections"""
+        self._collections = collections
+        self._wakeup = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Analysis write buffer started ({self.durability}, batch {self.batch_size}, "
+            f"every {self.flush_interval}s)"
+        )
+
+    async def add(self, doc: Dict[str, Any], target: str = "analyses"):
+        """Queue a document for a target collection; in ack mode, wait until its batch is written"""
+        if self.durability == "fire_and_forget" and len(self._pending) >= self.max_pending:
+            # MongoDB has been unreachable long enough to back up this far
+            await self._spill(target, [doc])
+            return
+        future = asyncio.get_running_loop().create_future() if self.durability == "ack" else None
+        self._pending.append((target, doc, future))
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        if future is not None:
+            await future
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Analysis write buffer flush crashed: {e}")
+
+    async def flush(self):
+        """Write everything pending, batch by batch"""
+        async with self._lock:
+            written = True
+            while self._pending:
+                batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+                written = True
+                for target in dict.fromkeys(entry[0] for entry in batch):
+                    entries = [entry for entry in batch if entry[0] == target]
+                    written = await self._write(target, [doc for _, doc, _ in entries], entries) and written
+                if not written and self.durability == "fire_and_forget":
+                    # Leave the rest buffered until MongoDB recovers
+                    break
+            # Replay only once MongoDB takes writes again, not right after spilling a failed batch
+            if written and not self._pending and self.durability == "fire_and_forget":
+                await self._replay_spill()
+
+    async def _write(self, target: str, docs: List[Dict[str, Any]], batch) -> bool:
+        started = time.perf_counter()
+        error = None
+        try:
+            await self._collections[target].insert_many(docs, ordered=False)
+            written = len(docs)
+        except BulkWriteError as e:
+            # Duplicates are documents already stored (e.g. replayed from the spill file)
+            write_errors = e.details.get("writeErrors", [])
+            self.duplicates += sum(1 for err in write_errors if err.get("code") == DUPLICATE_KEY)
+            fatal = [err for err in write_errors if err.get("code") != DUPLICATE_KEY]
+            written = e.details.get("nInserted", 0)
+            if fatal:
+                error = Exception(f"{len(fatal)} of {len(docs)} analyses failed to insert: {fatal[0].get('errmsg')}")
+        except Exception as e:
+            written = 0
+            error = e
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.flushes += 1
+        self.documents_written += written
+        self.last_batch_size = len(docs)
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+
+        if error is None:
+            for _, _, future in batch:
+                if future is not None and not future.done():
+                    future.set_result(None)
+            return True
+
+        self.failed_flushes += 1
+        logger.error(f"❌ Failed to write {len(docs)} buffered analyses: {error}")
+        if self.durability == "fire_and_forget":
+            await self._spill(target, docs)
+        for _, _, future in batch:
+            if future is not None and not future.done():
+                future.set_exception(error)
+        return False
+
+    @contextmanager
+    def _spill_lock(self):
+        """Exclusive lock, across worker processes, for appending to or rotating the spill file"""
+        with open(f"{self.spill_path}.lock", "a") as lock_file:
+            if fcntl is not None:
+                # Released when the file is closed
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            yield
+
+    def _append_spill(self, target: str, docs: List[Dict[str, Any]]):
+        text = "".join(
+            json_util.dumps({"target": target, "doc": doc}, json_options=json_util.CANONICAL_JSON_OPTIONS) + "\n"
+            for doc in docs
+        )
+        with self._spill_lock():
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                f.write(text)
+
+    def _take_spill(self) -> List[Dict[str, Any]]:
+        """Move the spill file aside and read it; other workers start a new one meanwhile"""
+        # Per-process name, so two workers replaying at once never share a file
+        replaying = f"{self.spill_path}.{os.getpid()}.replay"
+        with self._spill_lock():
+            if not os.path.exists(self.spill_path):
+                return []
+            os.replace(self.spill_path, replaying)
+        with open(replaying, encoding="utf-8") as f:
+            lines = [json_util.loads(line) for line in f if line.strip()]
+        os.remove(replaying)
+        return lines
+
+    async def _spill(self, target: str, docs: List[Dict[str, Any]]):
+        if not docs:
+            return
+        try:
+            await asyncio.to_thread(self._append_spill, target, docs)
+            self.spilled += len(docs)
+            logger.warning(f"Spilled {len(docs)} analyses to {self.spill_path}")
+        except OSError as e:
+            logger.error(f"❌ Failed to spill {len(docs)} analyses, they are lost: {e}")
+
+    async def _replay_spill(self):
+        lines = await asyncio.to_thread(self._take_spill)
+        if not lines:
+            return
+        logger.info(f"Replaying {len(lines)} spilled analyses")
+        by_target: Dict[str, List[Dict[str, Any]]] = {}
+        for line in lines:
+            by_target.setdefault(line["target"], []).append(line["doc"])
+        failed = False
+        for target, docs in by_target.items():
+            for i in range(0, len(docs), self.batch_size):
+                if failed:
+                    await self._spill(target, docs[i:])
+                    break
+                chunk = docs[i:i + self.batch_size]
+                if await self._write(target, chunk, []):
+                    self.replayed += len(chunk)
+                else:
+                    # _write spilled the failed chunk again; keep the rest too
+                    failed = True
+
+    async def stop(self):
+        """Stop the flush loop and write (or spill) whatever is still pending"""
+        if self._task is None:
+            return
+        # Cancel between flushes so no batch is dropped mid-insert
+        async with self._lock:
+            self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self.flush()
+        for target, doc, _ in self._pending:
+            await self._spill(target, [doc])
+        self._pending = []
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.running,
+            "durability": self.durability,
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "documents_written": self.documents_written,
+            "duplicates_skipped": self.duplicates,
+            "average_batch_size": round(self.documents_written / self.flushes, 2) if self.flushes else 0,
+            "last_batch_size": self.last_batch_size,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "spill_file_exists": os.path.exists(self.spill_path),
+        }
+
+
+# Global write buffer instance, started from the application lifespan when enabled
+analysis_write_buffer = AnalysisWriteBuffer(
+    settings.analysis_write_batch_size,
+    settings.analysis_write_flush_interval,
+    settings.analysis_write_durability,
+    settings.analysis_write_spill_path,
+    settings.analysis_write_max_pending,
+)
@@ -0,0 +1,91 @@
+"""
+Migrate stored analyses to (or back from) compressed storage.
+
+Compresses `result.resume_analysis_report` and long `jobDescriptionText`
+values of existing documents with the codec set in
+ANALYSIS_STORAGE_COMPRESSION, or restores them to plain BSON with
+--decompress (e.g. before turning compression off again). Documents are
+processed in _id order in batches and each is updated only if it has not
+changed since it was read, so the command is safe to re-run and to run
+against a live server.
+
+With ANALYSIS_SPLIT_STORAGE the reports live in the detail collection;
+migrate it with --details.
+
+Usage:
+    python compress_analyses.py [--decompress] [--details] [--batch-size 200] [--dry-run]
+"""
+import argparse
+import asyncio
+import sys
+
+from pymongo import UpdateOne
+
+from app.database import connect_to_mongo, close_mongo_connection, get_collection
+from app.storage_codec import COMPRESSED_FIELDS, pack_document, unpack_document, storage_codec, storage_compression_stats
+
+
+def _field(doc, path):
+    for key in path.split("."):
+        doc = doc.get(key) if isinstance(doc, dict) else None
+    return doc
+
+
+async def migrate(decompress: bool, details: bool, batch_size: int, dry_run: bool) -> int:
+    codec = storage_codec()
+    if not decompress and codec == "none":
+        print("❌ Set ANALYSIS_STORAGE_COMPRESSION to zlib or zstd first")
+        return 1
+
+    collection = await get_collection("details" if details else "results")
+    projection = {"_id": 1, "updatedAt": 1, **{path: 1 for path in COMPRESSED_FIELDS}}
+    last_id = None
+    scanned = changed = 0
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        docs = await collection.find(query, projection).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+        operations = []
+        for doc in docs:
+            scanned += 1
+            before = {path: _field(doc, path) for path in COMPRESSED_FIELDS}
+            if decompress:
+                unpack_document(doc)
+            else:
+                pack_document(doc, codec)
+            update = {
+                path: _field(doc, path) for path in COMPRESSED_FIELDS
+                if _field(doc, path) is not before[path]
+            }
+            if update:
+                # Skip documents a live server rewrote since we read them
+                operations.append(UpdateOne({"_id": doc["_id"], "updatedAt": doc.get("updatedAt")}, {"$set": update}))
+        changed += len(operations)
+        if operations and not dry_run:
+            await collection.bulk_write(operations, ordered=False)
+        print(f"  scanned {scanned}, {'would update' if dry_run else 'updated'} {changed}")
+
+    stats = storage_compression_stats.stats()
+    print(f"✅ {'Decompressed' if decompress else 'Compressed'} {changed} of {scanned} analyses")
+    if not decompress and stats["raw_bytes"]:
+        print(f"   {stats['raw_bytes']} bytes -> {stats['stored_bytes']} bytes (ratio {stats['ratio']})")
+    return 0
+
+
+async def main(args) -> int:
+    await connect_to_mongo()
+    try:
+        return await migrate(args.decompress, args.details, args.batch_size, args.dry_run)
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--decompress", action="store_true", help="restore compressed fields to plain BSON")
+    parser.add_argument("--details", action="store_true", help="migrate the split-storage detail collection")
+    parser.add_argument("--batch-size", type=int, default=200, help="documents per bulk write")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -1,35 +1,60 @@
+from app.startup_profile import startup_profile  # first, so the import timer sees everything else
 import os
 import sys
+import asyncio
+import importlib.util
 import logging
 from pathlib import Path
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, RedirectResponse
+from fastapi.responses import JSONResponse, RedirectResponse, PlainTextResponse
 from contextlib import asynccontextmanager
 import uvicorn
 from app.config import settings
-from app.database import connect_to_mongo, close_mongo_connection
-from app.middleware import rate_limit_middleware
+from app.log_config import setup_logging
+from app.database import connect_to_mongo, close_mongo_connection, ensure_indexes, get_collection
+from app.health_monitor import health_monitor
+from app.job_queue import analysis_queue
+from app.metrics import metrics
+from app.warmup import warmup_state
+from app.loop_monitor import loop_monitor
+from app.memory_budget import start_allocation_tracing
+from app.write_buffer import analysis_write_buffer
+from app.middleware import rate_limit_middleware, server_timing_middleware, request_id_middleware
 from app.models import ErrorResponse
 
-logging.basicConfig(
-    level=logging.INFO,  # or settings.log_level
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
-logging.getLogger().setLevel(logging.INFO)
-logging.getLogger("uvicorn.access").setLevel(logging.INFO)
-logging.getLogger("uvicorn.error").setLevel(logging.INFO)
-logging.getLogger("pymongo").setLevel(logging.WARNING)
-logging.getLogger("motor").setLevel(logging.WARNING)
-logging.getLogger("urllib3").setLevel(logging.WARNING)
-logging.getLogger("httpx").setLevel(logging.WARNING)
+setup_logging()
+startup_profile.mark("imports")
 
 logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await connect_to_mongo()  # Raises exception if connection fails
+    await ensure_indexes()
+    startup_profile.mark("mongo_connected")
+    if settings.analysis_write_buffer:
+        await analysis_write_buffer.start({
+            "analyses": await get_collection("results"),
+            "details": await get_collection("details"),
+        })
+    health_monitor.start()
+    metrics.start()
+    loop_monitor.start()
+    start_allocation_tracing()
+    await analysis_queue.start(perform_analysis, on_abandoned=abandon_analysis)
+    startup_profile.mark("started")
+    # Serve liveness right away; /api/v1/health/ready can turn 200 once parsers, Groq and MongoDB are warm
+    warmup = asyncio.create_task(warmup_state.run())
     yield
+    warmup_state.drain()
+    warmup.cancel()
+    await analysis_queue.stop(timeout=settings.graceful_shutdown_timeout)
+    await analysis_write_buffer.stop()
+    await health_monitor.stop()
+    await metrics.stop()
+    await loop_monitor.stop()
+    await asyncio.gather(warmup, return_exceptions=True)
     await close_mongo_connection()
 
 app = FastAPI(
@@ -48,12 +73,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 app.middleware("http")(rate_limit_middleware)
+# Wraps rate limiting, so the reported total covers it; only request_id_middleware sits outside
+app.middleware("http")(server_timing_middleware)
+app.middleware("http")(request_id_middleware)
 
-from routes.analysis_routes import router as analysis_router
+from routes.analysis_routes import router as analysis_router, perform_analysis, abandon_analysis
 from routes.health_routes import router as health_router
+from routes.usage_routes import router as usage_router
+from routes.admin_routes import router as admin_router
 
 app.include_router(analysis_router, prefix="/api/v1")
 app.include_router(health_router, prefix="/api/v1")
+app.include_router(usage_router, prefix="/api/v1")
+app.include_router(admin_router, prefix="/api/v1")
 
 @app.get("/")
 async def root():
@@ -65,6 +97,12 @@ async def root():
         "health": "/api/v1/health"
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint, aggregated over all worker processes"""
+    body = await asyncio.to_thread(metrics.render)
+    return PlainTextResponse(body, media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # Removed problematic redirect endpoints that were causing 500 errors
 
 @app.exception_handler(HTTPException)
@@ -103,15 +141,13 @@ def check_virtual_environment():
     return hasattr(sys, 'real_prefix') or (hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix)
 
 def check_dependencies():
-    try:
-        import fastapi
-        import groq
-        import uvicorn
-        return True
-    except ImportError as e:
-        print(f"❌ Missing dependencies: {e}")
+    # find_spec checks availability without paying for the imports
+    missing = [name for name in ("fastapi", "groq", "uvicorn") if importlib.util.find_spec(name) is None]
+    if missing:
+        print(f"❌ Missing dependencies: {', '.join(missing)}")
         print("💡 Please install dependencies with: pip install -r requirements.txt")
         return False
+    return True
 
 def check_env_file():
     env_file = Path(".env")
@@ -159,7 +195,8 @@ if __name__ == "__main__":
             host=settings.host,
             port=settings.port,
             reload=True,
-            log_level="warning"
+            log_level="warning",
+            log_config=None  # keep the queued handlers installed by setup_logging
         )
     except KeyboardInterrupt:
         print("\n🛑 Server stopped by user")
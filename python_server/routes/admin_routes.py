@@ -0,0 +1,36 @@
+import asyncio
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from app.config import settings
+from app.middleware import get_current_admin_id
+from app.profiler import sampling_profiler, ProfilerBusyError
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+logger = logging.getLogger(__name__)
+
+
+def require_profiler_enabled():
+    # Checked before authentication, so a disabled profiler is indistinguishable from a missing route
+    if not settings.profiler_enabled:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@router.post("/profile", include_in_schema=False, dependencies=[Depends(require_profiler_enabled)])
+async def profile(
+    seconds: float = Query(10.0, gt=0, description="Sampling duration, capped at PROFILER_MAX_SECONDS"),
+    allocations: bool = Query(False, description="Also diff tracemalloc snapshots taken before and after"),
+    top: int = Query(20, ge=1, le=200, description="Allocation sites to return"),
+    adminId: str = Depends(get_current_admin_id),
+):
+    """
+    Sample every thread of the answering worker and return the stacks in
+    collapsed (flamegraph) format. Disabled unless PROFILER_ENABLED is set.
+    """
+    logger.info(f"Profile requested by admin {adminId}")
+    try:
+        # The sampler sleeps between samples in its own thread; the loop keeps serving meanwhile
+        return await asyncio.to_thread(sampling_profiler.profile, seconds, allocations, top)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
@@ -1,60 +1,209 @@
-import time
 from uuid import uuid4
-from typing import Optional, Union
+from typing import Optional, Union, Tuple, Dict, Any
 from datetime import datetime
 
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends, Query, Header
+from fastapi.responses import JSONResponse, Response
 import logging
 import asyncio
 
 from app.file_processor import FileProcessor
 from app.groq_service import GroqService
-from app.models import ResumeAnalysisResponse, ErrorResponse, AnalysisDocument, AnalysisStatus
-from app.database import save_analysis,  update_analysis
+from app.analysis_cache import analysis_etag
+from app.job_queue import AnalysisJob, analysis_queue
+from app.models import ResumeAnalysisResponse, ErrorResponse, AnalysisDocument, AnalysisStatus, AnalysisHistoryPage
+from app.database import save_analysis, update_analysis, get_analysis_by_id, get_analysis_history, summary_from_document, record_token_usage
 from app.middleware import get_current_user_id
+from app.metrics import STAGE_SECONDS, VALIDATION_REJECTIONS
+from app.request_timing import RequestTiming, current_timing, start_timing
+from app.memory_budget import MemoryBudgetTimeout, memory_budget, measure_memory, estimate_document_bytes
+from app.log_config import request_id_var
+from app.model_router import ANALYSIS_DEPTHS
 from app.config import settings
 
 router = APIRouter(tags=["analysis"])
 logger = logging.getLogger(__name__)
 
-async def perform_analysis(
-    analysisId: str,
-    resume_text: str,
-    # jobDescriptionFilename: str,
-    userId: str,
+STATUS_MESSAGES = {
+    "queued": "Analysis queued",
+    "extracting": "Extracting text from uploaded files",
+    "analyzing": "Analyzing resume against job description",
+    "completed": "Analysis completed successfully",
+    "failed": "Analysis failed",
+}
+
+
+def extract_inputs(
+    resume_content: bytes,
     resumeFilename: str,
+    jobdesc_content: Optional[bytes],
+    jobdesc_filename: Optional[str],
+    jobDescriptionText: Optional[str],
     jobDescriptionFilename: Optional[str]
-):
-    start_time = time.time()
-    groq_service = GroqService()
-    result = groq_service.analyze_resume(resume_text, jobDescriptionFilename)
-    
+) -> Tuple[str, str, str]:
+    """Extract and validate resume and job description text, raising HTTPException on invalid input"""
+    # Process resume file with type enforcement
+    with measure_memory("extraction"):
+        resume_text, resume_success, resume_type = FileProcessor.process_file(resume_content, resumeFilename, file_type_hint='resume')
+    if not resume_success:
+        VALIDATION_REJECTIONS.inc(reason="resume_file")
+        raise HTTPException(status_code=400, detail=resume_text)
+    with STAGE_SECONDS.time(stage="content_validation"):
+        resume_valid, resume_msg = FileProcessor.validate_content(resume_text, "resume")
+    if not resume_valid:
+        VALIDATION_REJECTIONS.inc(reason="resume_content")
+        raise HTTPException(status_code=400, detail=resume_msg)
+
+    if jobdesc_content is not None:
+        # Process job description file with type enforcement
+        with measure_memory("extraction"):
+            job_desc_text, jobdesc_success, jobdesc_type = FileProcessor.process_file(jobdesc_content, jobdesc_filename, file_type_hint='jobdesc')
+        if not jobdesc_success:
+            VALIDATION_REJECTIONS.inc(reason="job_description_file")
+            raise HTTPException(status_code=400, detail=job_desc_text)
+        jobdesc_bytes = len(jobdesc_content)
+    else:
+        job_desc_text = jobDescriptionText.strip()
+        jobdesc_filename = jobDescriptionFilename or "job_description.txt"
+        jobdesc_bytes = len(jobDescriptionText.encode("utf-8"))
+
+    timing = current_timing.get()
+    if timing is not None:
+        timing.set_input("resumeBytes", len(resume_content))
+        timing.set_input("resumeChars", len(resume_text))
+        timing.set_input("jobDescriptionBytes", jobdesc_bytes)
+        timing.set_input("jobDescriptionChars", len(job_desc_text))
+    return resume_text, job_desc_text, jobdesc_filename
+
+
+async def extract_within_budget(
+    resume_content: bytes,
+    resumeFilename: str,
+    jobdesc_content: Optional[bytes],
+    jobdesc_filename: Optional[str],
+    jobDescriptionText: Optional[str],
+    jobDescriptionFilename: Optional[str]
+) -> Tuple[str, str, str]:
+    """Run extract_inputs in a worker thread once its estimated memory fits in the in-flight budget"""
+    estimate = estimate_document_bytes(resume_content, resumeFilename)
+    if jobdesc_content is not None:
+        estimate += estimate_document_bytes(jobdesc_content, jobdesc_filename)
+    elif jobDescriptionText:
+        estimate += estimate_document_bytes(jobDescriptionText.encode("utf-8"), "job_description.txt")
+    async with memory_budget.reserve(estimate):
+        return await asyncio.to_thread(
+            extract_inputs,
+            resume_content, resumeFilename,
+            jobdesc_content, jobdesc_filename,
+            jobDescriptionText, jobDescriptionFilename
+        )
+
+
+def timing_fields(timing: Optional[RequestTiming]) -> Dict[str, Any]:
+    """processingTime, per-stage timings and input statistics to store on an analysis"""
+    if timing is None:
+        return {}
+    return {
+        "processingTime": round(timing.elapsed(), 3),
+        "timings": timing.stage_milliseconds(),
+        "inputStats": dict(timing.inputs),
+        "memory": {stage: dict(values) for stage, values in timing.memory.items()},
+    }
+
+
+def check_analysis_result(result: Optional[Dict[str, Any]]):
+    """Raise HTTPException when the AI rejected the inputs or returned nothing"""
+    if not result:
+        VALIDATION_REJECTIONS.inc(reason="empty_result")
+        raise HTTPException(status_code=500, detail="AI analysis failed, no result returned")
+
+    # Check for security validation failures
     if result.get("security_validation") == "Failed":
         security_error = result.get("security_error", "Security threat detected")
-        logger.warning(f"AI detected security threat: {security_error}")
-        await update_analysis(analysisId, {"status": "failed", "error": security_error})
-        return
-    
+        logger.warning(f"Security validation failed: {security_error}")
+        VALIDATION_REJECTIONS.inc(reason="security")
+        raise HTTPException(
+            status_code=400,
+            detail=f"Security validation failed: {security_error}"
+        )
+
+    # Check for job description validation failures
     if result.get("job_description_validity") == "Invalid":
         validation_error = result.get("validation_error", "Invalid job description")
-        logger.warning(f"Job description invalid: {validation_error}")
-        await update_analysis(analysisId, {"status": "failed", "error": validation_error})
-        return
-    
-    processingTime = time.time() - start_time
-    analysis_doc = AnalysisDocument(
-        analysisId=analysisId,
-        userId=userId,
-        resumeFilename=resumeFilename,
-        jobDescriptionFilename=jobDescriptionFilename,
-        result=ResumeAnalysisResponse(**result),
-        status="completed",
-        processingTime=processingTime,
-        createdAt=datetime.utcnow(),
-        updatedAt=datetime.utcnow()
-    )
-    await save_analysis(analysis_doc)
+        logger.warning(f"Job description validation failed: {validation_error}")
+        VALIDATION_REJECTIONS.inc(reason="job_description")
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid job description: {validation_error}"
+        )
+
+    # Check for resume validation failures
+    if result.get("resume_validity") == "Invalid":
+        validation_error = result.get("validation_error", "Invalid resume")
+        logger.warning(f"Resume validation failed: {validation_error}")
+        VALIDATION_REJECTIONS.inc(reason="resume")
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid resume: {validation_error}"
+        )
+
+
+def late_usage_recorder(userId: str):
+    """Callback for GroqService.take_usage that adds late usage to the rollups from any thread"""
+    loop = asyncio.get_running_loop()
+
+    def record(usage: Dict[str, Dict[str, int]]):
+        try:
+            asyncio.run_coroutine_threadsafe(record_token_usage(userId, usage, count_analysis=False), loop)
+        except RuntimeError:
+            # The event loop has closed (shutdown); the tokens are only in the metrics
+            logger.warning(f"Could not record late token usage for userId {userId}")
+
+    return record
+
+
+async def perform_analysis(job: AnalysisJob):
+    """
+    Run a queued analysis, recording its progress on the analysis document.
+    Invalid input fails the analysis; other errors are raised so the queue
+    can retry the job.
+    """
+    # Queued jobs run outside the request, so each gets its own timing context and log ID
+    timing = start_timing()
+    request_id_var.set(job.analysisId)
+    # Extraction ran in the submitting request; keep its input statistics on the document
+    timing.inputs.update(job.inputStats)
+    try:
+        await update_analysis(job.analysisId, {"status": "analyzing", "progress": 30, "updatedAt": datetime.utcnow()})
+        groq_service = GroqService()
+        with measure_memory("llm"):
+            result = await asyncio.to_thread(
+                groq_service.analyze_resume, job.resume_text, job.job_description_text, job.depth
+            )
+        await record_token_usage(job.userId, groq_service.take_usage(late_usage_recorder(job.userId)))
+        check_analysis_result(result)
+
+        with STAGE_SECONDS.time(stage="mongo_save"):
+            await update_analysis(job.analysisId, {
+                "status": "completed",
+                "progress": 100,
+                "result": ResumeAnalysisResponse(**result).dict(),
+                **timing_fields(timing),
+                "tokenUsage": groq_service.usage_summary(),
+                "updatedAt": datetime.utcnow()
+            }, stores_result=True)
+    except HTTPException as e:
+        await mark_analysis_failed(job.analysisId, e.detail)
+
+
+async def mark_analysis_failed(analysisId: str, error: str):
+    await update_analysis(analysisId, {"status": "failed", "error": error, "updatedAt": datetime.utcnow()})
+
+
+async def abandon_analysis(job: AnalysisJob, reason: str):
+    """Fail the analysis of a job the queue has given up on"""
+    await mark_analysis_failed(job.analysisId, reason)
+
 
 @router.post("/analyze", response_model=Union[AnalysisStatus, ErrorResponse])
 async def analyze_resume(
@@ -62,11 +211,13 @@ async def analyze_resume(
     job_description: Optional[UploadFile] = File(None, description="Job description file"),
     jobDescriptionFilename: Optional[str] = Form(None, description="Job description filename"),
     jobDescriptionText: Optional[str] = Form(None, description="Job description raw text"),
+    analysisDepth: str = Form("standard", description="Analysis depth: quick, standard or detailed"),
+    asyncMode: bool = Form(False, description="Queue the analysis and return 202 immediately"),
     userId: str = Depends(get_current_user_id),
 ):
     """
     Analyze resume against job description (file or raw text).
-    
+
     This endpoint provides comprehensive resume analysis using AI, including:
     - Job description validation
     - Resume eligibility assessment
@@ -74,78 +225,88 @@ async def analyze_resume(
     - Section-wise feedback
     - Improvement recommendations
     - Final assessment with hiring recommendations
-    
+
+    With `asyncMode=true` the analysis is queued and the endpoint returns
+    202 Accepted with the `analysisId`; poll `GET /analysis/{analysisId}/status`.
+
     **Limits:**
     - File size: Maximum 5MB
     - PDF/DOCX pages: Maximum 7 pages
     - Job description: 50-1000 words
     - Resume tokens: Maximum 8000 words
-    - Daily requests: 15 per IP address
+    - Daily requests: 15 per user (per IP address when unauthenticated)
     """
     if not job_description and not jobDescriptionText:
         raise HTTPException(status_code=400, detail="Either job_description file or text must be provided")
     if job_description and jobDescriptionText:
         raise HTTPException(status_code=400, detail="Provide either job_description file OR text, not both")
-    
-    # Process resume file with type enforcement
-    resume_content = await resume.read()
-    resume_text, resume_success, resume_type = FileProcessor.process_file(resume_content, resume.filename, file_type_hint='resume')
-    if not resume_success:
-        raise HTTPException(status_code=400, detail=resume_text)
-    resume_valid, resume_msg = FileProcessor.validate_content(resume_text, "resume")
-    if not resume_valid:
-        raise HTTPException(status_code=400, detail=resume_msg)
+    if analysisDepth not in ANALYSIS_DEPTHS:
+        raise HTTPException(status_code=400, detail=f"analysisDepth must be one of: {', '.join(ANALYSIS_DEPTHS)}")
 
-    job_description_text_final = ""
-    jobDescriptionFilename = None
-
-    if job_description:
-        # Process job description file with type enforcement
-        jobdesc_content = await job_description.read()
-        job_desc_text, jobdesc_success, jobdesc_type = FileProcessor.process_file(jobdesc_content, job_description.filename, file_type_hint='jobdesc')
-        if not jobdesc_success:
-            raise HTTPException(status_code=400, detail=job_desc_text)
-        job_description_text_final = job_desc_text
-        jobDescriptionFilename = job_description.filename
-    elif jobDescriptionText:
-        job_description_text_final = jobDescriptionText.strip()
-        jobDescriptionFilename = jobDescriptionFilename or "job_description.txt"
-    
+    with STAGE_SECONDS.time(stage="upload_read"):
+        resume_content = await resume.read()
+        jobdesc_content = await job_description.read() if job_description else None
     analysisId = str(uuid4())
-    groq_service = GroqService()
-    result = await asyncio.to_thread(
-        groq_service.analyze_resume, resume_text, job_description_text_final
-    )
-    if not result:
-        raise HTTPException(status_code=500, detail="AI analysis failed, no result returned")
-    
-    # Check for security validation failures
-    if result.get("security_validation") == "Failed":
-        security_error = result.get("security_error", "Security threat detected")
-        logger.warning(f"Security validation failed: {security_error}")
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Security validation failed: {security_error}"
+
+    if asyncMode and await analysis_queue.full():
+        raise HTTPException(status_code=503, detail="Analysis queue is full, please try again shortly")
+
+    # Both modes extract and validate here, so an async submission is rejected before it is queued
+    try:
+        resume_text, job_description_text_final, jobDescriptionFilename = await extract_within_budget(
+            resume_content, resume.filename,
+            jobdesc_content, job_description.filename if job_description else None,
+            jobDescriptionText, jobDescriptionFilename
         )
-    
-    # Check for job description validation failures
-    if result.get("job_description_validity") == "Invalid":
-        validation_error = result.get("validation_error", "Invalid job description")
-        logger.warning(f"Job description validation failed: {validation_error}")
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Invalid job description: {validation_error}"
+    except MemoryBudgetTimeout as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail="Server is busy processing other files, please try again shortly")
+
+    if asyncMode:
+        await save_analysis(AnalysisDocument(
+            analysisId=analysisId,
+            userId=userId,
+            resumeFilename=resume.filename,
+            jobDescriptionFilename=jobDescriptionFilename,
+            jobDescriptionText=jobDescriptionText if not job_description else None,
+            status="queued",
+            progress=0,
+            createdAt=datetime.utcnow(),
+            updatedAt=datetime.utcnow()
+        ), write_behind=False)
+        job = AnalysisJob(
+            analysisId=analysisId,
+            userId=userId,
+            resume_text=resume_text,
+            resumeFilename=resume.filename,
+            job_description_text=job_description_text_final,
+            jobDescriptionFilename=jobDescriptionFilename,
+            depth=analysisDepth,
+            inputStats=dict(current_timing.get().inputs) if current_timing.get() else None
         )
-    
-    # Check for resume validation failures
-    if result.get("resume_validity") == "Invalid":
-        validation_error = result.get("validation_error", "Invalid resume")
-        logger.warning(f"Resume validation failed: {validation_error}")
-        raise HTTPException(
-            status_code=400, 
-            detail=f"Invalid resume: {validation_error}"
+        if not await analysis_queue.enqueue(job):
+            await mark_analysis_failed(analysisId, "Analysis queue is full, please try again shortly")
+            raise HTTPException(status_code=503, detail="Analysis queue is full, please try again shortly")
+        return JSONResponse(
+            status_code=202,
+            content=AnalysisStatus(
+                analysisId=analysisId,
+                status="queued",
+                message=STATUS_MESSAGES["queued"],
+                progress=0
+            ).dict(),
+            headers={"Location": f"/api/v1/analysis/{analysisId}/status"}
         )
-    
+
+    groq_service = GroqService()
+    with measure_memory("llm"):
+        result = await asyncio.to_thread(
+            groq_service.analyze_resume, resume_text, job_description_text_final, analysisDepth
+        )
+    # Rejected analyses consumed tokens too, so they are counted before the checks
+    await record_token_usage(userId, groq_service.take_usage(late_usage_recorder(userId)))
+    check_analysis_result(result)
+
     # Save the analysis result only if validation passed
     analysis_doc = AnalysisDocument(
         analysisId=analysisId,
@@ -155,13 +316,67 @@ async def analyze_resume(
         jobDescriptionText=jobDescriptionText if not job_description else None,
         result=ResumeAnalysisResponse(**result),
         status="completed",
+        **timing_fields(current_timing.get()),
+        tokenUsage=groq_service.usage_summary(),
         createdAt=datetime.utcnow(),
         updatedAt=datetime.utcnow()
     )
-    await save_analysis(analysis_doc)
+    with STAGE_SECONDS.time(stage="mongo_save"):
+        await save_analysis(analysis_doc)
     return AnalysisStatus(
         analysisId=analysisId,
         status="completed",
         message="Analysis completed successfully",
         progress=100
     )
+
+
+@router.get("/analysis/history", response_model=AnalysisHistoryPage)
+async def get_history(
+    limit: Optional[int] = Query(None, ge=1, description="Analyses per page"),
+    cursor: Optional[str] = Query(None, description="nextCursor from the previous page"),
+    userId: str = Depends(get_current_user_id),
+):
+    """List the user's analyses, newest first, as summaries. Follow `nextCursor` for older pages."""
+    limit = min(limit or settings.history_page_size, settings.history_max_page_size)
+    try:
+        docs, next_cursor = await get_analysis_history(userId, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    items = [summary_from_document(doc) for doc in docs]
+    return AnalysisHistoryPage(items=items, nextCursor=next_cursor, limit=limit)
+
+
+@router.get("/analysis/{analysisId}", response_model=AnalysisDocument)
+async def get_analysis(
+    analysisId: str,
+    if_none_match: Optional[str] = Header(None),
+    userId: str = Depends(get_current_user_id),
+):
+    """
+    Return a stored analysis. Responses carry an ETag; repeat requests with
+    `If-None-Match` get 304 Not Modified, served from the cache for completed analyses.
+    """
+    analysis = await get_analysis_by_id(analysisId)
+    if not analysis or analysis.userId != userId:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    etag = analysis_etag(analysis)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=analysis.model_dump(mode="json", exclude={"id"}), headers=headers)
+
+
+@router.get("/analysis/{analysisId}/status", response_model=AnalysisStatus)
+async def get_analysis_status(analysisId: str, userId: str = Depends(get_current_user_id)):
+    """Report the progress of an analysis; includes the result once completed."""
+    analysis = await get_analysis_by_id(analysisId)
+    if not analysis or analysis.userId != userId:
+        raise HTTPException(status_code=404, detail="Analysis not found")
+    return AnalysisStatus(
+        analysisId=analysisId,
+        status=analysis.status,
+        message=analysis.error or STATUS_MESSAGES.get(analysis.status, analysis.status),
+        progress=analysis.progress if analysis.progress is not None else (100 if analysis.status == "completed" else None),
+        result=analysis.result if analysis.status == "completed" else None
+    )
@@ -1,68 +1,48 @@
 from datetime import datetime
-import psutil
-import os
 
 from fastapi import APIRouter
-from loguru import logger
+from fastapi.responses import JSONResponse
+import logging
 
-from app.database import check_mongo_health
-from app.groq_service import GroqService
+from app.groq_service import truncation_stats
+from app.health_monitor import health_monitor
+from app.hedging import hedge_policy
+from app.job_queue import analysis_queue
+from app.key_pool import groq_key_pool
+from app.model_router import model_router
 from app.middleware import rate_limiter
+from app.storage_codec import storage_compression_stats
+from app.write_buffer import analysis_write_buffer
+from app.analysis_cache import analysis_cache
+from app.startup_profile import startup_profile
+from app.warmup import warmup_state
+from app.loop_monitor import loop_monitor
+from app.memory_budget import memory_budget
 from app.config import settings
 
 router = APIRouter(tags=["health"])
+logger = logging.getLogger(__name__)
 
 
 @router.get("/health")
 async def health_check():
     """Return comprehensive health status of the server and its dependencies."""
-    
-    # Get system information
-    try:
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
-    except Exception as e:
-        logger.warning(f"Could not get system info: {e}")
-        cpu_percent = "unknown"
-        memory = None
-        disk = None
-    
-    # Check MongoDB health
-    mongo_status = await check_mongo_health()
-
-    # Check Groq service health
-    try:
-        groq_service = GroqService()
-        groq_status = await groq_service.check_health()
-    except Exception as e:
-        groq_status = {
-            "status": "unhealthy",
-            "error": str(e),
-            "api_key_configured": False
-        }
 
-    # Get rate limiting statistics
-    rate_limit_stats = {
-        "max_requests_per_day": rate_limiter.max_requests_per_day,
-        "active_ips": len(rate_limiter.requests),
-        "total_requests_today": sum(len(requests) for requests in rate_limiter.requests.values())
-    }
+    # Probe results come from the background health monitor's cached snapshot
+    mongo_status = health_monitor.service_status("mongo")
+    groq_status = health_monitor.service_status("groq")
+
+    groq_status["routing"] = model_router.stats()
+    groq_status["keys"] = groq_key_pool.stats()
+    groq_status["hedging"] = hedge_policy.stats()
+    groq_status["truncation"] = truncation_stats.stats()
 
-    # Determine overall status
-    mongo_healthy = mongo_status.get("status") == "connected"
-    groq_healthy = groq_status.get("status") == "healthy"
-    
-    if mongo_healthy and groq_healthy:
-        overall_status = "healthy"
-    elif mongo_healthy or groq_healthy:
-        overall_status = "degraded"
-    else:
-        overall_status = "unhealthy"
+    # Get rate limiting statistics
+    rate_limit_stats = rate_limiter.stats()
 
     # Build response
     response = {
-        "status": overall_status,
+        "status": health_monitor.overall_status(),
         "timestamp": datetime.utcnow().isoformat(),
         "version": "1.0.0",
         "services": {
@@ -70,6 +50,12 @@ async def health_check():
             "groq": groq_status,
         },
         "rate_limiting": rate_limit_stats,
+        "analysis_queue": analysis_queue.stats(),
+        "analysis_writes": analysis_write_buffer.stats(),
+        "analysis_storage": storage_compression_stats.stats(),
+        "analysis_cache": analysis_cache.stats(),
+        "event_loop": loop_monitor.stats(),
+        "memory": memory_budget.stats(),
         "validation_limits": {
             "max_file_size_mb": settings.max_file_size / (1024 * 1024),
             "max_resume_tokens": settings.max_resume_words,
@@ -80,25 +66,22 @@ async def health_check():
             "allowed_file_types": settings.allowed_extensions_list
         }
     }
-    
+
+    response["startup"] = {**startup_profile.report(top=5), "warmup": warmup_state.status()}
+
     # Add system information if available
-    if memory and disk:
-        response["system"] = {
-            "cpu_percent": cpu_percent,
-            "memory_percent": memory.percent,
-            "memory_available_gb": round(memory.available / (1024**3), 2),
-            "disk_percent": disk.percent,
-            "disk_free_gb": round(disk.free / (1024**3), 2)
-        }
-    
+    if health_monitor.system:
+        response["system"] = health_monitor.system
+
     # Add environment information
     response["environment"] = {
         "debug_mode": settings.debug,
         "log_level": settings.log_level,
         "groq_model": settings.groq_model,
+        "groq_models": settings.groq_models_list,
         "mongodb_database": settings.mongodb_database
     }
-    
+
     return response
 
 
@@ -106,19 +89,36 @@ async def health_check():
 async def simple_health_check():
     """Simple health check for load balancers and monitoring."""
     try:
-        # Quick checks
-        mongo_status = await check_mongo_health()
-        groq_service = GroqService()
-        groq_status = await groq_service.check_health()
-        
-        mongo_healthy = mongo_status.get("status") == "connected"
-        groq_healthy = groq_status.get("status") == "healthy"
-        
-        if mongo_healthy and groq_healthy:
+        if health_monitor.overall_status() == "healthy":
             return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
         else:
             return {"status": "degraded", "timestamp": datetime.utcnow().isoformat()}
             
     except Exception as e:
         logger.error(f"Health check failed: {e}")
-        return {"status": "unhealthy", "timestamp": datetime.utcnow().isoformat()} 
\ No newline at end of file
+        return {"status": "unhealthy", "timestamp": datetime.utcnow().isoformat()}
+
+
+@router.get("/health/live")
+async def liveness_check():
+    """Liveness probe: the process is up and serving requests."""
+    if not health_monitor.is_live():
+        return JSONResponse(status_code=503, content={"status": "dead", "timestamp": datetime.utcnow().isoformat()})
+    return {"status": "alive", "timestamp": datetime.utcnow().isoformat()}
+
+
+@router.get("/ready")
+@router.get("/health/ready")
+async def readiness_check():
+    """Readiness probe: this worker has warmed up, is not draining, and MongoDB was reachable on the last (fresh) probe."""
+    ready = warmup_state.ready and health_monitor.is_ready()
+    body = {
+        "status": "ready" if ready else "not_ready",
+        "timestamp": datetime.utcnow().isoformat(),
+        "warmup": warmup_state.status(),
+        "services": {
+            name: {key: health_monitor.service_status(name).get(key) for key in ("status", "age_seconds", "stale")}
+            for name in ("mongo", "groq")
+        }
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
@@ -0,0 +1,26 @@
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, Depends, Query
+
+from app.database import get_token_usage
+from app.middleware import get_current_user_id
+from app.models import TokenUsage, TokenUsageReport, TokenUsageRollup
+
+router = APIRouter(tags=["usage"])
+
+
+@router.get("/usage", response_model=TokenUsageReport)
+async def get_usage(
+    days: int = Query(30, ge=1, le=366, description="Days to report, ending today (UTC)"),
+    userId: str = Depends(get_current_user_id),
+):
+    """Groq token usage of the authenticated user per day and model, from the incremental rollups."""
+    since_day = (datetime.utcnow() - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    items = [TokenUsageRollup(**rollup) for rollup in await get_token_usage(userId, since_day)]
+    total = TokenUsage(
+        promptTokens=sum(item.promptTokens for item in items),
+        completionTokens=sum(item.completionTokens for item in items),
+        totalTokens=sum(item.totalTokens for item in items),
+        costUsd=sum(item.costUsd for item in items),
+    )
+    return TokenUsageReport(userId=userId, days=days, items=items, total=total)
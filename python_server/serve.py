@@ -0,0 +1,198 @@
+"""
+Production entry point for the AI Resume Analyzer API.
+
+Binds the listening socket and imports the application (and with it the
+heavy PDF/DOCX/Groq/Mongo modules) once in a master process, freezes the
+garbage collector so the warm heap stays shared copy-on-write, then forks
+one uvicorn worker per core. SIGTERM is forwarded to the workers, which stop
+accepting connections and drain in-flight analyses before exiting.
+
+Usage: python serve.py   (WORKERS=0 means one worker per CPU core)
+"""
+import gc
+import os
+import sys
+import time
+import shutil
+import signal
+import socket
+import logging
+import tempfile
+import importlib.util
+
+import uvicorn
+
+from app.config import settings
+from app.log_config import setup_logging, stop_logging
+
+logger = logging.getLogger("serve")
+
+
+def worker_count() -> int:
+    return settings.workers if settings.workers > 0 else (os.cpu_count() or 1)
+
+
+def select_rate_limit_backend(workers: int):
+    """Share rate limit counters between forked workers unless a backend was chosen explicitly"""
+    if not settings.rate_limit_backend:
+        settings.rate_limit_backend = "shared_memory" if workers > 1 else "memory"
+    elif settings.rate_limit_backend == "memory" and workers > 1:
+        logger.error(
+            f"RATE_LIMIT_BACKEND=memory with {workers} workers: each worker enforces its own quota, "
+            f"so clients get {workers}x the daily limit; use shared_memory or mongo"
+        )
+
+
+def event_loop_impl() -> str:
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def http_impl() -> str:
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+def bind_socket() -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((settings.host, settings.port))
+    sock.listen(settings.backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload_application():
+    """Import and warm the application before forking so workers share it"""
+    started = time.perf_counter()
+    from main import app
+    from app.startup_profile import preload_heavy_modules
+    from app.warmup import warm_up_parsers
+    # Import lazily loaded dependencies and fill the parsers' caches once here, so every worker shares them copy-on-write
+    preload_heavy_modules()
+    try:
+        warm_up_parsers()
+    except Exception as e:
+        logger.warning(f"Parser warm-up before fork failed: {e}")
+    gc.collect()
+    gc.freeze()
+    logger.info(f"Application preloaded in {time.perf_counter() - started:.2f}s")
+    return app
+
+
+def build_config(app) -> uvicorn.Config:
+    return uvicorn.Config(
+        app,
+        loop=event_loop_impl(),
+        http=http_impl(),
+        lifespan="on",
+        proxy_headers=True,
+        forwarded_allow_ips="*",
+        timeout_graceful_shutdown=settings.graceful_shutdown_timeout,
+        log_level=settings.log_level.lower(),
+        log_config=None,  # keep the queued handlers installed by setup_logging
+    )
+
+
+def run_worker(app, sock: socket.socket):
+    server = uvicorn.Server(build_config(app))
+    try:
+        server.run(sockets=[sock])
+    finally:
+        # os._exit skips atexit, so flush queued log records first
+        stop_logging()
+        # Never fall back into the master's supervision loop
+        os._exit(0)
+
+
+class Supervisor:
+    """Forks workers, restarts ones that crash and shuts them down on SIGTERM"""
+
+    def __init__(self, app, sock: socket.socket, workers: int):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.children = {}  # pid -> spawn time
+        self.stopping = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            run_worker(self.app, self.sock)
+        self.children[pid] = time.monotonic()
+        logger.info(f"Started worker {pid}")
+
+    def stop(self, signum, frame):
+        if self.stopping:
+            return
+        self.stopping = True
+        logger.info(f"Received signal {signum}, draining {len(self.children)} workers")
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        for _ in range(self.workers):
+            self.spawn()
+
+        deadline = None
+        while self.children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                if self.stopping:
+                    deadline = deadline or time.monotonic() + settings.graceful_shutdown_timeout + 5
+                    if time.monotonic() > deadline:
+                        for child in list(self.children):
+                            logger.warning(f"Worker {child} did not drain in time, killing it")
+                            os.kill(child, signal.SIGKILL)
+                        deadline = time.monotonic() + 5
+                time.sleep(0.5)
+                continue
+            started = self.children.pop(pid, None)
+            if self.stopping:
+                logger.info(f"Worker {pid} exited")
+                continue
+            logger.error(f"Worker {pid} died with status {status}, restarting")
+            if started is not None and time.monotonic() - started < 5:
+                time.sleep(1)  # Avoid a tight crash loop
+            self.spawn()
+        logger.info("All workers stopped")
+
+
+def main():
+    setup_logging()
+    workers = worker_count()
+    if not hasattr(os, "fork"):
+        logger.warning("os.fork is not available on this platform, running a single worker")
+        uvicorn.run(preload_application(), host=settings.host, port=settings.port,
+                    loop=event_loop_impl(), http=http_impl(),
+                    timeout_graceful_shutdown=settings.graceful_shutdown_timeout, log_config=None)
+        return
+    own_metrics_dir = not settings.metrics_dir
+    if own_metrics_dir:
+        # Workers publish metric snapshots here so /metrics reports the whole server
+        settings.metrics_dir = os.path.join(tempfile.gettempdir(), f"resume_analyzer_metrics_{os.getpid()}")
+    os.makedirs(settings.metrics_dir, exist_ok=True)
+    # Before the application import, which builds the rate limiter
+    select_rate_limit_backend(workers)
+    sock = bind_socket()
+    app = preload_application()
+    logger.info(
+        f"Serving on {settings.host}:{settings.port} with {workers} workers "
+        f"(loop={event_loop_impl()}, http={http_impl()})"
+    )
+    Supervisor(app, sock, workers).run()
+    if own_metrics_dir:
+        shutil.rmtree(settings.metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
+    sys.exit(0)
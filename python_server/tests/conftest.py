@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Settings require the MongoDB fields; tests never connect
+os.environ.setdefault("MONGODB_URL", "mongodb://localhost:27017")
+os.environ.setdefault("MONGODB_DATABASE", "resume_analyzer_test")
+os.environ.setdefault("MONGODB_COLLECTION", "analyses")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,150 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import app.database as database
+import routes.analysis_routes as analysis_routes
+from app.analysis_cache import AnalysisCache, analysis_etag
+from app.config import settings
+from app.models import AnalysisDocument
+
+
+def _analysis(analysisId, status="completed", userId="user-1", updatedAt=None):
+    return AnalysisDocument(
+        analysisId=analysisId,
+        userId=userId,
+        resumeFilename="resume.pdf",
+        status=status,
+        updatedAt=updatedAt or datetime(2024, 1, 1),
+    )
+
+
+def test_lru_evicts_least_recently_read():
+    cache = AnalysisCache(max_entries=2, ttl=60)
+
+    async def scenario():
+        await cache.put(_analysis("a"))
+        await cache.put(_analysis("b"))
+        await cache.get("a")
+        await cache.put(_analysis("c"))
+        return [await cache.get(key) is not None for key in ("a", "b", "c")]
+
+    assert asyncio.run(scenario()) == [True, False, True]
+    assert cache.stats()["entries"] == 2
+
+
+def test_entries_expire_after_ttl():
+    cache = AnalysisCache(max_entries=10, ttl=0.05)
+    asyncio.run(cache.put(_analysis("a")))
+    time.sleep(0.1)
+
+    assert asyncio.run(cache.get("a")) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_only_completed_analyses_are_cached():
+    cache = AnalysisCache(max_entries=10, ttl=60)
+    asyncio.run(cache.put(_analysis("a", status="analyzing")))
+
+    assert asyncio.run(cache.get("a")) is None
+
+
+def test_disabled_cache_stores_nothing():
+    cache = AnalysisCache(max_entries=0, ttl=60)
+    asyncio.run(cache.put(_analysis("a")))
+
+    assert asyncio.run(cache.get("a")) is None
+    assert cache.stats()["hit_rate"] is None
+
+
+def test_stats_count_hits_and_misses():
+    cache = AnalysisCache(max_entries=10, ttl=60)
+
+    async def scenario():
+        await cache.put(_analysis("a"))
+        await cache.get("a")
+        await cache.get("missing")
+
+    asyncio.run(scenario())
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_rate"]) == (1, 1, 0.5)
+
+
+def test_etag_changes_when_document_is_updated():
+    first = _analysis("a", updatedAt=datetime(2024, 1, 1))
+    later = _analysis("a", updatedAt=datetime(2024, 1, 1) + timedelta(milliseconds=1))
+
+    assert analysis_etag(first) == analysis_etag(_analysis("a", updatedAt=datetime(2024, 1, 1)))
+    assert analysis_etag(first) != analysis_etag(later)
+    assert analysis_etag(first).startswith('"') and analysis_etag(first).endswith('"')
+
+
+@pytest.fixture
+def stored(monkeypatch):
+    analysis = _analysis("a")
+
+    async def get_analysis_by_id(analysisId, part="full"):
+        return analysis if analysisId == "a" else None
+
+    monkeypatch.setattr(analysis_routes, "get_analysis_by_id", get_analysis_by_id)
+    return analysis
+
+
+def test_get_analysis_returns_etag_and_304_on_match(stored):
+    etag = analysis_etag(stored)
+
+    response = asyncio.run(analysis_routes.get_analysis("a", None, "user-1"))
+    assert response.status_code == 200
+    assert response.headers["ETag"] == etag
+    assert response.headers["Cache-Control"] == "private, no-cache"
+
+    response = asyncio.run(analysis_routes.get_analysis("a", f'"stale", {etag}', "user-1"))
+    assert response.status_code == 304
+    assert response.body == b""
+    assert response.headers["ETag"] == etag
+
+    response = asyncio.run(analysis_routes.get_analysis("a", '"stale"', "user-1"))
+    assert response.status_code == 200
+
+
+def test_get_analysis_of_another_user_is_not_found(stored):
+    with pytest.raises(analysis_routes.HTTPException) as error:
+        asyncio.run(analysis_routes.get_analysis("a", analysis_etag(stored), "user-2"))
+    assert error.value.status_code == 404
+
+
+class FakeCollection:
+    def __init__(self):
+        self.updates = []
+
+    async def update_one(self, query, update, upsert=False):
+        self.updates.append((query, update))
+        return type("Result", (), {"modified_count": 1})()
+
+
+def test_update_invalidates_this_process_cache_only(monkeypatch):
+    # Two serve.py workers: each has its own LRU, and only the updating one drops its entry
+    updating, other = AnalysisCache(max_entries=10, ttl=60), AnalysisCache(max_entries=10, ttl=60)
+    collection = FakeCollection()
+
+    async def get_collection(kind="analyses"):
+        return collection
+
+    monkeypatch.setattr(database, "analysis_cache", updating)
+    monkeypatch.setattr(database, "get_collection", get_collection)
+    monkeypatch.setattr(settings, "analysis_split_storage", False)
+
+    async def scenario():
+        for cache in (updating, other):
+            await cache.put(_analysis("a"))
+        await database.update_analysis("a", {"status": "failed"})
+        return await updating.get("a"), await other.get("a")
+
+    local, remote = asyncio.run(scenario())
+    assert local is None
+    assert updating.stats()["invalidations"] == 1
+    # The other worker serves its copy until the TTL expires
+    assert remote is not None
+    assert collection.updates == [({"analysisId": "a"}, {"$set": {"status": "failed"}})]
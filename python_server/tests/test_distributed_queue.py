@@ -0,0 +1,56 @@
+import asyncio
+import multiprocessing
+import os
+
+import pytest
+
+from app.distributed_queue import MongoAnalysisJobQueue
+
+
+class FakeCollection:
+    async def create_index(self, *args, **kwargs):
+        pass
+
+
+async def _start_and_stop(queue: MongoAnalysisJobQueue) -> str:
+    async def handler(job):
+        pass
+    await queue.start(handler)
+    owner = queue.owner
+    await queue.stop(timeout=1)
+    return owner
+
+
+def _owner_in_child(queue: MongoAnalysisJobQueue, owners):
+    owners.put(asyncio.run(_start_and_stop(queue)))
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    monkeypatch.setattr(MongoAnalysisJobQueue, "collection", property(lambda self: FakeCollection()))
+    # Workers would poll MongoDB; no claims are needed to check ownership
+    monkeypatch.setattr(MongoAnalysisJobQueue, "_worker", lambda self, index: asyncio.sleep(0))
+    return MongoAnalysisJobQueue("jobs", maxsize=10, workers=2)
+
+
+def test_owner_is_assigned_on_start(queue):
+    assert queue.owner is None
+    owner = asyncio.run(_start_and_stop(queue))
+    assert owner.split(":")[1] == str(os.getpid())
+    # A restart in the same process gets a new owner
+    assert asyncio.run(_start_and_stop(queue)) != owner
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_forked_workers_get_distinct_owners(queue):
+    # Built before forking, like serve.py does through the app import
+    context = multiprocessing.get_context("fork")
+    owners = context.Queue()
+    workers = [context.Process(target=_owner_in_child, args=(queue, owners)) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    first, second = owners.get(timeout=5), owners.get(timeout=5)
+    assert first != second
+    assert first.split(":")[1] != second.split(":")[1]
@@ -0,0 +1,153 @@
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+import app.groq_service as groq_module
+import app.model_router as router_module
+from app.config import settings
+from app.hedging import hedge_policy
+from app.key_pool import GroqKeyPool
+from app.model_router import ModelRouter
+from app.request_timing import start_timing
+
+MESSAGES = [{"role": "user", "content": "hi"}]
+
+
+def _chunk(content=None, finish_reason=None, usage=None):
+    choice = SimpleNamespace(delta=SimpleNamespace(content=content), finish_reason=finish_reason)
+    return SimpleNamespace(choices=[choice], x_groq=SimpleNamespace(usage=usage) if usage else None)
+
+
+class FakeStream:
+    def __init__(self, pieces, chunk_seconds):
+        self.pieces = pieces
+        self.chunk_seconds = chunk_seconds
+        self.response = SimpleNamespace(headers={})
+        self.closed = False
+        self.sent = 0
+
+    def __iter__(self):
+        for piece in self.pieces:
+            time.sleep(self.chunk_seconds)
+            self.sent += 1
+            yield _chunk(piece)
+        usage = SimpleNamespace(prompt_tokens=100, completion_tokens=len(self.pieces))
+        yield _chunk(finish_reason="stop", usage=usage)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeClient:
+    """Groq client double answering every call with `pieces`, one chunk per chunk_seconds"""
+
+    def __init__(self, pieces, chunk_seconds):
+        self.pieces = pieces
+        self.chunk_seconds = chunk_seconds
+        self.streams = []
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, model, messages, stream=False, **kwargs):
+        assert stream
+        self.streams.append(FakeStream(self.pieces, self.chunk_seconds))
+        return self.streams[-1]
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """Two keys: the primary lands on key 0 (slow), the hedge avoids it and gets key 1 (fast)"""
+    pool = GroqKeyPool(["slow-key-0000", "fast-key-1111"])
+    pool.keys[0]._client = FakeClient(["a"] * 40, 0.05)
+    pool.keys[1]._client = FakeClient(["b", "c"], 0.02)
+    monkeypatch.setattr(settings, "groq_api_keys", "slow-key-0000,fast-key-1111")
+    monkeypatch.setattr(groq_module, "groq_key_pool", pool)
+    monkeypatch.setattr(router_module, "groq_key_pool", pool)
+    monkeypatch.setattr(groq_module, "model_router", ModelRouter(["model-a"]))
+    monkeypatch.setattr(hedge_policy, "hedge_delay", lambda: 0.1)
+    monkeypatch.setattr(hedge_policy, "try_fire", lambda: True)
+    return pool
+
+
+def test_llm_stage_is_wall_time_of_the_race(pool):
+    timing = start_timing()
+    service = groq_module.GroqService()
+    started = time.perf_counter()
+    service._create_completion(MESSAGES, 100)
+    elapsed = time.perf_counter() - started
+    # Let the cancelled primary notice and record its attempt
+    time.sleep(0.3)
+    assert timing.stages["llm"] <= elapsed
+
+
+def test_hedge_wins_race_and_cancels_primary(pool, monkeypatch):
+    wins = []
+    monkeypatch.setattr(hedge_policy, "record_win", lambda: wins.append(1))
+    service = groq_module.GroqService()
+
+    response = service._create_completion(MESSAGES, 100)
+
+    assert response.choices[0].message.content == "bc"
+    assert service.last_key == pool.keys[1].label
+    assert wins == [1]
+    # The primary closes its stream at the next chunk instead of generating all 40
+    time.sleep(0.3)
+    primary_stream = pool.keys[0]._client.streams[0]
+    assert primary_stream.closed
+    assert primary_stream.sent < 40
+    assert groq_module.model_router.stats()["model-a"]["in_flight"] == 0
+
+
+def test_cancelled_attempt_usage_is_estimated_and_reported_late(pool):
+    service = groq_module.GroqService()
+    service._create_completion(MESSAGES, 100)
+    late = []
+    persisted = service.take_usage(late.append)
+    time.sleep(0.3)
+
+    # The loser notices the cancellation on the chunk after the last one it counted
+    counted = pool.keys[0]._client.streams[0].sent - 1
+    # Winner: usage reported by the final chunk; loser: estimated prompt plus the chunks it counted
+    usage = service.token_usage["model-a"]
+    assert usage == {"promptTokens": 100 + 100, "completionTokens": 2 + counted}
+    if late:
+        assert persisted["model-a"] == {"promptTokens": 100, "completionTokens": 2}
+        assert late == [{"model-a": {"promptTokens": 100, "completionTokens": counted}}]
+
+
+def test_primary_fast_enough_does_not_hedge(pool, monkeypatch):
+    monkeypatch.setattr(hedge_policy, "hedge_delay", lambda: 5.0)
+    service = groq_module.GroqService()
+
+    response = service._create_completion(MESSAGES, 100)
+
+    assert response.choices[0].message.content == "a" * 40
+    assert service.last_key == pool.keys[0].label
+    assert pool.keys[1]._client.streams == []
+
+
+class StalledFirstExecutor:
+    """Executor whose first submission stays queued, as when every worker is busy"""
+
+    def __init__(self):
+        self.inner = ThreadPoolExecutor(max_workers=2)
+        self.futures = []
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future() if not self.futures else self.inner.submit(fn, *args, **kwargs)
+        self.futures.append(future)
+        return future
+
+
+def test_primary_that_never_starts_is_hedged(pool, monkeypatch):
+    executor = StalledFirstExecutor()
+    monkeypatch.setattr(groq_module, "hedge_executor", executor)
+    service = groq_module.GroqService()
+
+    response = service._create_completion(MESSAGES, 100)
+
+    assert response.choices[0].message.content in ("a" * 40, "bc")
+    assert executor.futures[0].cancelled()
+    # Only the hedge ever reached Groq
+    assert len(pool.keys[0]._client.streams) + len(pool.keys[1]._client.streams) == 1
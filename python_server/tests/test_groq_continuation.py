@@ -0,0 +1,108 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.groq_service import GroqService, truncation_stats
+
+SECTION_FEEDBACK = {"current_state": "ok", "strengths": [], "improvements": []}
+
+
+@pytest.fixture
+def service():
+    # The splicing helpers use no instance state, so skip the key pool setup in __init__
+    return GroqService.__new__(GroqService)
+
+
+def _response(content, finish_reason="stop"):
+    choice = SimpleNamespace(message=SimpleNamespace(content=content), finish_reason=finish_reason)
+    return SimpleNamespace(choices=[choice])
+
+
+def test_splice_merges_restated_partial_token(service):
+    assert service._splice_continuation('{"a": "hello wor', 'hello world"}') == '{"a": "hello world"}'
+    assert service._splice_continuation('hello wor', 'hello world"}') == 'hello world"}'
+
+
+def test_splice_ignores_short_overlap_inside_a_word(service):
+    assert service._splice_continuation('{"a": "ab', 'bc"}') == '{"a": "abbc"}'
+
+
+def test_splice_drops_long_repeated_overlap(service):
+    content = '{"summary": "Strong backend experience with Python'
+    continuation = 'experience with Python and Go"}'
+    assert service._splice_continuation(content, continuation) == '{"summary": "Strong backend experience with Python and Go"}'
+
+
+def test_splice_strips_fences_and_appends_without_overlap(service):
+    assert service._splice_continuation('{"a": 1, ', '```json\n"b": 2}\n```') == '{"a": 1, "b": 2}'
+
+
+def test_splice_accepts_restarted_document(service):
+    assert service._splice_continuation('{"a": 1, "b', '{"a": 1, "b": 2}') == '{"a": 1, "b": 2}'
+
+
+def test_splice_candidates_end_with_plain_concatenation(service):
+    candidates = list(service._splice_candidates('{"k": "x", "', '"b": 1}'))
+    assert candidates == ['{"k": "x", "b": 1}', '{"k": "x", ""b": 1}']
+
+
+def test_recover_requests_again_when_splice_does_not_parse(service, monkeypatch):
+    monkeypatch.setattr(settings, "groq_max_continuations", 2)
+    service.last_model = "model-a"
+    replies = iter([_response('zzz "b": 2}'), _response(' 2}')])
+    monkeypatch.setattr(service, "_create_completion", lambda **kwargs: next(replies))
+    before = truncation_stats.stats()["outcomes"]["continued"]
+
+    content = service._recover_truncated_content([], '{"a": 1, "b":', 0, "standard")
+
+    assert json.loads(content) == {"a": 1, "b": 2}
+    assert truncation_stats.stats()["outcomes"]["continued"] == before + 1
+
+
+def test_recover_repairs_when_continuations_never_parse(service, monkeypatch):
+    monkeypatch.setattr(settings, "groq_max_continuations", 1)
+    service.last_model = "model-a"
+    monkeypatch.setattr(service, "_create_completion", lambda **kwargs: _response('zzz "b": 2}'))
+
+    content = service._recover_truncated_content([], '{"a": 1, "b": [1, 2', 0, "standard")
+
+    assert json.loads(content) == {"a": 1, "b": [1]}
+
+
+def test_close_truncated_json_cuts_back_to_last_complete_value(service):
+    assert service._close_truncated_json('{"a": 1, "b": [1, 2') == '{"a": 1, "b": [1]}'
+    assert service._close_truncated_json('{"a": {"b": "x"}, "c": "unfinish') == '{"a": {"b": "x"}}'
+
+
+def test_close_truncated_json_ignores_brackets_in_strings(service):
+    assert json.loads(service._close_truncated_json('{"a": "x, [y} \\" z", "b": tru')) == {"a": 'x, [y} " z'}
+
+
+def test_close_truncated_json_returns_complete_document_and_strips_prefix(service):
+    assert service._close_truncated_json('Here it is: {"a": 1} trailing') == '{"a": 1}'
+
+
+def test_close_truncated_json_without_a_complete_value(service):
+    assert service._close_truncated_json('no json here') is None
+    assert service._close_truncated_json('{"a": "unfinish') is None
+
+
+def test_drop_incomplete_sections_keeps_valid_and_drops_invalid(service):
+    report = {
+        "candidate_information": {
+            "name": "Ann", "position_applied": "Dev", "experience_level": "Junior", "current_status": "Student"
+        },
+        "strengths_analysis": {"technical_skills": ["Python"]},
+        "unknown_section": {"x": 1},
+    }
+    result = service._drop_incomplete_sections({"score_out_of_100": 70, "resume_analysis_report": report})
+
+    assert set(result["resume_analysis_report"]) == {"candidate_information", "unknown_section"}
+    assert result["score_out_of_100"] == 70
+
+
+def test_drop_incomplete_sections_without_report(service):
+    assert service._drop_incomplete_sections({"score_out_of_100": 70}) == {"score_out_of_100": 70}
+    assert service._drop_incomplete_sections({"resume_analysis_report": None}) == {"resume_analysis_report": None}
@@ -0,0 +1,39 @@
+import asyncio
+import json
+
+import pytest
+
+from app.health_monitor import health_monitor
+from app.warmup import warmup_state
+from routes.health_routes import readiness_check
+
+
+def _fresh(status: str):
+    return {"status": status, "checked_at": None, "age_seconds": 1.0, "stale": False}
+
+
+def _readiness(monkeypatch, mongo: str, groq: str, warmed: bool = True):
+    statuses = {"mongo": _fresh(mongo), "groq": _fresh(groq)}
+    monkeypatch.setattr(health_monitor, "service_status", lambda name: statuses[name])
+    monkeypatch.setattr(warmup_state, "ready", warmed)
+    response = asyncio.run(readiness_check())
+    return response.status_code, json.loads(response.body)
+
+
+def test_groq_outage_keeps_worker_ready(monkeypatch):
+    status, body = _readiness(monkeypatch, mongo="connected", groq="unhealthy")
+    assert status == 200
+    assert body["services"]["groq"]["status"] == "unhealthy"
+
+
+@pytest.mark.parametrize("mongo, warmed", [("disconnected", True), ("connected", False)])
+def test_not_ready_without_mongo_or_warm_up(monkeypatch, mongo, warmed):
+    status, body = _readiness(monkeypatch, mongo=mongo, groq="healthy", warmed=warmed)
+    assert status == 503
+    assert body["status"] == "not_ready"
+
+
+def test_ready_alias_is_routed():
+    from routes.health_routes import router
+    paths = {route.path for route in router.routes if getattr(route, "endpoint", None) is readiness_check}
+    assert paths == {"/ready", "/health/ready"}
@@ -0,0 +1,113 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+
+import app.database as database
+from app.database import decode_history_cursor, encode_history_cursor, get_analysis_history
+
+
+def _matches(doc, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(doc, branch) for branch in condition):
+                return False
+        elif isinstance(condition, dict):
+            if not doc[field] < condition["$lt"]:
+                return False
+        elif doc.get(field) != condition:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, keys):
+        # Only descending keys are used by the history query
+        self.docs = sorted(self.docs, key=lambda doc: tuple(doc[field] for field, _ in keys), reverse=True)
+        return self
+
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        return self
+
+    async def to_list(self, length):
+        return self.docs[:length]
+
+
+class FakeCollection:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        return FakeCursor([dict(doc) for doc in self.docs if _matches(doc, query)])
+
+
+@pytest.fixture
+def history(monkeypatch):
+    base = datetime(2024, 5, 1, 12, 0, 0, 123000)
+    docs = []
+    # Three analyses share a createdAt, so only the _id tie-break orders them
+    for offset in (0, 0, 0, 1, 2, 3, 4):
+        docs.append({"_id": ObjectId(), "userId": "user-1", "analysisId": f"a{len(docs)}", "createdAt": base + timedelta(seconds=offset)})
+    docs.append({"_id": ObjectId(), "userId": "user-2", "analysisId": "other", "createdAt": base})
+    collection = FakeCollection(docs)
+
+    async def get_collection(kind="analyses"):
+        return collection
+
+    monkeypatch.setattr(database, "get_collection", get_collection)
+    return collection
+
+
+def _walk(limit):
+    pages, cursor = [], None
+    while True:
+        docs, cursor = asyncio.run(get_analysis_history("user-1", limit, cursor))
+        pages.append([doc["analysisId"] for doc in docs])
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 7])
+def test_pages_cover_every_analysis_once_in_order(history, limit):
+    pages = _walk(limit)
+    expected = [doc["analysisId"] for doc in sorted(history.docs[:7], key=lambda d: (d["createdAt"], d["_id"]), reverse=True)]
+
+    assert [analysisId for page in pages for analysisId in page] == expected
+    assert all(len(page) == limit for page in pages[:-1])
+
+
+def test_cursor_inside_equal_created_at_continues_by_id(history):
+    first, cursor = asyncio.run(get_analysis_history("user-1", 6, None))
+    # The page ends in the middle of the three analyses created at the same time
+    assert first[-1]["createdAt"] == first[-2]["createdAt"]
+
+    rest, next_cursor = asyncio.run(get_analysis_history("user-1", 6, cursor))
+    assert [doc["analysisId"] for doc in rest] == ["a0"]
+    assert next_cursor is None
+
+
+def test_last_full_page_has_no_cursor(history):
+    docs, cursor = asyncio.run(get_analysis_history("user-1", 7, None))
+    assert len(docs) == 7
+    assert cursor is None
+
+
+def test_cursor_round_trip_keeps_microseconds():
+    createdAt, doc_id = datetime(2024, 5, 1, 12, 0, 0, 123456), ObjectId()
+    token = encode_history_cursor(createdAt, doc_id)
+
+    assert "=" not in token
+    assert decode_history_cursor(token) == (createdAt, doc_id)
+
+
+@pytest.mark.parametrize("token", ["not-a-cursor", "", "eyJ0IjogIjIwMjQifQ", encode_history_cursor(datetime(2024, 1, 1), ObjectId())[:-3]])
+def test_malformed_cursor_raises_value_error(token):
+    with pytest.raises(ValueError):
+        decode_history_cursor(token)
@@ -0,0 +1,103 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.config import settings
+from app.key_pool import GroqKeyPool, parse_reset_seconds
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, headers):
+        super().__init__("rate limited")
+        self.response = SimpleNamespace(headers=headers)
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("2.5", 2.5),
+    ("7.66s", 7.66),
+    ("1m30s", 90.0),
+    ("250ms", 0.25),
+    ("1h2m", 3720.0),
+    ("", None),
+    (None, None),
+    ("soon", None),
+])
+def test_parse_reset_seconds(value, seconds):
+    if seconds is None:
+        assert parse_reset_seconds(value) is None
+    else:
+        assert parse_reset_seconds(value) == pytest.approx(seconds)
+
+
+def test_acquire_rotates_to_least_loaded_key():
+    pool = GroqKeyPool(["key-aaaa", "key-bbbb"])
+    first = pool.acquire("model-a", 100)
+    second = pool.acquire("model-a", 100)
+    assert {first.index, second.index} == {0, 1}
+
+    pool.release(first, "model-a")
+    # The released key has nothing in flight, so it is picked next
+    assert pool.acquire("model-a", 100) is first
+
+
+def test_acquire_prefers_key_with_most_remaining_tokens():
+    pool = GroqKeyPool(["key-aaaa", "key-bbbb"])
+    for key, remaining in zip(pool.keys, ("1000", "5000")):
+        pool.acquire("model-a", 100, exclude=[k for k in pool.keys if k is not key])
+        pool.release(key, "model-a", headers={"x-ratelimit-remaining-tokens": remaining, "x-ratelimit-reset-tokens": "30s"})
+
+    assert pool.acquire("model-a", 100) is pool.keys[1]
+
+
+def test_rate_limited_key_cools_down_for_retry_after():
+    pool = GroqKeyPool(["key-aaaa", "key-bbbb"])
+    key = pool.acquire("model-a", 100)
+    pool.release(key, "model-a", error=RateLimitError({"retry-after": "1m30s"}))
+
+    assert key.rate_limited == 1
+    assert key.cooldown_until - time.time() == pytest.approx(90, abs=1)
+    assert pool.acquire("model-a", 100) is not key
+    assert pool.acquire("model-a", 100) is not key
+
+
+def test_rate_limited_key_without_retry_after_uses_configured_cooldown(monkeypatch):
+    monkeypatch.setattr(settings, "groq_key_cooldown", 12.0)
+    pool = GroqKeyPool(["key-aaaa"])
+    key = pool.acquire("model-a", 100)
+    pool.release(key, "model-a", error=RateLimitError({}))
+
+    assert key.cooldown_until - time.time() == pytest.approx(12, abs=1)
+    assert pool.acquire("model-a", 100) is None
+    assert not pool.has_capacity("model-a", 100)
+
+
+def test_acquire_avoids_excluded_key_until_only_it_has_capacity():
+    pool = GroqKeyPool(["key-aaaa", "key-bbbb"])
+    primary = pool.acquire("model-a", 100)
+
+    hedge = pool.acquire("model-a", 100, exclude=[primary])
+    assert hedge is not primary
+
+    pool.release(hedge, "model-a", error=RateLimitError({"retry-after": "60"}))
+    assert pool.acquire("model-a", 100, exclude=[primary]) is None
+    assert pool.acquire("model-a", 100) is primary
+
+
+def test_exhausted_quota_skips_key_until_window_resets():
+    pool = GroqKeyPool(["key-aaaa"])
+    key = pool.acquire("model-a", 100)
+    pool.release(key, "model-a", headers={
+        "x-ratelimit-remaining-requests": "0",
+        "x-ratelimit-remaining-tokens": "50",
+        "x-ratelimit-reset-tokens": "250ms",
+    })
+    assert pool.acquire("model-a", 100) is None
+    # Quota is per model
+    assert pool.acquire("model-b", 100) is key
+
+    time.sleep(0.3)
+    pool.release(key, "model-b")
+    assert pool.acquire("model-a", 100) is key
@@ -0,0 +1,64 @@
+import json
+import os
+import subprocess
+import sys
+
+from app.config import settings
+from app.metrics import MetricsRegistry, RETIRED_SNAPSHOT
+
+
+def _exited_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def _registry(count: int) -> MetricsRegistry:
+    registry = MetricsRegistry()
+    counter = registry.counter("test_requests_total", "Requests", ("route",))
+    counter.inc(count, route="/analyze")
+    return registry
+
+
+def _write(directory, name: str, registry: MetricsRegistry):
+    with open(os.path.join(directory, name), "w") as f:
+        json.dump(registry.snapshot(), f)
+
+
+def test_exited_workers_are_folded_into_retired(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "metrics_dir", str(tmp_path))
+    dead = _exited_pid()
+    _write(tmp_path, f"{dead}-1.json", _registry(3))
+    _write(tmp_path, f"{dead}-2.json", _registry(4))
+    live = _registry(5)
+
+    live.fold_retired()
+    assert sorted(os.listdir(tmp_path)) == [RETIRED_SNAPSHOT, "snapshots.lock"]
+    assert 'test_requests_total{route="/analyze"} 12' in live.render()
+
+    # Later exits add to the retired totals instead of replacing them
+    _write(tmp_path, f"{dead}-3.json", _registry(1))
+    live.fold_retired()
+    assert 'test_requests_total{route="/analyze"} 13' in live.render()
+
+
+def test_live_workers_are_not_folded(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "metrics_dir", str(tmp_path))
+    sibling = f"{os.getppid()}-1.json"
+    _write(tmp_path, sibling, _registry(2))
+    registry = _registry(1)
+    registry.write_snapshot()
+    registry.fold_retired()
+    assert sibling in os.listdir(tmp_path)
+    assert 'test_requests_total{route="/analyze"} 3' in registry.render()
+
+
+def test_histograms_merge_bucket_counts():
+    first, second = MetricsRegistry(), MetricsRegistry()
+    for registry, value in ((first, 0.2), (second, 3.0)):
+        registry.histogram("test_seconds", "Latency", buckets=(1.0,)).observe(value)
+    merged = MetricsRegistry.merge([first.snapshot(), second.snapshot()])
+    counts, total, count = merged["test_seconds"]["values"][()]
+    assert counts == [1, 1]
+    assert count == 2
+    assert abs(total - 3.2) < 1e-9
@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+import app.model_router as router_module
+from app.config import settings
+from app.key_pool import GroqKeyPool
+from app.model_router import ModelRouter
+
+MODELS = ["fast-model", "mid-model", "large-model"]
+
+
+@pytest.fixture
+def router(monkeypatch):
+    monkeypatch.setattr(router_module, "groq_key_pool", GroqKeyPool(["key-aaaa"]))
+    monkeypatch.setattr(settings, "groq_large_input_tokens", 6000)
+    monkeypatch.setattr(settings, "groq_model_max_latency", 20.0)
+    return ModelRouter(list(MODELS))
+
+
+def test_simple_requests_prefer_fastest_and_demanding_the_largest(router):
+    assert router.candidates(1000, "standard") == MODELS
+    assert router.candidates(1000, "quick") == MODELS
+    assert router.candidates(8000, "standard") == MODELS[::-1]
+    assert router.candidates(1000, "detailed") == MODELS[::-1]
+    assert router.candidates(8000, "quick") == MODELS
+
+
+def test_preferred_model_goes_first(router):
+    assert router.candidates(1000, prefer="mid-model") == ["mid-model", "fast-model", "large-model"]
+
+
+def test_cooling_down_model_moves_to_the_back(router):
+    router.record_start("fast-model")
+    router.record_failure("fast-model", RuntimeError("boom"))
+
+    assert router.candidates(1000) == ["mid-model", "large-model", "fast-model"]
+    # Even when preferred
+    assert router.candidates(1000, prefer="fast-model")[-1] == "fast-model"
+
+
+def test_slow_model_is_degraded_but_ahead_of_saturated_one(router):
+    router.record_start("fast-model")
+    router.record_success("fast-model", 30.0)
+    pool = router_module.groq_key_pool
+    key = pool.acquire("mid-model", 100)
+    pool.release(key, "mid-model", headers={"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-tokens": "60s"})
+
+    assert router.candidates(1000) == ["large-model", "fast-model", "mid-model"]
+
+
+def test_in_flight_accounting(router):
+    router.record_start("fast-model")
+    router.record_start("fast-model")
+    router.record_start("fast-model")
+    assert router.stats()["fast-model"]["in_flight"] == 3
+
+    router.record_success("fast-model", 1.0)
+    router.record_failure("fast-model", RuntimeError("boom"))
+    router.record_cancelled("fast-model")
+    stats = router.stats()["fast-model"]
+    assert stats["in_flight"] == 0
+    assert stats["samples"] == 1
+
+    # Never negative, e.g. a cancellation recorded after a failure of the same call
+    router.record_cancelled("fast-model")
+    assert router.stats()["fast-model"]["in_flight"] == 0
+
+
+def test_success_updates_latency_ewma_and_clears_errors(router, monkeypatch):
+    monkeypatch.setattr(settings, "groq_latency_ewma_alpha", 0.5)
+    router.record_start("fast-model")
+    router.record_failure("fast-model", RuntimeError("boom"))
+    router.record_start("fast-model")
+    router.record_success("fast-model", 2.0)
+    router.record_start("fast-model")
+    router.record_success("fast-model", 4.0)
+
+    stats = router.stats()["fast-model"]
+    assert stats["latency_ewma_seconds"] == 3.0
+    assert stats["consecutive_errors"] == 0
+    assert stats["last_error"] is None
+
+
+def test_rate_limit_error_does_not_cool_down_model(router):
+    class RateLimitError(Exception):
+        status_code = 429
+
+    router.record_start("fast-model")
+    router.record_failure("fast-model", RateLimitError("429"))
+
+    assert not router.stats()["fast-model"]["cooling_down"]
+    assert router.candidates(1000)[0] == "fast-model"
+
+
+def test_failure_cooldown_backs_off(router, monkeypatch):
+    monkeypatch.setattr(settings, "groq_model_cooldown", 10.0)
+    for _ in range(3):
+        router.record_start("fast-model")
+        router.record_failure("fast-model", RuntimeError("boom"))
+
+    remaining = router._stats["fast-model"].cooldown_until - time.time()
+    assert remaining == pytest.approx(40, abs=1)
@@ -0,0 +1,232 @@
+import os
+import zlib
+
+import pytest
+
+from app.config import settings
+from app.file_processor import FileProcessor
+import app.pdf_preflight as preflight
+from app.pdf_preflight import scan_pdf, PdfBudgetExceeded, PdfSyntaxError, _PdfScanner
+
+CATALOG = b"<< /Type /Catalog /Pages 2 0 R >>"
+
+
+def pages_tree(count: int, first_page: int = 3) -> list:
+    kids = b" ".join(b"%d 0 R" % (first_page + i) for i in range(count))
+    return [CATALOG, b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % count] + [b"<< /Type /Page /Parent 2 0 R >>"] * count
+
+
+def stream(dictionary: bytes, data: bytes) -> bytes:
+    return b"<< " + dictionary + b" /Length %d >>\nstream\n" % len(data) + data + b"\nendstream"
+
+
+def build_pdf(objects: list, trailer: bytes = b"", startxref_shift: int = 0) -> bytes:
+    """PDF with a classic xref table; objects are numbered from 1"""
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R %s>>\n" % (len(objects) + 1, trailer)
+    out += b"startxref\n%d\n%%%%EOF\n" % (xref + startxref_shift)
+    return bytes(out)
+
+
+def build_compressed_pdf(page_count: int, decode_parms: bytes = b"/Columns 4 /Predictor 12") -> bytes:
+    """PDF 1.5 layout: catalog, page tree and pages in an object stream, located by an xref stream"""
+    inner = pages_tree(page_count)
+    objstm_number = len(inner) + 1
+    xref_number = objstm_number + 1
+    body = bytearray()
+    positions = []
+    for obj in inner:
+        positions.append(len(body))
+        body += obj + b" "
+    header = b" ".join(b"%d %d" % (i + 1, position) for i, position in enumerate(positions)) + b" "
+    objstm = stream(
+        b"/Type /ObjStm /N %d /First %d /Filter /FlateDecode" % (len(inner), len(header)),
+        zlib.compress(header + bytes(body)),
+    )
+    out = bytearray(b"%PDF-1.5\n")
+    objstm_offset = len(out)
+    out += b"%d 0 obj\n" % objstm_number + objstm + b"\nendobj\n"
+    xref_offset = len(out)
+    # Rows of W [1 2 1]: free object 0, compressed objects, the object stream and the xref stream itself
+    rows = [(0, 0, 0)] + [(2, objstm_number, i) for i in range(len(inner))] + [(1, objstm_offset, 0), (1, xref_offset, 0)]
+    raw = bytearray()
+    previous = bytes(4)
+    for kind, field, index in rows:
+        row = bytes([kind]) + field.to_bytes(2, "big") + bytes([index])
+        raw += b"\x02" + bytes((value - above) & 0xFF for value, above in zip(row, previous))
+        previous = row
+    xref_stream = stream(
+        b"/Type /XRef /Size %d /W [1 2 1] /Root 1 0 R /Filter /FlateDecode /DecodeParms << %s >>"
+        % (xref_number + 1, decode_parms),
+        zlib.compress(bytes(raw)),
+    )
+    out += b"%d 0 obj\n" % xref_number + xref_stream + b"\nendobj\n"
+    out += b"startxref\n%d\n%%%%EOF\n" % xref_offset
+    return bytes(out)
+
+
+def test_xref_table():
+    report = scan_pdf(build_pdf(pages_tree(3)))
+    assert report["pages"] == 3
+    assert report["objects"] == 5
+    assert report["xrefSections"] == 1
+
+
+def test_xref_stream_and_object_stream():
+    report = scan_pdf(build_compressed_pdf(4))
+    assert report["pages"] == 4
+    assert report["objects"] == 8
+
+
+def test_broken_startxref_rebuilds_from_objects():
+    assert scan_pdf(build_pdf(pages_tree(2), startxref_shift=7))["pages"] == 2
+
+
+def test_incremental_update_chain():
+    # Append an update that replaces the page tree with one of two pages (objects 3 and 6)
+    original = build_pdf(pages_tree(1))
+    previous = int(original.rsplit(b"startxref\n", 1)[1].split(b"\n")[0])
+    out = bytearray(original)
+    tree_offset = len(out)
+    out += b"2 0 obj\n<< /Type /Pages /Kids [3 0 R 6 0 R] /Count 2 >>\nendobj\n"
+    page_offset = len(out)
+    out += b"6 0 obj\n<< /Type /Page /Parent 2 0 R >>\nendobj\n"
+    xref = len(out)
+    out += b"xref\n2 1\n%010d 00000 n \n6 1\n%010d 00000 n \n" % (tree_offset, page_offset)
+    out += b"trailer\n<< /Size 7 /Root 1 0 R /Prev %d >>\nstartxref\n%d\n%%%%EOF\n" % (previous, xref)
+    report = scan_pdf(bytes(out))
+    assert report["xrefSections"] == 2
+    assert report["pages"] == 2
+
+
+def test_decompression_bomb_is_rejected():
+    bomb = zlib.compress(bytes(64 * 1024 * 1024), 9)
+    with pytest.raises(PdfBudgetExceeded) as error:
+        scan_pdf(build_pdf(pages_tree(1) + [stream(b"/Filter /FlateDecode", bomb)]))
+    assert error.value.budget in ("stream_bytes", "compression_ratio")
+
+
+def test_page_tree_depth_is_limited(monkeypatch):
+    monkeypatch.setattr(settings, "pdf_max_page_tree_depth", 5)
+    objects = [CATALOG] + [b"<< /Type /Pages /Kids [%d 0 R] /Count 1 >>" % (i + 3) for i in range(10)] + [b"<< /Type /Page >>"]
+    with pytest.raises(PdfBudgetExceeded) as error:
+        scan_pdf(build_pdf(objects))
+    assert error.value.budget == "page_tree_depth"
+
+
+def test_image_count_is_limited(monkeypatch):
+    monkeypatch.setattr(settings, "pdf_max_images", 2)
+    image = stream(b"/Subtype /Image /Width 1 /Height 1 /BitsPerComponent 8 /ColorSpace /DeviceGray", b"\0")
+    with pytest.raises(PdfBudgetExceeded) as error:
+        scan_pdf(build_pdf(pages_tree(1) + [image] * 3))
+    assert error.value.budget == "images"
+
+
+def test_length_chain_does_not_recurse():
+    # Each stream's /Length points at the next stream object
+    count = 5000
+    objects = pages_tree(1)
+    first = len(objects) + 1
+    for i in range(count):
+        objects.append(b"<< /Length %d 0 R >>\nstream\nx\nendstream" % (first + i + 1))
+    objects.append(b"1")
+    report = scan_pdf(build_pdf(objects))
+    assert report["pages"] == 1
+    assert report["streams"] == count
+
+
+@pytest.mark.parametrize("decode_parms", [
+    b"/Columns -1 /Predictor 12",
+    b"/Columns 4.5 /Predictor 12",
+    b"/Columns 4 /Colors 0 /Predictor 12",
+    b"/Columns 99 0 R /Predictor 12",
+])
+def test_invalid_predictor_parameters(decode_parms):
+    data = build_compressed_pdf(2, decode_parms)
+    try:
+        assert scan_pdf(data)["pages"] is None
+    except PdfSyntaxError:
+        pass
+    valid, _ = FileProcessor.validate_pdf_pages(data, "resume.pdf")
+    assert valid
+
+
+def test_validate_pdf_pages_uses_preflight_count(monkeypatch):
+    monkeypatch.setattr(settings, "max_pdf_pages", 2)
+    valid, message = FileProcessor.validate_pdf_pages(build_pdf(pages_tree(3)), "resume.pdf")
+    assert not valid
+    assert "too many pages (3)" in message
+
+
+def test_measured_streams_are_inflated_in_chunks(monkeypatch):
+    monkeypatch.setattr(preflight, "INFLATE_CHUNK_BYTES", 1000)
+    data = os.urandom(50_000) + bytes(50_000)
+    scanner = _PdfScanner(b"")
+
+    assert scanner.measure_inflated(zlib.compress(data))
+    assert scanner.decoded_bytes == len(data)
+    # A truncated stream counts what could be inflated, as inflate does
+    assert scanner.measure_inflated(zlib.compress(data)[:20_000])
+    assert len(data) < scanner.decoded_bytes < 2 * len(data)
+
+
+def test_ratio_breach_stops_inflating_early(monkeypatch):
+    inflated = []
+    monkeypatch.setattr(preflight, "INFLATE_CHUNK_BYTES", 64 * 1024)
+    monkeypatch.setattr(settings, "pdf_max_compression_ratio", 20.0)
+    bomb = zlib.compress(bytes(64 * 1024 * 1024), 9)
+    decompressobj = zlib.decompressobj
+
+    class CountingDecompressor:
+        def __init__(self):
+            self.inner = decompressobj()
+
+        def decompress(self, data, max_length):
+            out = self.inner.decompress(data, max_length)
+            inflated.append(len(out))
+            return out
+
+        def __getattr__(self, name):
+            return getattr(self.inner, name)
+
+    monkeypatch.setattr(preflight.zlib, "decompressobj", CountingDecompressor)
+    scanner = _PdfScanner(b"")
+    with pytest.raises(PdfBudgetExceeded) as error:
+        scanner.measure_inflated(bomb)
+
+    assert error.value.budget == "compression_ratio"
+    # Just past the ratio limit, not the 16MB per-stream or 64MB total budget
+    ratio_limit = max(preflight.RATIO_FLOOR_BYTES, len(bomb) * settings.pdf_max_compression_ratio)
+    assert sum(inflated) <= ratio_limit + 64 * 1024
+    assert scanner.decoded_bytes == 0
+
+
+def test_sweep_stops_when_time_budget_is_used_up(monkeypatch):
+    objects = pages_tree(1) + [stream(b"/Filter /FlateDecode", zlib.compress(b"BT ET " * 100))] * 50
+    data = build_pdf(objects)
+    monkeypatch.setattr(settings, "pdf_preflight_max_seconds", 0)
+    report = scan_pdf(data)
+    assert report["sweepComplete"]
+    assert report["streams"] == 50
+
+    monkeypatch.setattr(settings, "pdf_preflight_max_seconds", 1e-9)
+    report = scan_pdf(data)
+    assert not report["sweepComplete"]
+    assert report["streams"] < 50
+    assert report["pages"] == 1
+
+
+def test_literal_strings_with_escapes_and_nesting():
+    scanner = _PdfScanner(b"<< /Title (a \\) (nested (twice)) \\\\ b) /N 1 >>")
+    value, _ = scanner.parse_object(0)
+    assert value["Title"] == b"a \\) (nested (twice)) \\\\ b"
+    assert value["N"] == 1
+    with pytest.raises(PdfSyntaxError):
+        _PdfScanner(b"(unterminated (string)").parse_object(0)
@@ -0,0 +1,55 @@
+import asyncio
+import multiprocessing
+import os
+from multiprocessing import resource_tracker
+
+import pytest
+
+from app.rate_limit_store import MemoryRateLimitStore, SharedMemoryRateLimitStore
+
+ADDS_PER_WORKER = 3000
+
+
+def test_memory_store_rolls_windows():
+    store = MemoryRateLimitStore(max_keys=10)
+    assert asyncio.run(store.add("user", 5)) == (1, 0)
+    assert asyncio.run(store.add("user", 5)) == (2, 0)
+    assert asyncio.run(store.add("user", 6)) == (1, 2)
+    # A gap of more than one window forgets the previous count
+    assert asyncio.run(store.add("user", 9)) == (1, 0)
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryRateLimitStore(max_keys=2)
+    for key in ("a", "b", "a", "c"):
+        asyncio.run(store.add(key, 1))
+    # "b" was the least recently used key when "c" arrived
+    assert asyncio.run(store.add("a", 1)) == (3, 0)
+    assert asyncio.run(store.add("b", 1)) == (1, 0)
+
+
+def _add_many(store: SharedMemoryRateLimitStore):
+    async def run():
+        for _ in range(ADDS_PER_WORKER):
+            await store.add("user", 1)
+    asyncio.run(run())
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="needs fork")
+def test_shared_memory_store_counts_across_forked_workers():
+    # Built before forking, like serve.py does through the app import
+    store = SharedMemoryRateLimitStore(f"test_ratelimit_{os.getpid()}", slots=64)
+    try:
+        context = multiprocessing.get_context("fork")
+        workers = [context.Process(target=_add_many, args=(store,)) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert [worker.exitcode for worker in workers] == [0, 0]
+        assert asyncio.run(store.add("user", 1, amount=0)) == (2 * ADDS_PER_WORKER, 0)
+    finally:
+        store._shm.close()
+        # The store unregisters the segment so workers never unlink it; hand it back before unlinking
+        resource_tracker.register(store._shm._name, "shared_memory")
+        store._shm.unlink()
@@ -0,0 +1,21 @@
+import serve
+from app.config import settings
+
+
+def test_several_workers_share_rate_limits(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_backend", "")
+    serve.select_rate_limit_backend(4)
+    assert settings.rate_limit_backend == "shared_memory"
+
+
+def test_single_worker_keeps_in_process_limits(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_backend", "")
+    serve.select_rate_limit_backend(1)
+    assert settings.rate_limit_backend == "memory"
+
+
+def test_explicit_backend_is_kept(monkeypatch, caplog):
+    monkeypatch.setattr(settings, "rate_limit_backend", "memory")
+    serve.select_rate_limit_backend(4)
+    assert settings.rate_limit_backend == "memory"
+    assert "4x the daily limit" in caplog.text
@@ -0,0 +1,112 @@
+import copy
+import importlib.util
+
+import pytest
+
+import app.storage_codec as codec_module
+from app.config import settings
+from app.database import merge_detail, split_document
+from app.storage_codec import CODEC_TAGS, decompress_value, pack_document, storage_codec, unpack_document
+
+REPORT = {"strengths_analysis": {"technical_skills": ["Python", "Go"] * 50}, "final_assessment": {"eligibility_status": "Eligible"}}
+
+
+def _document():
+    return {
+        "analysisId": "a",
+        "status": "completed",
+        "jobDescriptionText": "Backend engineer, Python and MongoDB. " * 60,
+        "result": {
+            "score_out_of_100": 72,
+            "resume_eligibility": "Eligible",
+            "short_conclusion": "Good fit",
+            "resume_analysis_report": copy.deepcopy(REPORT),
+        },
+    }
+
+
+@pytest.fixture
+def zlib_storage(monkeypatch):
+    monkeypatch.setattr(settings, "analysis_storage_compression", "zlib")
+    monkeypatch.setattr(settings, "analysis_compression_min_bytes", 1024)
+
+
+def test_pack_and_unpack_round_trip(zlib_storage):
+    doc = pack_document(_document())
+
+    assert doc["jobDescriptionText"][:1] == CODEC_TAGS["zlib"]
+    assert doc["result"]["resume_analysis_report"][:1] == CODEC_TAGS["zlib"]
+    # Summary fields stay queryable
+    assert doc["result"]["score_out_of_100"] == 72
+    assert unpack_document(doc) == _document()
+
+
+def test_pack_leaves_short_text_and_packed_values_alone(zlib_storage):
+    doc = _document()
+    doc["jobDescriptionText"] = "short"
+    packed = pack_document(doc)
+    report = packed["result"]["resume_analysis_report"]
+
+    assert packed["jobDescriptionText"] == "short"
+    assert pack_document(packed)["result"]["resume_analysis_report"] is report
+
+
+def test_pack_with_compression_off_is_a_no_op(monkeypatch):
+    monkeypatch.setattr(settings, "analysis_storage_compression", "none")
+    assert pack_document(_document()) == _document()
+
+
+def test_unpack_reads_documents_whatever_the_current_codec(zlib_storage, monkeypatch):
+    doc = pack_document(_document())
+    monkeypatch.setattr(settings, "analysis_storage_compression", "none")
+    assert unpack_document(doc) == _document()
+
+
+def test_zstd_falls_back_to_zlib_without_zstandard(monkeypatch):
+    monkeypatch.setattr(settings, "analysis_storage_compression", "zstd")
+    monkeypatch.setattr(codec_module.importlib.util, "find_spec", lambda name: None)
+    assert storage_codec() == "zlib"
+
+
+def test_unknown_codec_setting_disables_compression(monkeypatch):
+    monkeypatch.setattr(settings, "analysis_storage_compression", "brotli")
+    assert storage_codec() == "none"
+
+
+@pytest.mark.skipif(not importlib.util.find_spec("zstandard"), reason="zstandard is not installed")
+def test_zstd_round_trip(monkeypatch):
+    monkeypatch.setattr(settings, "analysis_storage_compression", "zstd")
+    doc = pack_document(_document())
+    assert doc["jobDescriptionText"][:1] == CODEC_TAGS["zstd"]
+    assert unpack_document(doc) == _document()
+
+
+def test_unknown_codec_tag_is_rejected():
+    with pytest.raises(ValueError):
+        decompress_value(b"\x09payload")
+
+
+def test_split_keeps_summary_fields_and_moves_details(zlib_storage):
+    summary, detail = split_document(_document())
+
+    assert "jobDescriptionText" not in summary
+    assert set(summary["result"]) == {"score_out_of_100", "resume_eligibility"}
+    assert summary["result"]["score_out_of_100"] == 72
+    assert set(detail) == {"result", "jobDescriptionText"}
+    assert detail["jobDescriptionText"][:1] == CODEC_TAGS["zlib"]
+
+
+def test_split_of_update_without_detail_fields():
+    update = {"status": "analyzing", "progress": 40}
+    assert split_document(update) == ({"status": "analyzing", "progress": 40}, None)
+
+
+def test_merge_detail_restores_split_document(zlib_storage):
+    summary, detail = split_document(_document())
+    assert merge_detail(summary, detail) == _document()
+
+
+def test_merge_detail_reads_unsplit_documents(zlib_storage):
+    # Stored before split storage was enabled: no detail document, fields packed in place
+    doc = pack_document(_document())
+    assert merge_detail(doc, None) == _document()
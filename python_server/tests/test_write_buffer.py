@@ -0,0 +1,155 @@
+import asyncio
+import os
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from app.write_buffer import DUPLICATE_KEY, AnalysisWriteBuffer
+
+
+class FakeCollection:
+    """insert_many double that fails while `down` and rejects ids it already stored"""
+
+    def __init__(self):
+        self.docs = {}
+        self.calls = []
+        self.down = False
+
+    async def insert_many(self, docs, ordered=True):
+        self.calls.append(len(docs))
+        if self.down:
+            raise ConnectionError("MongoDB unreachable")
+        errors = []
+        for index, doc in enumerate(docs):
+            if doc["_id"] in self.docs:
+                errors.append({"index": index, "code": DUPLICATE_KEY, "errmsg": "duplicate key"})
+            else:
+                self.docs[doc["_id"]] = doc
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(docs) - len(errors)})
+
+
+def _buffer(tmp_path, durability, batch_size=2, max_pending=100):
+    return AnalysisWriteBuffer(batch_size, 60.0, durability, str(tmp_path / "spill.jsonl"), max_pending)
+
+
+def test_ack_callers_share_one_batch(tmp_path):
+    collection = FakeCollection()
+
+    async def scenario():
+        buffer = _buffer(tmp_path, "ack")
+        await buffer.start({"analyses": collection})
+        await asyncio.gather(buffer.add({"_id": 1}), buffer.add({"_id": 2}))
+        await buffer.stop()
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert collection.calls == [2]
+    assert set(collection.docs) == {1, 2}
+    assert buffer.stats()["documents_written"] == 2
+
+
+def test_ack_caller_sees_write_failure_and_nothing_is_spilled(tmp_path):
+    collection = FakeCollection()
+    collection.down = True
+
+    async def scenario():
+        buffer = _buffer(tmp_path, "ack")
+        await buffer.start({"analyses": collection})
+        results = await asyncio.gather(buffer.add({"_id": 1}), buffer.add({"_id": 2}), return_exceptions=True)
+        await buffer.stop()
+        return buffer, results
+
+    buffer, results = asyncio.run(scenario())
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert buffer.spilled == 0
+    assert not os.path.exists(buffer.spill_path)
+
+
+def test_fire_and_forget_spills_on_outage_and_replays_on_recovery(tmp_path):
+    collection = FakeCollection()
+    collection.down = True
+
+    async def scenario():
+        buffer = _buffer(tmp_path, "fire_and_forget")
+        await buffer.start({"analyses": collection, "detail": collection})
+        await buffer.add({"_id": 1})
+        await buffer.add({"_id": 2}, target="detail")
+        await buffer.flush()
+        spilled = buffer.spilled, os.path.exists(buffer.spill_path)
+
+        collection.down = False
+        await buffer.add({"_id": 3})
+        await buffer.flush()
+        await buffer.stop()
+        return buffer, spilled
+
+    buffer, (spilled, spill_file_existed) = asyncio.run(scenario())
+    assert spilled == 2 and spill_file_existed
+    assert set(collection.docs) == {1, 2, 3}
+    assert buffer.replayed == 2
+    assert not os.path.exists(buffer.spill_path)
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".replay")]
+
+
+def test_replayed_duplicates_are_skipped_not_spilled_again(tmp_path):
+    collection = FakeCollection()
+    collection.docs[1] = {"_id": 1}
+
+    async def scenario():
+        buffer = _buffer(tmp_path, "fire_and_forget")
+        await buffer.start({"analyses": collection})
+        await buffer._spill("analyses", [{"_id": 1}, {"_id": 2}])
+        await buffer.flush()
+        await buffer.stop()
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert set(collection.docs) == {1, 2}
+    assert buffer.duplicates == 1
+    assert buffer.replayed == 2
+    assert not os.path.exists(buffer.spill_path)
+
+
+def test_failed_replay_keeps_the_rest_in_the_spill_file(tmp_path):
+    collection = FakeCollection()
+
+    async def scenario():
+        buffer = _buffer(tmp_path, "fire_and_forget")
+        await buffer.start({"analyses": collection})
+        await buffer._spill("analyses", [{"_id": i} for i in range(5)])
+        collection.down = True
+        await buffer._replay_spill()
+        calls = list(collection.calls)
+        await buffer.stop()
+        return buffer, calls
+
+    buffer, calls = asyncio.run(scenario())
+    # The first chunk failed and was spilled again along with the two chunks never tried
+    assert calls == [2]
+    assert sorted(line["doc"]["_id"] for line in buffer._take_spill()) == [0, 1, 2, 3, 4]
+    assert buffer.replayed == 0
+
+
+def test_fire_and_forget_spills_directly_beyond_max_pending(tmp_path):
+    collection = FakeCollection()
+    collection.down = True
+
+    async def scenario():
+        buffer = _buffer(tmp_path, "fire_and_forget", batch_size=10, max_pending=2)
+        await buffer.start({"analyses": collection})
+        for i in range(3):
+            await buffer.add({"_id": i})
+        pending, spilled = len(buffer._pending), buffer.spilled
+        await buffer.stop()
+        return buffer, pending, spilled
+
+    buffer, pending, spilled = asyncio.run(scenario())
+    assert (pending, spilled) == (2, 1)
+    # stop() could not write the other two either, so they were spilled too
+    assert buffer.spilled == 3
+    assert sorted(line["doc"]["_id"] for line in buffer._take_spill()) == [0, 1, 2]
+
+
+def test_unknown_durability_falls_back_to_ack(tmp_path):
+    assert _buffer(tmp_path, "eventually").durability == "ack"